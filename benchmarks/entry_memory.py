@@ -0,0 +1,120 @@
+"""Report the memory held per parsed OPDS entry.
+
+Compares the current slotted, string-interning models with plain
+dataclasses shaped like the original ones.
+
+    uv run python benchmarks/entry_memory.py [ENTRIES]
+"""
+
+import gc
+import sys
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from opdscli.opds import AcquisitionLink, OPDSEntry, iter_feed
+
+_LINKS = (
+    ("application/epub+zip", "epub"),
+    ("application/pdf", "pdf"),
+    ("application/x-mobipocket-ebook", "mobi"),
+)
+
+
+@dataclass
+class LegacyAcquisitionLink:
+    href: str
+    type: str
+    rel: str = ""
+
+
+@dataclass
+class LegacyOPDSEntry:
+    title: str = ""
+    author: str = ""
+    summary: str = ""
+    updated: str = ""
+    entry_id: str = ""
+    formats: list[str] = field(default_factory=list)
+    acquisition_links: list[LegacyAcquisitionLink] = field(
+        default_factory=list,
+    )
+
+
+def build_feed(count: int) -> bytes:
+    parts = ['<feed xmlns="http://www.w3.org/2005/Atom">']
+    for i in range(count):
+        links = "".join(
+            f'<link href="/download/{i}.{ext}" type="{mime}"'
+            f' rel="http://opds-spec.org/acquisition"/>'
+            for mime, ext in _LINKS[: 1 + i % len(_LINKS)]
+        )
+        parts.append(
+            f"<entry><title>Book number {i}</title>"
+            f"<id>urn:uuid:book-{i:08d}</id>"
+            f"<updated>2024-01-{1 + i % 28:02d}T10:00:00Z</updated>"
+            f"<author><name>Author {i % 500}</name></author>"
+            f"<summary>Summary of book {i}.</summary>{links}</entry>"
+        )
+    parts.append("</feed>")
+    return "".join(parts).encode()
+
+
+def _copy(value: str) -> str:
+    """A fresh str object, as lxml returns for every attribute read."""
+    return value.encode().decode()
+
+
+def _legacy(entry: OPDSEntry) -> LegacyOPDSEntry:
+    return LegacyOPDSEntry(
+        title=entry.title,
+        author=entry.author,
+        summary=entry.summary,
+        updated=entry.updated,
+        entry_id=entry.entry_id,
+        formats=[_copy(f) for f in entry.formats],
+        acquisition_links=[
+            LegacyAcquisitionLink(
+                href=link.href, type=_copy(link.type), rel=_copy(link.rel),
+            )
+            for link in entry.acquisition_links
+        ],
+    )
+
+
+def _entries(data: bytes) -> list[OPDSEntry]:
+    return [i for i in iter_feed(data) if isinstance(i, OPDSEntry)]
+
+
+def bytes_per_entry(build: Callable[[], list[object]], count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    held = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(held) == count
+    return current / count
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    data = build_feed(count)
+
+    before = bytes_per_entry(
+        lambda: [_legacy(e) for e in iter_feed(data)
+                 if isinstance(e, OPDSEntry)],
+        count,
+    )
+    after = bytes_per_entry(lambda: _entries(data), count)
+
+    print(f"entries:            {count}")
+    print(f"plain dataclasses:  {before:8.0f} bytes/entry")
+    print(f"slotted + interned: {after:8.0f} bytes/entry")
+    print(f"saved:              {1 - after / before:8.1%}")
+    print(f"slot sizes: entry {sys.getsizeof(OPDSEntry())} B, "
+          f"link {sys.getsizeof(AcquisitionLink('', ''))} B")
+
+
+if __name__ == "__main__":
+    main()
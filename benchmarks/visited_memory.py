@@ -0,0 +1,59 @@
+"""Report the memory held per URL by the crawler's visited store.
+
+Compares a plain ``set`` of URL strings with the digest-based
+``VisitedUrls`` table.
+
+    uv run python benchmarks/visited_memory.py [URLS]
+"""
+
+import gc
+import sys
+import tracemalloc
+from collections.abc import Callable
+
+from opdscli.urls import VisitedUrls
+
+
+def build_urls(count: int) -> list[str]:
+    return [
+        f"https://catalog.example.com/opds/authors/{i % 997}"
+        f"?page={i}&sort=title"
+        for i in range(count)
+    ]
+
+
+def bytes_per_url(build: Callable[[], object], count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    held = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return current / count
+
+
+def _visited(urls: list[str]) -> VisitedUrls:
+    visited = VisitedUrls()
+    for url in urls:
+        visited.add(url)
+    return visited
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    # Each URL string is built inside the measurement, as a crawl
+    # would receive it from the parser.
+    before = bytes_per_url(lambda: set(build_urls(count)), count)
+    urls = build_urls(count)
+    after = bytes_per_url(lambda: _visited(urls), count)
+
+    print(f"urls:          {count}")
+    print(f"set of str:    {before:8.1f} bytes/url")
+    print(f"VisitedUrls:   {after:8.1f} bytes/url")
+    print(f"saved:         {1 - after / before:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+CACHE_DIR = Path.home() / ".cache" / "opdscli"
+
+DEFAULT_TTL = 300.0
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    raw_size INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    body BLOB NOT NULL,
+    max_age REAL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_CACHEABLE_TYPES = ("xml",)
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    content_type: str
+    etag: str | None
+    last_modified: str | None
+    stored_at: float
+    body: bytes
+    max_age: float | None = None  # the server's limit on freshness
+
+    def to_response(self, request: httpx.Request) -> httpx.Response:
+        headers = {"Content-Type": self.content_type}
+        if self.etag:
+            headers["ETag"] = self.etag
+        if self.last_modified:
+            headers["Last-Modified"] = self.last_modified
+        return httpx.Response(
+            200, headers=headers, content=self.body, request=request,
+            extensions={"from_cache": True},
+        )
+
+
+@dataclass
+class CacheStats:
+    entries: int
+    size: int
+    raw_size: int
+    max_size: int
+    hits: int
+    revalidated: int
+    misses: int
+
+
+class ResponseCache:
+    """On-disk, size-bounded LRU cache of feed responses.
+
+    Bodies are stored zlib-compressed in a SQLite database.  Entries
+    younger than *ttl* seconds are served without touching the
+    network; older ones are revalidated with a conditional GET.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ttl: float = DEFAULT_TTL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        columns = {
+            row[1] for row in self._db.execute("PRAGMA table_info(responses)")
+        }
+        if "max_age" not in columns:
+            # Caches written before max_age was recorded.
+            self._db.execute("ALTER TABLE responses ADD COLUMN max_age REAL")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def get(self, key: str) -> CachedResponse | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, content_type, etag, last_modified,"
+                " stored_at, body, max_age FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self._db.commit()
+        return CachedResponse(
+            url=row[0],
+            content_type=row[1],
+            etag=row[2],
+            last_modified=row[3],
+            stored_at=row[4],
+            body=zlib.decompress(row[5]),
+            max_age=row[6],
+        )
+
+    def is_fresh(self, cached: CachedResponse) -> bool:
+        """Whether *cached* is younger than the TTL and the server's max-age."""
+        ttl = self.ttl if cached.max_age is None else min(
+            self.ttl, cached.max_age,
+        )
+        return time.time() - cached.stored_at < ttl
+
+    def put(
+        self,
+        key: str,
+        url: str,
+        content_type: str,
+        body: bytes,
+        etag: str | None = None,
+        last_modified: str | None = None,
+        max_age: float | None = None,
+    ) -> None:
+        compressed = zlib.compress(body)
+        if len(compressed) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, url, content_type,"
+                " etag, last_modified, stored_at, accessed_at, raw_size,"
+                " size, body, max_age) VALUES"
+                " (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key, url, content_type, etag, last_modified,
+                    now, now, len(body), len(compressed), compressed,
+                    max_age,
+                ),
+            )
+            self._evict()
+            self._db.commit()
+
+    def refresh(self, key: str) -> None:
+        """Mark an entry as freshly validated (after a 304)."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE responses SET stored_at = ?, accessed_at = ?"
+                " WHERE key = ?",
+                (now, now, key),
+            )
+            self._db.commit()
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO counters VALUES (?, 1) ON CONFLICT(name)"
+                " DO UPDATE SET value = value + 1",
+                (name,),
+            )
+            self._db.commit()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            entries, size, raw_size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0),"
+                " COALESCE(SUM(raw_size), 0) FROM responses",
+            ).fetchone()
+            counters = dict(
+                self._db.execute("SELECT name, value FROM counters"),
+            )
+        return CacheStats(
+            entries=entries,
+            size=size,
+            raw_size=raw_size,
+            max_size=self.max_bytes,
+            hits=counters.get("hits", 0),
+            revalidated=counters.get("revalidated", 0),
+            misses=counters.get("misses", 0),
+        )
+
+    def clear(self) -> int:
+        """Remove every entry and reset counters. Returns entries removed."""
+        with self._lock:
+            removed = self._db.execute("DELETE FROM responses").rowcount
+            self._db.execute("DELETE FROM counters")
+            self._db.commit()
+            self._db.execute("VACUUM")
+        return removed
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until under max_bytes."""
+        (total,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses",
+        ).fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at",
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+
+def open_cache(
+    settings: dict[str, Any],
+    path: Path | None = None,
+    ttl: float | None = None,
+) -> ResponseCache | None:
+    """Open the response cache configured in *settings*.
+
+    *ttl* overrides the ``cache_ttl`` setting; 0 revalidates every
+    response.  Returns None when caching is disabled with
+    ``http_cache: false``.
+    """
+    if not settings.get("http_cache", True):
+        return None
+    return ResponseCache(
+        path or CACHE_DIR / "http.sqlite",
+        ttl=float(settings.get("cache_ttl", DEFAULT_TTL) if ttl is None else ttl),
+        max_bytes=int(
+            settings.get("cache_max_size_mb", DEFAULT_MAX_BYTES >> 20),
+        ) << 20,
+    )
+
+
+def cache_key(request: httpx.Request) -> str:
+    """Key a request by URL and the credentials it was sent with."""
+    digest = hashlib.sha256(str(request.url).encode())
+    digest.update(b"\0")
+    digest.update(request.headers.get("Authorization", "").encode())
+    return digest.hexdigest()
+
+
+def _cacheable(request: httpx.Request) -> bool:
+    return request.method == "GET" and "Range" not in request.headers
+
+
+def _prepare(
+    cache: ResponseCache, request: httpx.Request,
+) -> tuple[str, CachedResponse | None]:
+    """Look up *request* and add conditional headers for stale hits."""
+    key = cache_key(request)
+    cached = cache.get(key)
+    if cached is not None and not cache.is_fresh(cached):
+        if cached.etag:
+            request.headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            request.headers["If-Modified-Since"] = cached.last_modified
+    return key, cached
+
+
+def _cache_control(response: httpx.Response) -> dict[str, str]:
+    """The response's Cache-Control directives, names lowercased."""
+    directives = {}
+    for part in response.headers.get("Cache-Control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"')
+    return directives
+
+
+def _max_age(directives: dict[str, str]) -> float | None:
+    """How long the server lets a response be reused unvalidated.
+
+    ``no-cache`` and ``private`` responses are stored but revalidated
+    on every use.
+    """
+    if "no-cache" in directives or "private" in directives:
+        return 0.0
+    try:
+        return max(0.0, float(directives["max-age"]))
+    except (KeyError, ValueError):
+        return None
+
+
+def _should_store(response: httpx.Response) -> bool:
+    content_type = response.headers.get("Content-Type", "")
+    return (
+        response.status_code == 200
+        and any(t in content_type for t in _CACHEABLE_TYPES)
+        and "no-store" not in _cache_control(response)
+    )
+
+
+def _store(
+    cache: ResponseCache,
+    key: str,
+    request: httpx.Request,
+    response: httpx.Response,
+    body: bytes,
+) -> httpx.Response:
+    """Store a fetched body and return a response that replays it."""
+    content_type = response.headers["Content-Type"]
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    cache.put(
+        key, str(request.url), content_type, body,
+        etag=etag, last_modified=last_modified,
+        max_age=_max_age(_cache_control(response)),
+    )
+    # The body is already decoded, so drop transfer-level headers.
+    headers = {
+        k: v for k, v in response.headers.items()
+        if k.lower() not in ("content-encoding", "content-length",
+                             "transfer-encoding")
+    }
+    return httpx.Response(
+        200, headers=headers, content=body, request=request,
+    )
+
+
+class CachingTransport(httpx.BaseTransport):
+    """Serve GET requests from a ResponseCache, revalidating when stale."""
+
+    def __init__(
+        self,
+        cache: ResponseCache,
+        transport: httpx.BaseTransport | None = None,
+    ) -> None:
+        self._cache = cache
+        self._transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if not _cacheable(request):
+            return self._transport.handle_request(request)
+        key, cached = _prepare(self._cache, request)
+        if cached is not None and self._cache.is_fresh(cached):
+            self._cache.count("hits")
+            return cached.to_response(request)
+
+        response = self._transport.handle_request(request)
+        if response.status_code == 304 and cached is not None:
+            response.close()
+            self._cache.refresh(key)
+            self._cache.count("revalidated")
+            return cached.to_response(request)
+        if not _should_store(response):
+            return response
+        self._cache.count("misses")
+        body = response.read()
+        response.close()
+        return _store(self._cache, key, request, response, body)
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class AsyncCachingTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of :class:`CachingTransport`."""
+
+    def __init__(
+        self,
+        cache: ResponseCache,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self._cache = cache
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(
+        self, request: httpx.Request,
+    ) -> httpx.Response:
+        if not _cacheable(request):
+            return await self._transport.handle_async_request(request)
+        key, cached = _prepare(self._cache, request)
+        if cached is not None and self._cache.is_fresh(cached):
+            self._cache.count("hits")
+            return cached.to_response(request)
+
+        response = await self._transport.handle_async_request(request)
+        if response.status_code == 304 and cached is not None:
+            await response.aclose()
+            self._cache.refresh(key)
+            self._cache.count("revalidated")
+            return cached.to_response(request)
+        if not _should_store(response):
+            return response
+        self._cache.count("misses")
+        body = await response.aread()
+        await response.aclose()
+        return _store(self._cache, key, request, response, body)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
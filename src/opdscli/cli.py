@@ -8,6 +8,10 @@ app = typer.Typer(
 )
 catalog_app = typer.Typer(help="Manage OPDS catalogs.")
 app.add_typer(catalog_app, name="catalog")
+cache_app = typer.Typer(help="Manage the HTTP response cache.")
+app.add_typer(cache_app, name="cache")
+index_app = typer.Typer(help="Manage the local catalog search index.")
+app.add_typer(index_app, name="index")
 
 console = Console()
 err_console = Console(stderr=True)
@@ -56,14 +60,18 @@ def main(
 
 def register_commands() -> None:
     """Register all commands with the app."""
+    from opdscli.commands.cache import register as register_cache
     from opdscli.commands.catalog import (
         register as register_catalog,
     )
     from opdscli.commands.download import download
+    from opdscli.commands.index import register as register_index
     from opdscli.commands.latest import latest
     from opdscli.commands.search import search
 
     register_catalog(catalog_app)
+    register_cache(cache_app)
+    register_index(index_app)
     app.command()(search)
     app.command()(latest)
     app.command()(download)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+from opdscli.cache import ResponseCache, open_cache
+from opdscli.config import load_config
+
+if TYPE_CHECKING:
+    from opdscli.cli import State
+
+console = Console()
+err_console = Console(stderr=True)
+
+
+def _get_state() -> State:
+    from opdscli.cli import state
+
+    return state
+
+
+def _open() -> ResponseCache:
+    config = load_config()
+    cache = open_cache(config.settings)
+    if cache is None:
+        err_console.print(
+            "[red]HTTP cache is disabled (http_cache: false).[/red]",
+        )
+        raise typer.Exit(code=1)
+    return cache
+
+
+def _human_size(size: int) -> str:
+    value = float(size)
+    for unit in ("B", "KB", "MB"):
+        if value < 1024:
+            return f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GB"
+
+
+def cache_stats() -> None:
+    """Show HTTP cache usage."""
+    cache = _open()
+    stats = cache.stats()
+    cache.close()
+
+    table = Table(title="HTTP cache")
+    table.add_column("Metric")
+    table.add_column("Value")
+    table.add_row("Location", str(cache.path))
+    table.add_row("Entries", str(stats.entries))
+    table.add_row(
+        "Size (compressed)",
+        f"{_human_size(stats.size)} / {_human_size(stats.max_size)}",
+    )
+    table.add_row("Size (uncompressed)", _human_size(stats.raw_size))
+    table.add_row("TTL", f"{cache.ttl:g}s")
+    table.add_row("Fresh hits", str(stats.hits))
+    table.add_row("Revalidated (304)", str(stats.revalidated))
+    table.add_row("Misses", str(stats.misses))
+    console.print(table)
+
+
+def cache_clear() -> None:
+    """Remove all cached responses."""
+    cache = _open()
+    removed = cache.clear()
+    cache.close()
+    if not _get_state().quiet:
+        console.print(f"Removed {removed} cached responses.")
+
+
+def register(cache_app: typer.Typer) -> None:
+    """Register all cache subcommands."""
+    cache_app.command("stats")(cache_stats)
+    cache_app.command("clear")(cache_clear)
@@ -6,7 +6,17 @@ import typer
 from rich.console import Console
 from rich.table import Table
 
-from opdscli.config import AuthConfig, CatalogConfig, load_config, save_config
+from opdscli.cache import open_cache
+from opdscli.config import (
+    AppConfig,
+    AuthConfig,
+    CatalogConfig,
+    CatalogProfile,
+    load_config,
+    save_config,
+)
+from opdscli.http import OPDSClientError, create_client
+from opdscli.profile import refresh_profile
 
 if TYPE_CHECKING:
     from opdscli.cli import State
@@ -27,6 +37,10 @@ def catalog_add(
     auth_type: str | None = typer.Option(
         None, "--auth-type", help="Auth type: basic or bearer.",
     ),
+    discover: bool = typer.Option(
+        True, "--discover/--no-discover",
+        help="Probe the catalog's capabilities now.",
+    ),
 ) -> None:
     """Add a new catalog."""
     config = load_config()
@@ -57,6 +71,18 @@ def catalog_add(
     if not _get_state().quiet:
         console.print(f"Added catalog '{name}' ({url})")
 
+    if discover:
+        try:
+            profile = _discover(config, name)
+        except (OPDSClientError, ValueError) as e:
+            err_console.print(
+                f"[yellow]Could not probe '{name}': {e}. "
+                "It will be retried on first use.[/yellow]",
+            )
+            return
+        if _get_state().verbose:
+            _print_profile(name, profile)
+
 
 def catalog_remove(
     name: str = typer.Argument(help="Name of the catalog to remove."),
@@ -115,9 +141,55 @@ def catalog_set_default(
         console.print(f"Default catalog set to '{name}'")
 
 
+def catalog_refresh(
+    name: str | None = typer.Argument(
+        None, help="Catalog to refresh (default: all).",
+    ),
+) -> None:
+    """Rediscover catalog capabilities (search, latest feed, formats)."""
+    config = load_config()
+
+    if name is not None and name not in config.catalogs:
+        err_console.print(f"[red]Catalog '{name}' not found.[/red]")
+        raise typer.Exit(code=1)
+
+    failed = False
+    for cat_name in [name] if name else list(config.catalogs):
+        try:
+            profile = _discover(config, cat_name)
+        except (OPDSClientError, ValueError) as e:
+            err_console.print(f"[red]Could not probe '{cat_name}': {e}[/red]")
+            failed = True
+            continue
+        if not _get_state().quiet:
+            _print_profile(cat_name, profile)
+
+    if failed:
+        raise typer.Exit(code=1)
+
+
+def _discover(config: AppConfig, name: str) -> CatalogProfile:
+    cache = open_cache(config.settings)
+    with create_client(config.catalogs[name], cache=cache) as client:
+        return refresh_profile(config, name, client)
+
+
+def _print_profile(name: str, profile: CatalogProfile) -> None:
+    table = Table(title=f"Capabilities of '{name}'")
+    table.add_column("Capability")
+    table.add_column("Value")
+    table.add_row("OpenSearch", profile.opensearch_template or "none")
+    table.add_row("Latest feed", profile.latest_url or "none")
+    table.add_row("Pagination", profile.pagination)
+    table.add_row("Facets", ", ".join(profile.facet_groups) or "none")
+    table.add_row("Formats", ", ".join(profile.mime_types) or "unknown")
+    console.print(table)
+
+
 def register(catalog_app: typer.Typer) -> None:
     """Register all catalog subcommands."""
     catalog_app.command("add")(catalog_add)
     catalog_app.command("remove")(catalog_remove)
     catalog_app.command("list")(catalog_list)
     catalog_app.command("set-default")(catalog_set_default)
+    catalog_app.command("refresh")(catalog_refresh)
@@ -4,19 +4,25 @@ import re
 from pathlib import Path
 from typing import TYPE_CHECKING
 
+import httpx
 import typer
 from rich.console import Console
 from rich.progress import Progress
-from thefuzz import fuzz  # type: ignore[import-untyped]
-
-from opdscli.config import load_config
-from opdscli.http import create_client, stream_download
-from opdscli.opds import (
-    OPDSEntry,
-    crawl_entries,
-    detect_opensearch,
-    perform_opensearch,
+
+from opdscli.cache import ResponseCache, open_cache
+from opdscli.config import AppConfig, load_config
+from opdscli.crawl import DEFAULT_CONCURRENCY, CrawlBudget, crawl_catalog
+from opdscli.fuzzy import top_matches
+from opdscli.http import (
+    OPDSClientError,
+    create_client,
+    part_path,
+    stream_download,
 )
+from opdscli.index import open_index
+from opdscli.opds import OPDSEntry, perform_opensearch
+from opdscli.profile import get_profile
+from opdscli.titles import TitleMap
 
 if TYPE_CHECKING:
     from opdscli.cli import State
@@ -62,6 +68,54 @@ def find_download_link(
     return None, preferred_format
 
 
+def _live_lookup(
+    config: AppConfig,
+    catalog_name: str,
+    client: httpx.Client,
+    title: str,
+    cache: ResponseCache | None,
+    verbose: bool,
+) -> tuple[OPDSEntry | None, list[OPDSEntry]]:
+    """Look *title* up with OpenSearch, falling back to crawling.
+
+    Returns the matching entry, if any, and the entries seen, from
+    which suggestions are drawn when there is no match.  A crawl stops
+    as soon as the title turns up.
+    """
+    opensearch_url = get_profile(
+        config, catalog_name, client,
+    ).opensearch_template
+    if opensearch_url:
+        if verbose:
+            err_console.print("Using server-side OpenSearch.")
+        entries = perform_opensearch(client, opensearch_url, title)
+        return TitleMap(entries).get(title), entries
+    if verbose:
+        err_console.print("No OpenSearch. Crawling locally.")
+    titles = TitleMap()
+
+    def _on_entries(entries: list[OPDSEntry]) -> bool:
+        titles.add(entries)
+        return titles.get(title) is not None
+
+    crawl = crawl_catalog(
+        config.catalogs[catalog_name], max_depth=3,
+        concurrency=config.settings.get(
+            "crawl_concurrency", DEFAULT_CONCURRENCY,
+        ),
+        cache=cache,
+        budget=CrawlBudget.from_settings(config.settings),
+        on_entries=_on_entries,
+    )
+    match = titles.get(title)
+    if match is None and not crawl.complete:
+        err_console.print(
+            f"[yellow]Crawl stopped by its {crawl.stopped_by} budget "
+            f"after {crawl.pages} pages; results are partial.[/yellow]",
+        )
+    return match, crawl.entries
+
+
 def download(
     title: str = typer.Argument(
         help="Exact title of the book to download.",
@@ -76,6 +130,14 @@ def download(
     output: Path | None = typer.Option(
         None, "--output", "-o", help="Output directory.",
     ),
+    connections: int | None = typer.Option(
+        None, "--connections", "-n",
+        help="Parallel connections for large files (default: 4).",
+    ),
+    live: bool = typer.Option(
+        False, "--live",
+        help="Ignore the local index and query the catalog.",
+    ),
 ) -> None:
     """Download a book by exact title match."""
     st = _get_state()
@@ -89,7 +151,8 @@ def download(
         raise typer.Exit(code=1)
 
     cat = config.catalogs[catalog_name]
-    client = create_client(cat)
+    cache = open_cache(config.settings)
+    client = create_client(cat, cache=cache)
     preferred_format = format or config.settings.get(
         "default_format", "epub",
     )
@@ -99,34 +162,27 @@ def download(
             f"Searching catalog '{catalog_name}' for '{title}'...",
         )
 
-    # Try OpenSearch first, fall back to crawling
-    opensearch_url = detect_opensearch(client, cat.url)
-    if opensearch_url:
+    index = open_index()
+    match: OPDSEntry | None = None
+    all_entries: list[OPDSEntry] = []
+    if not live and index.info(catalog_name) is not None:
         if st.verbose:
-            err_console.print("Using server-side OpenSearch.")
-        all_entries = perform_opensearch(
-            client, opensearch_url, title,
-        )
+            err_console.print("Using the local index.")
+        match = index.find_title(catalog_name, title)
+        if match is None:
+            # Retry with full normalization (punctuation, Unicode case).
+            all_entries = index.entries(catalog_name)
+            match = TitleMap(all_entries).get(title)
     else:
-        if st.verbose:
-            err_console.print("No OpenSearch. Crawling locally.")
-        all_entries = crawl_entries(client, cat.url, max_depth=3)
-
-    # Exact match (case-insensitive)
-    match = next(
-        (e for e in all_entries if e.title.lower() == title.lower()),
-        None,
-    )
+        match, all_entries = _live_lookup(
+            config, catalog_name, client, title, cache, st.verbose,
+        )
+    index.close()
 
     if not match:
         err_console.print(f"[red]Book '{title}' not found.[/red]")
-        scored = [
-            (e, fuzz.ratio(title.lower(), e.title.lower()))
-            for e in all_entries
-        ]
-        scored.sort(key=lambda x: x[1], reverse=True)
         suggestions = [
-            e for e, score in scored[:5] if score > 30
+            e for e, _ in top_matches(title, all_entries, 5, min_score=30)
         ]
         if suggestions:
             err_console.print("\nDid you mean:")
@@ -147,12 +203,27 @@ def download(
 
     if st.verbose:
         err_console.print(f"Downloading {download_url} -> {dest_path}")
-
-    with Progress(console=console) as progress:
-        task = progress.add_task(
-            f"Downloading {match.title}", total=None,
-        )
-        stream_download(client, download_url, dest_path, progress, task)
+        if part_path(dest_path).exists():
+            err_console.print("Resuming interrupted download.")
+
+    try:
+        with Progress(console=console) as progress:
+            task = progress.add_task(
+                f"Downloading {match.title}", total=None,
+            )
+            stream_download(
+                client, download_url, dest_path, progress, task,
+                connections=connections or config.settings.get(
+                    "download_connections", 4,
+                ),
+            )
+    except (httpx.HTTPError, OPDSClientError) as e:
+        err_console.print(f"[red]Download failed: {e}[/red]")
+        if part_path(dest_path).exists():
+            err_console.print(
+                "Partial data kept; run the same command to resume.",
+            )
+        raise typer.Exit(code=1) from e
 
     if not st.quiet:
         console.print(f"Saved to {dest_path}")
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+from opdscli.cache import ResponseCache, open_cache
+from opdscli.config import AppConfig, load_config
+from opdscli.crawl import (
+    DEFAULT_CONCURRENCY,
+    CrawlBudget,
+    CrawlCheckpoint,
+    CrawlResult,
+    checkpoint_path,
+    crawl_catalog,
+)
+from opdscli.http import OPDSClientError, create_client
+from opdscli.index import (
+    DEFAULT_UPDATE_PAGES,
+    CatalogIndex,
+    UpdateResult,
+    open_index,
+    update_index,
+)
+from opdscli.profile import get_profile
+
+if TYPE_CHECKING:
+    from opdscli.cli import State
+
+console = Console()
+err_console = Console(stderr=True)
+
+_NO_CATALOG_MSG = (
+    "[red]No catalog specified or default set. "
+    "Use --catalog or set a default.[/red]"
+)
+
+
+def _get_state() -> State:
+    from opdscli.cli import state
+
+    return state
+
+
+def _age(built_at: float) -> str:
+    seconds = max(0.0, time.time() - built_at)
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size:
+            return f"{seconds / size:.0f}{unit} ago"
+    return "just now"
+
+
+def _update(
+    config: AppConfig,
+    catalog_name: str,
+    index: CatalogIndex,
+    cache: ResponseCache | None,
+    max_pages: int,
+) -> UpdateResult | None:
+    """Refresh an index from the new-additions feed.
+
+    Returns None when a full build is needed instead.
+    """
+    st = _get_state()
+    if index.info(catalog_name) is None:
+        err_console.print(
+            f"No index for '{catalog_name}' yet; building it in full.",
+        )
+        return None
+
+    with create_client(config.catalogs[catalog_name], cache=cache) as client:
+        latest_url = get_profile(config, catalog_name, client).latest_url
+        if latest_url is None:
+            err_console.print(
+                f"'{catalog_name}' has no new-additions feed; "
+                "rebuilding in full.",
+            )
+            return None
+        if st.verbose:
+            err_console.print(f"Updating from {latest_url}...")
+        try:
+            result = update_index(
+                client, index, catalog_name, latest_url,
+                max_pages=max_pages,
+            )
+        except (OPDSClientError, ValueError) as e:
+            err_console.print(f"[red]Update failed: {e}[/red]")
+            raise typer.Exit(code=1) from e
+    return result
+
+
+def _print_dry_run(catalog_name: str, crawl: CrawlResult) -> None:
+    console.print(
+        f"Dry run: would index {len(crawl.entries)} entries from "
+        f"{crawl.pages} pages of '{catalog_name}'.",
+    )
+    if crawl.stopped_by is not None:
+        console.print(f"Crawl stopped by its {crawl.stopped_by} budget.")
+    if crawl.duplicate_pages:
+        console.print(
+            f"Skipped {crawl.duplicate_pages} pages repeating an earlier "
+            "listing.",
+        )
+    if not crawl.pruned:
+        console.print("The crawl policy pruned no links.")
+        return
+
+    table = Table(title="Links pruned by the crawl policy")
+    table.add_column("Reason")
+    table.add_column("Links")
+    table.add_column("Examples")
+    for reason, count in crawl.pruned.most_common():
+        table.add_row(
+            reason, str(count), "\n".join(crawl.pruned_samples[reason]),
+        )
+    console.print(table)
+
+
+def index_build(
+    catalog: str | None = typer.Argument(
+        None, help="Catalog to index (default: the default catalog).",
+    ),
+    depth: int = typer.Option(
+        5, "--depth", "-d", help="Max crawl depth.",
+    ),
+    incremental: bool = typer.Option(
+        False, "--incremental", "-i",
+        help="Only fetch additions from the catalog's new-books feed.",
+    ),
+    max_pages: int = typer.Option(
+        DEFAULT_UPDATE_PAGES, "--max-pages",
+        help="Most feed pages an incremental update walks.",
+    ),
+    resume: bool = typer.Option(
+        False, "--resume",
+        help="Continue an interrupted crawl from its last checkpoint.",
+    ),
+    dry_run: bool = typer.Option(
+        False, "--dry-run",
+        help="Crawl without storing; report what the crawl policy prunes.",
+    ),
+) -> None:
+    """Crawl a catalog and store its entries in the local search index."""
+    st = _get_state()
+    config = load_config()
+    catalog_name = catalog or st.catalog or config.default_catalog
+    if not catalog_name or catalog_name not in config.catalogs:
+        err_console.print(_NO_CATALOG_MSG)
+        raise typer.Exit(code=1)
+
+    cat = config.catalogs[catalog_name]
+    cache = open_cache(config.settings)
+    concurrency = config.settings.get(
+        "crawl_concurrency", DEFAULT_CONCURRENCY,
+    )
+    budget = CrawlBudget.from_settings(config.settings)
+
+    if dry_run:
+        crawl = crawl_catalog(
+            cat, max_depth=depth, concurrency=concurrency,
+            cache=cache, budget=budget,
+        )
+        _print_dry_run(catalog_name, crawl)
+        return
+
+    index = open_index()
+    started = time.monotonic()
+    result = _update(
+        config, catalog_name, index, cache, max_pages,
+    ) if incremental else None
+    if result is not None:
+        index.close()
+        if not st.quiet:
+            console.print(
+                f"Updated {result.changed} entries from {result.pages} "
+                f"pages of '{catalog_name}' "
+                f"in {time.monotonic() - started:.1f}s.",
+            )
+        return
+
+    checkpoint = CrawlCheckpoint(checkpoint_path(catalog_name))
+    if not resume:
+        checkpoint.clear()
+    if st.verbose:
+        err_console.print(
+            f"Crawling catalog '{catalog_name}' (depth={depth})...",
+        )
+    try:
+        crawl = crawl_catalog(
+            cat, max_depth=depth, concurrency=concurrency,
+            cache=cache, checkpoint=checkpoint, budget=budget,
+        )
+    except KeyboardInterrupt:
+        checkpoint.close()
+        err_console.print(
+            "[yellow]Crawl interrupted. Run the same command with "
+            "--resume to continue.[/yellow]",
+        )
+        raise typer.Exit(code=130) from None
+    if not crawl.entries:
+        # A failed crawl must not wipe out a good index.
+        index.close()
+        checkpoint.close()
+        err_console.print(
+            f"[red]Crawl of '{catalog_name}' found no entries "
+            f"({crawl.failed_pages} of {crawl.pages} pages failed); "
+            "the index was left unchanged.[/red]",
+        )
+        raise typer.Exit(code=1)
+    if crawl.complete:
+        stored = index.replace(catalog_name, cat.url, crawl.entries)
+        checkpoint.discard()
+    elif (existing := index.info(catalog_name)) is not None:
+        # Add what the partial crawl found rather than dropping the
+        # entries it didn't reach.
+        index.upsert(catalog_name, crawl.entries)
+        stored = (index.info(catalog_name) or existing).entries
+        checkpoint.close()
+        err_console.print(
+            f"[yellow]Crawl stopped by its {crawl.stopped_by} budget "
+            f"after {crawl.pages} pages; its entries were merged into "
+            "the existing index. Run the same command with --resume to "
+            "continue.[/yellow]",
+        )
+    else:
+        stored = index.replace(catalog_name, cat.url, crawl.entries)
+        checkpoint.close()
+        err_console.print(
+            f"[yellow]Crawl stopped by its {crawl.stopped_by} budget "
+            f"after {crawl.pages} pages; the index is partial. Run the "
+            "same command with --resume to continue.[/yellow]",
+        )
+    index.close()
+
+    if not st.quiet:
+        console.print(
+            f"Indexed {stored} entries from '{catalog_name}' "
+            f"in {time.monotonic() - started:.1f}s.",
+        )
+
+
+def index_list() -> None:
+    """Show which catalogs have a local search index."""
+    index = open_index()
+    infos = index.catalogs()
+    index.close()
+
+    if not infos:
+        console.print(
+            "No catalogs indexed. Use 'opdscli index build' to create one.",
+        )
+        return
+
+    table = Table(title="Local index")
+    table.add_column("Catalog")
+    table.add_column("Entries")
+    table.add_column("Built")
+    for info in infos:
+        table.add_row(info.catalog, str(info.entries), _age(info.built_at))
+    console.print(table)
+
+
+def index_remove(
+    catalog: str = typer.Argument(help="Catalog whose index to drop."),
+) -> None:
+    """Drop a catalog from the local search index."""
+    index = open_index()
+    index.remove(catalog)
+    index.close()
+    if not _get_state().quiet:
+        console.print(f"Removed index for '{catalog}'")
+
+
+def register(index_app: typer.Typer) -> None:
+    """Register all index subcommands."""
+    index_app.command("build")(index_build)
+    index_app.command("list")(index_list)
+    index_app.command("remove")(index_remove)
@@ -1,14 +1,19 @@
 from __future__ import annotations
 
+import time
 from typing import TYPE_CHECKING
 
+import httpx
 import typer
 from rich.console import Console
 from rich.table import Table
 
+from opdscli.cache import open_cache
 from opdscli.config import load_config
-from opdscli.http import OPDSClientError, create_client, fetch_url
-from opdscli.opds import fetch_entries, parse_feed
+from opdscli.http import OPDSClientError, create_client
+from opdscli.opds import DEFAULT_LATEST_PAGES, OPDSEntry, latest_entries
+from opdscli.profile import get_profile
+from opdscli.watermark import Watermark, load_watermarks, save_watermarks
 
 if TYPE_CHECKING:
     from opdscli.cli import State
@@ -28,12 +33,71 @@ def _get_state() -> State:
     return state
 
 
+def _format_list(entry: OPDSEntry) -> str:
+    return ", ".join(entry.formats) if entry.formats else "unknown"
+
+
+def _print_table(entries: list[OPDSEntry]) -> None:
+    table = Table(title="Latest additions")
+    table.add_column("Title")
+    table.add_column("Author")
+    table.add_column("Format")
+
+    for entry in entries:
+        table.add_row(entry.title, entry.author, _format_list(entry))
+
+    console.print(table)
+
+
+def _new_entries(
+    client: httpx.Client,
+    catalog_name: str,
+    feed_url: str,
+    limit: int,
+    max_pages: int,
+) -> list[OPDSEntry]:
+    """Entries newer than the catalog's watermark, which is advanced.
+
+    Only the first run, which sets the mark, is capped at *limit*:
+    the mark moves past everything reported, so capping later runs
+    would drop the older arrivals for good.
+    """
+    marks = load_watermarks()
+    mark = marks.get(catalog_name)
+    entries = latest_entries(
+        client, feed_url, None if mark else limit, max_pages=max_pages,
+        since=mark.updated if mark else None,
+    )
+    if mark is not None:
+        entries = [e for e in entries if mark.is_new(e)]
+    if entries:
+        marks[catalog_name] = (mark or Watermark(updated=0.0)).advance(
+            entries,
+        )
+        save_watermarks(marks)
+    return entries
+
+
 def latest(
     catalog: str | None = typer.Option(
         None, "--catalog", "-c", help="Catalog to browse.",
     ),
     limit: int = typer.Option(
-        20, "--limit", "-l", help="Number of entries to show.",
+        20, "--limit", "-l", min=1,
+        help="Number of entries to show; later --since-last runs show all.",
+    ),
+    max_pages: int = typer.Option(
+        DEFAULT_LATEST_PAGES, "--max-pages",
+        help="Most feed pages to walk looking for newer entries.",
+    ),
+    since_last: bool = typer.Option(
+        False, "--since-last",
+        help="Only show entries newer than the last --since-last run.",
+    ),
+    watch: float | None = typer.Option(
+        None, "--watch", min=1,
+        help="Poll every INTERVAL seconds and print new entries.",
+        metavar="INTERVAL",
     ),
 ) -> None:
     """Show latest additions to a catalog."""
@@ -45,44 +109,55 @@ def latest(
         raise typer.Exit(code=1)
 
     cat = config.catalogs[catalog_name]
-    client = create_client(cat)
+    # Watching revalidates the feed on every poll, so an unchanged
+    # feed costs a 304 rather than a download.
+    cache = open_cache(
+        config.settings, ttl=0.0 if watch is not None else None,
+    )
+    client = create_client(cat, cache=cache)
 
     if st.verbose:
         err_console.print(f"Fetching latest from '{catalog_name}'...")
 
-    # Look for a "latest" / "new" navigation link in the root feed
-    feed_url = cat.url
-    try:
-        root_xml = fetch_url(client, feed_url)
-        _, nav_links, _ = parse_feed(root_xml, base_url=feed_url)
-        for nav in nav_links:
-            title_lower = nav.title.lower()
-            if (
-                "latest" in title_lower
-                or "new" in title_lower
-                or "recent" in title_lower
-                or nav.rel == "http://opds-spec.org/sort/new"
-            ):
-                feed_url = nav.href
-                break
-    except (OPDSClientError, ValueError):
-        pass
-
-    entries = fetch_entries(client, feed_url)
-    entries.sort(key=lambda e: e.updated or "", reverse=True)
-    entries = entries[:limit]
+    profile = get_profile(config, catalog_name, client)
+    feed_url = profile.latest_url or cat.url
+
+    if watch is not None:
+        try:
+            while True:
+                try:
+                    new = _new_entries(
+                        client, catalog_name, feed_url, limit, max_pages,
+                    )
+                except (OPDSClientError, ValueError) as e:
+                    # Keep watching; the next poll may succeed.
+                    err_console.print(f"[yellow]Poll failed: {e}[/yellow]")
+                    new = []
+                for entry in new:
+                    console.print(
+                        f"{entry.title} — {entry.author} "
+                        f"({_format_list(entry)})",
+                        markup=False, highlight=False,
+                    )
+                time.sleep(watch)
+        except KeyboardInterrupt:
+            return
+
+    if since_last:
+        entries = _new_entries(
+            client, catalog_name, feed_url, limit, max_pages,
+        )
+        if not entries:
+            if not st.quiet:
+                console.print("No new entries.")
+            return
+    else:
+        entries = latest_entries(
+            client, feed_url, limit, max_pages=max_pages,
+        )
 
     if not entries:
         console.print("No entries found.")
         return
 
-    table = Table(title="Latest additions")
-    table.add_column("Title")
-    table.add_column("Author")
-    table.add_column("Format")
-
-    for entry in entries:
-        formats = ", ".join(entry.formats) if entry.formats else "unknown"
-        table.add_row(entry.title, entry.author, formats)
-
-    console.print(table)
+    _print_table(entries)
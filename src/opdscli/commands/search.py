@@ -1,14 +1,27 @@
 from __future__ import annotations
 
+import dataclasses
 from typing import TYPE_CHECKING
 
 import typer
 from rich.console import Console
 from rich.table import Table
 
-from opdscli.config import load_config
+from opdscli.cache import ResponseCache, open_cache
+from opdscli.config import AppConfig, load_config
+from opdscli.crawl import (
+    DEFAULT_CONCURRENCY,
+    CrawlBudget,
+    EntryCallback,
+    crawl_catalog,
+)
+from opdscli.federated import merge_results, search_catalogs
+from opdscli.fuzzy import partial_ratio, top_matches
 from opdscli.http import create_client
-from opdscli.opds import crawl_entries, detect_opensearch, perform_opensearch
+from opdscli.index import CatalogIndex, open_index
+from opdscli.opds import DEFAULT_SEARCH_LIMIT, OPDSEntry, perform_opensearch
+from opdscli.profile import get_profile
+from opdscli.rank import corpus_stats, matcher, rank_entries, tokenize
 
 if TYPE_CHECKING:
     from opdscli.cli import State
@@ -16,6 +29,10 @@ if TYPE_CHECKING:
 console = Console()
 err_console = Console(stderr=True)
 
+DEFAULT_FUZZY_RESULTS = 20
+FUZZY_MIN_SCORE = 60
+DEFAULT_SEARCH_TIMEOUT = 30.0
+
 _NO_CATALOG_MSG = (
     "[red]No catalog specified or default set. "
     "Use --catalog or set a default.[/red]"
@@ -28,56 +45,295 @@ def _get_state() -> State:
     return state
 
 
+def _format_list(entry: OPDSEntry) -> str:
+    return ", ".join(entry.formats) if entry.formats else "unknown"
+
+
+def _print_line(entry: OPDSEntry) -> None:
+    console.print(
+        f"{entry.title} — {entry.author} ({_format_list(entry)})",
+        markup=False, highlight=False,
+    )
+
+
+def _crawl(
+    config: AppConfig,
+    catalog_name: str,
+    cache: ResponseCache | None,
+    depth: int,
+    on_entries: EntryCallback | None = None,
+    seconds: float | None = None,
+) -> list[OPDSEntry]:
+    budget = CrawlBudget.from_settings(config.settings)
+    if seconds is not None:
+        budget = dataclasses.replace(
+            budget, seconds=min(budget.seconds or seconds, seconds),
+        )
+    crawl = crawl_catalog(
+        config.catalogs[catalog_name], max_depth=depth,
+        concurrency=config.settings.get(
+            "crawl_concurrency", DEFAULT_CONCURRENCY,
+        ),
+        cache=cache,
+        budget=budget,
+        on_entries=on_entries,
+    )
+    if crawl.stopped_by not in (None, "caller"):
+        err_console.print(
+            f"[yellow]Crawl of '{catalog_name}' stopped by its "
+            f"{crawl.stopped_by} budget after {crawl.pages} pages; "
+            "results are partial.[/yellow]",
+        )
+    return crawl.entries
+
+
+def _search_catalog(
+    config: AppConfig,
+    catalog_name: str,
+    query: str,
+    index: CatalogIndex,
+    cache: ResponseCache | None,
+    *,
+    depth: int,
+    live: bool,
+    fuzzy: bool,
+    limit: int | None,
+    stream: bool = False,
+    timeout: float | None = None,
+) -> list[OPDSEntry]:
+    """Search one catalog: its local index, then OpenSearch, then a crawl.
+
+    With *stream*, results are also printed as they are found.
+    """
+    verbose = _get_state().verbose
+    indexed = not live and index.info(catalog_name) is not None
+    client = create_client(
+        config.catalogs[catalog_name],
+        timeout=timeout or DEFAULT_SEARCH_TIMEOUT,
+        cache=cache,
+    )
+    with client:
+        # Prefer the local index, then server-side OpenSearch
+        opensearch_url = None if indexed or fuzzy else get_profile(
+            config, catalog_name, client,
+        ).opensearch_template
+        if fuzzy:
+            # Typo-tolerant matching needs the entries themselves, so
+            # it runs over the index or a crawl, never OpenSearch.
+            candidates = index.entries(catalog_name) if indexed else _crawl(
+                config, catalog_name, cache, depth, seconds=timeout,
+            )
+            entries = [
+                e for e, _ in top_matches(
+                    query, candidates, limit or DEFAULT_FUZZY_RESULTS,
+                    scorer=partial_ratio, min_score=FUZZY_MIN_SCORE,
+                )
+            ]
+        elif indexed:
+            if verbose:
+                err_console.print("Using the local index.")
+            entries = index.search(catalog_name, query, limit=limit)
+        elif opensearch_url:
+            if verbose:
+                err_console.print("Using server-side OpenSearch.")
+            entries = perform_opensearch(
+                client, opensearch_url, query,
+                limit=limit or DEFAULT_SEARCH_LIMIT,
+            )
+        else:
+            if verbose:
+                err_console.print(
+                    f"No OpenSearch. Crawling locally (depth={depth}).",
+                )
+            matches = matcher(query)
+            found: list[OPDSEntry] = []
+            on_entries: EntryCallback | None = None
+            if limit is not None or stream:
+                # Match pages as they arrive, to stop the crawl at
+                # *limit* matches or print them straight away.
+                def on_entries(page_entries: list[OPDSEntry]) -> bool:
+                    for entry in page_entries:
+                        if limit is not None and len(found) >= limit:
+                            break
+                        if matches(entry):
+                            found.append(entry)
+                            if stream:
+                                _print_line(entry)
+                    return limit is not None and len(found) >= limit
+
+            crawled = _crawl(
+                config, catalog_name, cache, depth, on_entries,
+                seconds=timeout,
+            )
+            if on_entries is None:
+                found = [entry for entry in crawled if matches(entry)]
+            # Matches were printed by the callback as they came in.
+            return rank_entries(
+                found, query, k=limit, stats=corpus_stats(crawled, query),
+            )
+    if stream:
+        for entry in entries:
+            _print_line(entry)
+    return entries
+
+
+def _search_federated(
+    config: AppConfig,
+    names: list[str],
+    query: str,
+    cache: ResponseCache | None,
+    *,
+    depth: int,
+    live: bool,
+    fuzzy: bool,
+    limit: int | None,
+    timeout: float,
+) -> None:
+    """Search several catalogs at once and print one merged table."""
+
+    def _search(name: str) -> list[OPDSEntry]:
+        # Each search opens its own index: one abandoned at the
+        # deadline may still be using it after the others return.
+        index = open_index()
+        try:
+            return _search_catalog(
+                config, name, query, index, cache,
+                depth=depth, live=live, fuzzy=fuzzy, limit=limit,
+                timeout=timeout,
+            )
+        finally:
+            index.close()
+
+    if _get_state().verbose:
+        err_console.print(
+            f"Searching {len(names)} catalogs for '{query}'...",
+        )
+    results, errors = search_catalogs(names, _search, timeout=timeout)
+    for name, error in errors.items():
+        err_console.print(f"[yellow]{name}: {error}[/yellow]")
+    hits = merge_results(results)[:limit]
+    if not hits:
+        console.print("No results found.")
+        return
+
+    table = Table(title=f"Search results for '{query}'")
+    table.add_column("Title")
+    table.add_column("Author")
+    table.add_column("Format")
+    table.add_column("Catalog")
+    for hit in hits:
+        table.add_row(
+            hit.entry.title, hit.entry.author, _format_list(hit.entry),
+            ", ".join(hit.catalogs),
+        )
+    console.print(table)
+
+
+def _catalog_names(
+    config: AppConfig, all_catalogs: bool, catalogs: str | None,
+) -> list[str]:
+    if all_catalogs:
+        return list(config.catalogs)
+    names = [n.strip() for n in (catalogs or "").split(",") if n.strip()]
+    unknown = [n for n in names if n not in config.catalogs]
+    if unknown:
+        err_console.print(
+            f"[red]Unknown catalog(s): {', '.join(unknown)}[/red]",
+        )
+        raise typer.Exit(code=1)
+    return names
+
+
 def search(
     query: str = typer.Argument(help="Search query."),
     catalog: str | None = typer.Option(
         None, "--catalog", "-c", help="Catalog to search.",
     ),
+    all_catalogs: bool = typer.Option(
+        False, "--all", help="Search every configured catalog at once.",
+    ),
+    catalogs: str | None = typer.Option(
+        None, "--catalogs",
+        help="Comma-separated catalogs to search at once.",
+    ),
     depth: int = typer.Option(
         3, "--depth", "-d",
         help="Max crawl depth for local search.",
     ),
+    live: bool = typer.Option(
+        False, "--live",
+        help="Ignore the local index and query the catalog.",
+    ),
+    limit: int | None = typer.Option(
+        None, "--limit", "-n", min=1,
+        help="Stop after this many results.",
+    ),
+    stream: bool = typer.Option(
+        False, "--stream",
+        help="Print results as soon as they are found.",
+    ),
+    fuzzy: bool = typer.Option(
+        False, "--fuzzy",
+        help="Tolerate typos; rank titles and authors by similarity.",
+    ),
+    timeout: float | None = typer.Option(
+        None, "--timeout",
+        help="Seconds to wait for each catalog when searching several.",
+    ),
 ) -> None:
     """Search for books in a catalog."""
     st = _get_state()
+    if not fuzzy and not tokenize(query):
+        # Nothing to match: a crawl would stream or rank the whole
+        # catalog only to report nothing found.
+        err_console.print(
+            f"[red]Query '{query}' has no words to search for.[/red]",
+        )
+        raise typer.Exit(code=1)
     config = load_config()
+    cache = open_cache(config.settings)
+
+    if all_catalogs or catalogs:
+        names = _catalog_names(config, all_catalogs, catalogs)
+        if not names:
+            err_console.print("[red]No catalogs configured.[/red]")
+            raise typer.Exit(code=1)
+        if stream:
+            err_console.print(
+                "[red]--stream works with a single catalog.[/red]",
+            )
+            raise typer.Exit(code=1)
+        _search_federated(
+            config, names, query, cache,
+            depth=depth, live=live, fuzzy=fuzzy, limit=limit,
+            timeout=timeout or float(config.settings.get(
+                "search_timeout", DEFAULT_SEARCH_TIMEOUT,
+            )),
+        )
+        return
+
     catalog_name = catalog or st.catalog or config.default_catalog
     if not catalog_name or catalog_name not in config.catalogs:
         err_console.print(_NO_CATALOG_MSG)
         raise typer.Exit(code=1)
 
-    cat = config.catalogs[catalog_name]
-    client = create_client(cat)
-
     if st.verbose:
         err_console.print(
             f"Searching catalog '{catalog_name}' for '{query}'...",
         )
 
-    # Try server-side OpenSearch first
-    opensearch_url = detect_opensearch(client, cat.url)
-    if opensearch_url:
-        if st.verbose:
-            err_console.print("Using server-side OpenSearch.")
-        entries = perform_opensearch(client, opensearch_url, query)
-    else:
-        if st.verbose:
-            err_console.print(
-                f"No OpenSearch. Crawling locally (depth={depth}).",
-            )
-        all_entries = crawl_entries(client, cat.url, max_depth=depth)
-        query_lower = query.lower()
-        entries = [
-            e
-            for e in all_entries
-            if query_lower in e.title.lower()
-            or query_lower in e.author.lower()
-            or query_lower in e.summary.lower()
-        ]
+    index = open_index()
+    entries = _search_catalog(
+        config, catalog_name, query, index, cache,
+        depth=depth, live=live, fuzzy=fuzzy, limit=limit, stream=stream,
+    )
+    index.close()
 
     if not entries:
         console.print("No results found.")
         return
+    if stream:
+        return
 
     table = Table(title=f"Search results for '{query}'")
     table.add_column("Title")
@@ -85,7 +341,6 @@ def search(
     table.add_column("Format")
 
     for entry in entries:
-        formats = ", ".join(entry.formats) if entry.formats else "unknown"
-        table.add_row(entry.title, entry.author, formats)
+        table.add_row(entry.title, entry.author, _format_list(entry))
 
     console.print(table)
@@ -1,6 +1,7 @@
 import os
 import stat
 import sys
+import time
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
@@ -40,22 +41,140 @@ class AuthConfig:
         )
 
 
+@dataclass
+class ThrottleConfig:
+    rate: float | None = None  # requests per second per host; None = unlimited
+    burst: int = 1
+    max_retries: int = 2
+    backoff: float = 0.5  # seconds before the first retry, doubled each time
+    max_backoff: float = 30.0
+
+    def to_dict(self) -> dict[str, Any]:
+        d: dict[str, Any] = {}
+        if self.rate is not None:
+            d["rate"] = self.rate
+        d["burst"] = self.burst
+        d["max_retries"] = self.max_retries
+        d["backoff"] = self.backoff
+        d["max_backoff"] = self.max_backoff
+        return d
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "ThrottleConfig":
+        rate = data.get("rate")
+        return cls(
+            rate=float(rate) if rate is not None else None,
+            burst=int(data.get("burst", 1)),
+            max_retries=int(data.get("max_retries", 2)),
+            backoff=float(data.get("backoff", 0.5)),
+            max_backoff=float(data.get("max_backoff", 30.0)),
+        )
+
+
+@dataclass
+class CrawlPolicyConfig:
+    sort: str = "new"  # ordering to crawl: "new", "popular", ... or "all"
+    follow_facets: bool = False
+    skip_patterns: list[str] = field(default_factory=list)  # URL regexes
+
+    def to_dict(self) -> dict[str, Any]:
+        d: dict[str, Any] = {
+            "sort": self.sort,
+            "follow_facets": self.follow_facets,
+        }
+        if self.skip_patterns:
+            d["skip_patterns"] = self.skip_patterns
+        return d
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "CrawlPolicyConfig":
+        return cls(
+            sort=str(data.get("sort", "new")),
+            follow_facets=bool(data.get("follow_facets", False)),
+            skip_patterns=list(data.get("skip_patterns", [])),
+        )
+
+
+@dataclass
+class CatalogProfile:
+    """Capabilities discovered from a catalog, cached to skip probing."""
+
+    discovered_at: float  # unix timestamp
+    opensearch_template: str | None = None
+    latest_url: str | None = None
+    pagination: str = "none"  # "next" when feeds page with rel="next"
+    facet_groups: list[str] = field(default_factory=list)
+    mime_types: list[str] = field(default_factory=list)
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time() - self.discovered_at < ttl
+
+    def to_dict(self) -> dict[str, Any]:
+        d: dict[str, Any] = {"discovered_at": self.discovered_at}
+        if self.opensearch_template is not None:
+            d["opensearch_template"] = self.opensearch_template
+        if self.latest_url is not None:
+            d["latest_url"] = self.latest_url
+        d["pagination"] = self.pagination
+        d["facet_groups"] = self.facet_groups
+        d["mime_types"] = self.mime_types
+        return d
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "CatalogProfile":
+        return cls(
+            discovered_at=float(data.get("discovered_at", 0.0)),
+            opensearch_template=data.get("opensearch_template"),
+            latest_url=data.get("latest_url"),
+            pagination=data.get("pagination", "none"),
+            facet_groups=list(data.get("facet_groups", [])),
+            mime_types=list(data.get("mime_types", [])),
+        )
+
+
 @dataclass
 class CatalogConfig:
     url: str
     auth: AuthConfig | None = None
+    throttle: ThrottleConfig | None = None
+    crawl_policy: CrawlPolicyConfig | None = None
+    profile: CatalogProfile | None = None
 
     def to_dict(self) -> dict[str, Any]:
         d: dict[str, Any] = {"url": self.url}
         if self.auth is not None:
             d["auth"] = self.auth.to_dict()
+        if self.throttle is not None:
+            d["throttle"] = self.throttle.to_dict()
+        if self.crawl_policy is not None:
+            d["crawl_policy"] = self.crawl_policy.to_dict()
+        if self.profile is not None:
+            d["profile"] = self.profile.to_dict()
         return d
 
     @classmethod
     def from_dict(cls, data: dict[str, Any]) -> "CatalogConfig":
         auth_data = data.get("auth")
         auth = AuthConfig.from_dict(auth_data) if auth_data else None
-        return cls(url=data["url"], auth=auth)
+        throttle_data = data.get("throttle")
+        throttle = (
+            ThrottleConfig.from_dict(throttle_data) if throttle_data else None
+        )
+        policy_data = data.get("crawl_policy")
+        crawl_policy = (
+            CrawlPolicyConfig.from_dict(policy_data) if policy_data else None
+        )
+        profile_data = data.get("profile")
+        profile = (
+            CatalogProfile.from_dict(profile_data) if profile_data else None
+        )
+        return cls(
+            url=data["url"],
+            auth=auth,
+            throttle=throttle,
+            crawl_policy=crawl_policy,
+            profile=profile,
+        )
 
 
 @dataclass
@@ -115,13 +234,20 @@ def load_config(path: Path | None = None) -> AppConfig:
 
 
 def save_config(config: AppConfig, path: Path | None = None) -> None:
-    """Save config to YAML file."""
+    """Save config to YAML file, replacing it atomically.
+
+    The file holds credentials, so a write cut short (by a process
+    exiting mid-save, say) must not leave it truncated.
+    """
     config_path = path or CONFIG_PATH
     config_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = config_path.with_name(config_path.name + ".tmp")
 
-    with open(config_path, "w") as f:
+    with open(tmp, "w") as f:
+        # Set restrictive permissions before any secret is written
+        if sys.platform != "win32":
+            os.chmod(tmp, stat.S_IRUSR | stat.S_IWUSR)
         yaml.dump(config.to_dict(), f, default_flow_style=False, sort_keys=False)
-
-    # Set restrictive permissions on newly created files
-    if sys.platform != "win32":
-        os.chmod(config_path, stat.S_IRUSR | stat.S_IWUSR)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, config_path)
@@ -0,0 +1,574 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import re
+import sqlite3
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from opdscli.cache import ResponseCache
+from opdscli.config import CatalogConfig, CrawlPolicyConfig
+from opdscli.http import (
+    OPDSClientError,
+    create_async_client,
+    fetch_bytes_async,
+)
+from opdscli.opds import (
+    FACET_REL,
+    SORT_REL_PREFIX,
+    NavigationLink,
+    NextPage,
+    OPDSEntry,
+    iter_feed,
+)
+from opdscli.urls import VisitedUrls, canonical_url, url_digest
+
+DEFAULT_CONCURRENCY = 8
+
+# Receives each page's newly found entries; returns True to stop.
+EntryCallback = Callable[[list[OPDSEntry]], bool]
+DEFAULT_CHECKPOINT_EVERY = 50
+PRUNED_SAMPLES = 3
+
+CHECKPOINT_DIR = Path.home() / ".cache" / "opdscli" / "crawls"
+
+_CHECKPOINT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    feed_url TEXT NOT NULL,
+    max_depth INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS depths (
+    url TEXT PRIMARY KEY,
+    depth INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    entries TEXT NOT NULL,
+    nav_urls TEXT NOT NULL,
+    next_url TEXT
+);
+"""
+
+
+@dataclass
+class _Page:
+    entries: list[OPDSEntry] = field(default_factory=list)
+    nav_urls: list[str] = field(default_factory=list)
+    next_url: str | None = None
+    size: int = 0
+    pruned: list[tuple[str, str]] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class CrawlPolicy:
+    """Which navigation links a crawl follows.
+
+    Facet links and alternate sort orders present the same books
+    again, so by default a crawl skips facets and, where a page offers
+    several ``sort/*`` links, follows only the preferred ordering (or
+    the first one offered).  URLs matching a skip pattern are never
+    followed.
+    """
+
+    sort: str = "new"
+    follow_facets: bool = False
+    skip_patterns: tuple[re.Pattern[str], ...] = ()
+
+    @classmethod
+    def from_config(cls, config: CrawlPolicyConfig | None) -> "CrawlPolicy":
+        if config is None:
+            return cls()
+        return cls(
+            sort=config.sort,
+            follow_facets=config.follow_facets,
+            skip_patterns=tuple(re.compile(p) for p in config.skip_patterns),
+        )
+
+    def select(
+        self, links: list[NavigationLink],
+    ) -> tuple[list[NavigationLink], list[tuple[str, str]]]:
+        """Split *links* into those to follow and (href, reason) pruned."""
+        sorts = [
+            link for link in links if link.rel.startswith(SORT_REL_PREFIX)
+        ]
+        chosen = None
+        if sorts and self.sort != "all":
+            chosen = next(
+                (s for s in sorts if s.rel == SORT_REL_PREFIX + self.sort),
+                sorts[0],
+            )
+
+        kept: list[NavigationLink] = []
+        pruned: list[tuple[str, str]] = []
+        for link in links:
+            if link.rel == FACET_REL and not self.follow_facets:
+                pruned.append((link.href, "facet"))
+            elif (
+                chosen is not None
+                and link.rel.startswith(SORT_REL_PREFIX)
+                and link is not chosen
+            ):
+                pruned.append((link.href, "alternate sort"))
+            elif any(p.search(link.href) for p in self.skip_patterns):
+                pruned.append((link.href, "skip pattern"))
+            else:
+                kept.append(link)
+        return kept, pruned
+
+
+@dataclass(frozen=True)
+class CrawlBudget:
+    """Limits on the work one crawl may do; None means unlimited."""
+
+    pages: int | None = None
+    entries: int | None = None
+    size: int | None = None  # bytes of feed data
+    seconds: float | None = None
+
+    @classmethod
+    def from_settings(cls, settings: dict[str, Any]) -> "CrawlBudget":
+        """Read the ``crawl_budget`` setting (size given in ``size_mb``)."""
+        data = settings.get("crawl_budget") or {}
+        size_mb = data.get("size_mb")
+        return cls(
+            pages=data.get("pages"),
+            entries=data.get("entries"),
+            size=None if size_mb is None else int(size_mb * (1 << 20)),
+            seconds=data.get("seconds"),
+        )
+
+    def exhausted(self, pages: int, entries: int, size: int) -> str | None:
+        """Name the first limit that *pages*, *entries* or *size* reach."""
+        if self.pages is not None and pages >= self.pages:
+            return "pages"
+        if self.entries is not None and entries >= self.entries:
+            return "entries"
+        if self.size is not None and size >= self.size:
+            return "size"
+        return None
+
+
+@dataclass
+class CrawlResult:
+    entries: list[OPDSEntry] = field(default_factory=list)
+    pages: int = 0  # pages fetched by this run
+    size: int = 0  # bytes fetched by this run
+    stopped_by: str | None = None  # the budget that ran out, if any
+    pruned: Counter[str] = field(default_factory=Counter)  # by reason
+    pruned_samples: dict[str, list[str]] = field(default_factory=dict)
+    duplicate_pages: int = 0  # pages repeating an earlier listing
+    failed_pages: int = 0  # pages that couldn't be fetched or parsed
+
+    def record_pruned(self, href: str, reason: str) -> None:
+        self.pruned[reason] += 1
+        samples = self.pruned_samples.setdefault(reason, [])
+        if len(samples) < PRUNED_SAMPLES:
+            samples.append(href)
+
+    @property
+    def complete(self) -> bool:
+        return self.stopped_by is None
+
+
+class CrawlCheckpoint:
+    """On-disk snapshot of a crawl, so an interrupted crawl can resume.
+
+    Records every discovered URL with its depth and every page fetched
+    successfully.  Writes are batched and committed every *every*
+    pages, and whenever the crawl stops, even by an exception.  On
+    resume, discovered URLs without a stored page form the frontier;
+    pages that failed are retried.
+    """
+
+    def __init__(
+        self, path: Path, every: int = DEFAULT_CHECKPOINT_EVERY,
+    ) -> None:
+        self.path = path
+        self.every = max(1, every)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.executescript(_CHECKPOINT_SCHEMA)
+        self._depths: dict[str, int] = {}
+        self._pages: dict[str, _Page] = {}
+
+    def load(
+        self, feed_url: str, max_depth: int,
+    ) -> tuple[dict[str, _Page | None], dict[str, int]]:
+        """Return the stored (pages, depths) of a crawl of *feed_url*.
+
+        A checkpoint of a different crawl is discarded.
+        """
+        row = self._db.execute(
+            "SELECT feed_url, max_depth FROM meta",
+        ).fetchone()
+        if row != (feed_url, max_depth):
+            self.clear()
+            with self._db:
+                self._db.execute(
+                    "INSERT INTO meta VALUES (?, ?)", (feed_url, max_depth),
+                )
+            return {}, {}
+        depths = dict(self._db.execute("SELECT url, depth FROM depths"))
+        pages: dict[str, _Page | None] = {
+            url: _Page(
+                entries=[OPDSEntry.from_dict(e) for e in json.loads(entries)],
+                nav_urls=json.loads(nav_urls),
+                next_url=next_url,
+            )
+            for url, entries, nav_urls, next_url in self._db.execute(
+                "SELECT url, entries, nav_urls, next_url FROM pages",
+            )
+        }
+        return pages, depths
+
+    def discovered(self, url: str, depth: int) -> None:
+        self._depths[url] = depth
+
+    def fetched(self, url: str, page: _Page | None) -> None:
+        if page is not None:
+            self._pages[url] = page
+            if len(self._pages) >= self.every:
+                self.flush()
+
+    def flush(self) -> None:
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO depths VALUES (?, ?)",
+                self._depths.items(),
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)",
+                (
+                    (
+                        url,
+                        json.dumps([e.to_dict() for e in page.entries]),
+                        json.dumps(page.nav_urls),
+                        page.next_url,
+                    )
+                    for url, page in self._pages.items()
+                ),
+            )
+        self._depths.clear()
+        self._pages.clear()
+
+    def clear(self) -> None:
+        self._depths.clear()
+        self._pages.clear()
+        with self._db:
+            for table in ("meta", "depths", "pages"):
+                self._db.execute(f"DELETE FROM {table}")
+
+    def close(self) -> None:
+        self._db.close()
+
+    def discard(self) -> None:
+        """Close and delete the checkpoint once the crawl completed."""
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+
+def checkpoint_path(catalog_name: str) -> Path:
+    """Where the checkpoint of a crawl of *catalog_name* is kept."""
+    digest = hashlib.sha256(catalog_name.encode()).hexdigest()[:16]
+    return CHECKPOINT_DIR / f"{digest}.sqlite"
+
+
+async def _fetch_page(
+    client: httpx.AsyncClient, url: str, policy: CrawlPolicy,
+) -> _Page | None:
+    """Fetch and parse one feed page, or None if it failed."""
+    page = _Page()
+    links: list[NavigationLink] = []
+    try:
+        data = await fetch_bytes_async(client, url)
+        page.size = len(data)
+        for item in iter_feed(data, base_url=url):
+            if isinstance(item, OPDSEntry):
+                page.entries.append(item)
+            elif isinstance(item, NextPage):
+                page.next_url = item.href
+            else:
+                links.append(item)
+    except (OPDSClientError, ValueError):
+        return None
+    kept, page.pruned = policy.select(links)
+    page.nav_urls = [link.href for link in kept]
+    return page
+
+
+def _fingerprint(entries: list[OPDSEntry]) -> int | None:
+    """Digest of the set of entry ids on a page, if it has any."""
+    ids = sorted({e.entry_id for e in entries if e.entry_id})
+    if not ids:
+        return None
+    digest = hashlib.blake2b(digest_size=8)
+    for entry_id in ids:
+        digest.update(entry_id.encode())
+        digest.update(b"\0")
+    return int.from_bytes(digest.digest(), "little")
+
+
+def _entry_key(entry: OPDSEntry) -> str | None:
+    if entry.entry_id:
+        return entry.entry_id
+    if entry.acquisition_links:
+        return entry.acquisition_links[0].href
+    return None
+
+
+def _flatten(
+    pages: dict[int, _Page | None], feed_url: str, max_depth: int,
+) -> list[OPDSEntry]:
+    """Flatten fetched pages in the order a depth-first crawl visits them.
+
+    *pages* is keyed by :func:`url_digest`.  An entry listed on several
+    pages is kept where it first appears.
+    """
+    entries: list[OPDSEntry] = []
+    seen: set[str] = set()
+    visited = VisitedUrls(len(pages))
+    stack = [(feed_url, 0)]
+    while stack:
+        url, depth = stack.pop()
+        if depth > max_depth or not visited.add(url):
+            continue
+        page = pages.get(url_digest(url))
+        if page is None:
+            continue
+        for entry in page.entries:
+            key = _entry_key(entry)
+            if key is None:
+                entries.append(entry)
+            elif key not in seen:
+                seen.add(key)
+                entries.append(entry)
+        if page.next_url:
+            stack.append((page.next_url, depth))
+        stack.extend(
+            (href, depth + 1) for href in reversed(page.nav_urls)
+        )
+    return entries
+
+
+async def crawl_entries_async(
+    client: httpx.AsyncClient,
+    feed_url: str,
+    max_depth: int = 3,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    checkpoint: CrawlCheckpoint | None = None,
+) -> list[OPDSEntry]:
+    """Crawl an OPDS feed concurrently and return every entry found.
+
+    Entries come in the depth-first order of
+    :func:`opdscli.opds.crawl_entries`, but unlike it, each entry is
+    returned once however many pages list it, and links are followed
+    by the default :class:`CrawlPolicy`.
+    """
+    result = await crawl_feed_async(
+        client, feed_url, max_depth=max_depth,
+        concurrency=concurrency, checkpoint=checkpoint,
+    )
+    return result.entries
+
+
+async def crawl_feed_async(
+    client: httpx.AsyncClient,
+    feed_url: str,
+    max_depth: int = 3,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    checkpoint: CrawlCheckpoint | None = None,
+    budget: CrawlBudget | None = None,
+    policy: CrawlPolicy | None = None,
+    on_entries: EntryCallback | None = None,
+) -> CrawlResult:
+    """Crawl an OPDS feed concurrently, within an optional budget.
+
+    Navigation links and ``next`` pages are fetched by up to
+    *concurrency* workers from a priority queue, shallowest pages
+    first.  URLs are deduplicated by their canonical form, so every
+    page is fetched at most once, even when several pages link to it
+    while the first request is still in flight; the page is fetched
+    at the URL it was linked by.
+
+    Once a page, entry or size limit of *budget* is reached no new
+    page is started, and when its time limit passes pending requests
+    are abandoned.  Either way the entries fetched so far are
+    returned, and ``stopped_by`` names the limit.
+
+    Links are followed according to *policy*; the links it prunes are
+    counted in the result.  A page listing exactly the entry ids of a
+    page fetched before (an author or series view of the same books,
+    say) is not expanded further, and every entry is returned once.
+
+    *on_entries* is called with the entries of each page as soon as
+    it is parsed, leaving out any already passed on.  If it returns
+    True the crawl stops like an exhausted budget, with ``stopped_by``
+    set to ``"caller"``.
+
+    With a *checkpoint*, progress is saved as the crawl goes and a
+    previously interrupted (or budget-limited) crawl of the same feed
+    picks up where it stopped.
+    """
+    budget = budget or CrawlBudget()
+    policy = policy or CrawlPolicy()
+    result = CrawlResult()
+    entry_count = 0
+    # Fetched pages by url_digest, so no URL string is kept per page.
+    pages: dict[int, _Page | None] = {}
+    resumed: dict[str, int] = {}
+    if checkpoint is not None:
+        stored, resumed = checkpoint.load(canonical_url(feed_url), max_depth)
+        pages = {url_digest(url): page for url, page in stored.items()}
+    depths = VisitedUrls(len(resumed))
+    for url, depth in resumed.items():
+        depths.set(url, depth)
+    listings = {
+        fp for page in pages.values()
+        if page is not None and (fp := _fingerprint(page.entries)) is not None
+    }
+    queue: asyncio.PriorityQueue[tuple[int, int, str]] = (
+        asyncio.PriorityQueue()
+    )
+    order = itertools.count()
+    streamed: set[str] = set()
+
+    def _stream(entries: list[OPDSEntry], callback: EntryCallback) -> None:
+        fresh = []
+        for entry in entries:
+            key = _entry_key(entry)
+            if key is None or key not in streamed:
+                if key is not None:
+                    streamed.add(key)
+                fresh.append(entry)
+        if fresh and callback(fresh) and result.stopped_by is None:
+            result.stopped_by = "caller"
+
+    def _expand(url: str) -> None:
+        page = pages[url_digest(url)]
+        depth = depths.get(url)
+        if page is None or depth is None:
+            return
+        for href in page.nav_urls:
+            _discover(href, depth + 1)
+        if page.next_url:
+            _discover(page.next_url, depth)
+
+    def _discover(url: str, depth: int) -> None:
+        if depth > max_depth:
+            return
+        known = depths.get(url)
+        if known is not None and known <= depth:
+            return
+        depths.set(url, depth)
+        if checkpoint is not None:
+            checkpoint.discovered(url, depth)
+        if url_digest(url) in pages:
+            # Reached again by a shorter path: its links may now be
+            # within max_depth, but the page itself is not refetched.
+            _expand(url)
+        elif known is None:
+            queue.put_nowait((depth, next(order), url))
+
+    async def _worker() -> None:
+        nonlocal entry_count
+        while True:
+            _, _, url = await queue.get()
+            try:
+                result.stopped_by = result.stopped_by or budget.exhausted(
+                    result.pages, entry_count, result.size,
+                )
+                if result.stopped_by is not None:
+                    # Drain the queue; the URL stays on the frontier.
+                    continue
+                result.pages += 1
+                page = await _fetch_page(client, url, policy)
+                pages[url_digest(url)] = page
+                fingerprint = (
+                    _fingerprint(page.entries) if page is not None else None
+                )
+                if page is None:
+                    result.failed_pages += 1
+                elif fingerprint in listings:
+                    # Same books as a page already crawled: drop it and
+                    # don't follow its links.
+                    result.size += page.size
+                    result.duplicate_pages += 1
+                    page = pages[url_digest(url)] = _Page()
+                else:
+                    if fingerprint is not None:
+                        listings.add(fingerprint)
+                    result.size += page.size
+                    entry_count += len(page.entries)
+                    for href, reason in page.pruned:
+                        result.record_pruned(href, reason)
+                    if on_entries is not None and result.stopped_by is None:
+                        _stream(page.entries, on_entries)
+                _expand(url)
+                if checkpoint is not None:
+                    checkpoint.fetched(url, page)
+            finally:
+                queue.task_done()
+
+    # Resumed URLs that were never fetched, or failed, are the frontier.
+    for url, depth in sorted(resumed.items(), key=lambda item: item[1]):
+        if url_digest(url) not in pages:
+            queue.put_nowait((depth, next(order), url))
+    resumed.clear()
+    _discover(feed_url, 0)
+    workers = [
+        asyncio.create_task(_worker())
+        for _ in range(max(1, concurrency))
+    ]
+    joined = asyncio.create_task(queue.join())
+    try:
+        done, _ = await asyncio.wait(
+            [joined, *workers], timeout=budget.seconds,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if not done:
+            result.stopped_by = "seconds"
+        for task in done:
+            # Workers only finish by raising; surface the error.
+            task.result()
+    finally:
+        for task in (joined, *workers):
+            task.cancel()
+        await asyncio.gather(joined, *workers, return_exceptions=True)
+        if checkpoint is not None:
+            checkpoint.flush()
+
+    result.entries = _flatten(pages, feed_url, max_depth)
+    return result
+
+
+def crawl_catalog(
+    catalog: CatalogConfig,
+    max_depth: int = 3,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    cache: ResponseCache | None = None,
+    checkpoint: CrawlCheckpoint | None = None,
+    budget: CrawlBudget | None = None,
+    on_entries: EntryCallback | None = None,
+) -> CrawlResult:
+    """Crawl a catalog's root feed with the concurrent engine.
+
+    The catalog's own crawl policy decides which links are followed.
+    """
+
+    async def _run() -> CrawlResult:
+        async with create_async_client(catalog, cache=cache) as client:
+            return await crawl_feed_async(
+                client, catalog.url,
+                max_depth=max_depth, concurrency=concurrency,
+                checkpoint=checkpoint, budget=budget,
+                policy=CrawlPolicy.from_config(catalog.crawl_policy),
+                on_entries=on_entries,
+            )
+
+    return asyncio.run(_run())
@@ -0,0 +1,109 @@
+import threading
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+from itertools import zip_longest
+
+import httpx
+
+from opdscli.http import OPDSClientError
+from opdscli.opds import OPDSEntry
+from opdscli.titles import normalize_title
+
+
+@dataclass
+class FederatedHit:
+    entry: OPDSEntry
+    catalogs: list[str] = field(default_factory=list)  # where it was found
+
+
+def search_catalogs(
+    names: Sequence[str],
+    search: Callable[[str], list[OPDSEntry]],
+    timeout: float | None = None,
+) -> tuple[dict[str, list[OPDSEntry]], dict[str, str]]:
+    """Run *search* for every catalog in *names* at once.
+
+    Returns the results of the catalogs that answered within *timeout*
+    seconds, and an error message for each of the others, so one slow
+    or failing catalog doesn't hold up or sink the rest.  Each search
+    runs on a daemon thread: one still running at the deadline is
+    abandoned, and doesn't keep the process alive once it is done.
+    """
+    outcomes: dict[str, list[OPDSEntry] | Exception] = {}
+
+    def _run(name: str) -> None:
+        try:
+            outcomes[name] = search(name)
+        except Exception as e:
+            outcomes[name] = e
+
+    threads = {
+        name: threading.Thread(
+            target=_run, args=(name,), name=f"search-{name}", daemon=True,
+        )
+        for name in names
+    }
+    for thread in threads.values():
+        thread.start()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for thread in threads.values():
+        thread.join(
+            None if deadline is None
+            else max(0.0, deadline - time.monotonic()),
+        )
+
+    results: dict[str, list[OPDSEntry]] = {}
+    errors: dict[str, str] = {}
+    for name, thread in threads.items():
+        if thread.is_alive():
+            errors[name] = "timed out"
+            continue
+        outcome = outcomes[name]
+        if isinstance(
+            outcome, (OPDSClientError, httpx.HTTPError, ValueError),
+        ):
+            errors[name] = str(outcome) or type(outcome).__name__
+        elif isinstance(outcome, Exception):
+            raise outcome
+        else:
+            results[name] = outcome
+    return results, errors
+
+
+def merge_results(
+    results: dict[str, list[OPDSEntry]],
+) -> list[FederatedHit]:
+    """Merge per-catalog rankings into one, folding duplicates together.
+
+    Rankings are interleaved by position, so every catalog's best hit
+    comes before any catalog's second best.  An entry is a duplicate of
+    an earlier one when they share an Atom id, or the same normalized
+    title and author; it then only adds its catalog to that hit.
+    """
+    hits: list[FederatedHit] = []
+    by_id: dict[str, FederatedHit] = {}
+    by_title: dict[tuple[str, str], FederatedHit] = {}
+    ranked = zip_longest(*(
+        [(name, entry) for entry in entries]
+        for name, entries in results.items()
+    ))
+    for row in ranked:
+        for item in row:
+            if item is None:
+                continue
+            name, entry = item
+            title_key = (
+                normalize_title(entry.title), normalize_title(entry.author),
+            )
+            hit = by_id.get(entry.entry_id) if entry.entry_id else None
+            hit = hit or by_title.get(title_key)
+            if hit is None:
+                hit = FederatedHit(entry)
+                hits.append(hit)
+            if name not in hit.catalogs:
+                hit.catalogs.append(name)
+            if entry.entry_id:
+                by_id.setdefault(entry.entry_id, hit)
+            by_title.setdefault(title_key, hit)
+    return hits
@@ -0,0 +1,46 @@
+import heapq
+from collections.abc import Callable, Iterable
+from operator import itemgetter
+
+from thefuzz import fuzz  # type: ignore[import-untyped]
+
+from opdscli.opds import OPDSEntry
+from opdscli.titles import fold
+
+# Scores a folded query against an entry, 0-100.
+Scorer = Callable[[str, OPDSEntry], int]
+
+
+def title_ratio(query: str, entry: OPDSEntry) -> int:
+    """How closely *entry*'s whole title matches *query*."""
+    return int(fuzz.ratio(query, fold(entry.title)))
+
+
+def partial_ratio(query: str, entry: OPDSEntry) -> int:
+    """Best match of *query* within *entry*'s title or author."""
+    return max(
+        int(fuzz.partial_ratio(query, fold(entry.title))),
+        int(fuzz.partial_ratio(query, fold(entry.author))),
+    )
+
+
+def top_matches(
+    query: str,
+    entries: Iterable[OPDSEntry],
+    k: int,
+    scorer: Scorer = title_ratio,
+    min_score: int = 0,
+) -> list[tuple[OPDSEntry, int]]:
+    """The *k* best-scoring entries above *min_score*, best first.
+
+    Every entry is scored once, in a single pass that keeps only the
+    best *k*; nothing is built up front, so a one-off query costs one
+    comparison per entry.  Equal scores keep the entries' order.
+    """
+    folded = fold(query)
+    scored = ((entry, scorer(folded, entry)) for entry in entries)
+    return heapq.nlargest(
+        k,
+        (item for item in scored if item[1] > min_score),
+        key=itemgetter(1),
+    )
@@ -1,20 +1,32 @@
+import asyncio
+import json
+import os
+import threading
 import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any
 
 import httpx
 from rich.progress import Progress, TaskID
 
+from opdscli.cache import AsyncCachingTransport, CachingTransport, ResponseCache
 from opdscli.config import CatalogConfig
+from opdscli.throttle import Throttle, parse_retry_after
+
+SEGMENT_MIN_SIZE = 8 * 1024 * 1024
+SEGMENT_CHUNK_SIZE = 64 * 1024
 
 
 class OPDSClientError(Exception):
     pass
 
 
-def create_client(
-    catalog: CatalogConfig, timeout: float = 30.0,
-) -> httpx.Client:
-    """Create an httpx client with auth for the given catalog."""
+def _client_options(
+    catalog: CatalogConfig, timeout: float,
+) -> dict[str, Any]:
+    """Build the shared httpx client options for a catalog."""
     auth = None
     headers: dict[str, str] = {}
 
@@ -32,43 +44,423 @@ def create_client(
                 f"Bearer {catalog.auth.token}"
             )
 
-    return httpx.Client(
-        auth=auth, headers=headers,
-        timeout=timeout, follow_redirects=True,
+    return {
+        "auth": auth,
+        "headers": headers,
+        "timeout": timeout,
+        "follow_redirects": True,
+    }
+
+
+class OPDSClient(httpx.Client):
+    """httpx client that carries its catalog's throttle.
+
+    With a *cache*, the transports httpx sets up are wrapped in a
+    :class:`CachingTransport` rather than replaced, so the proxies it
+    mounts from the environment (``HTTPS_PROXY`` and so on) still
+    apply.
+    """
+
+    def __init__(
+        self,
+        *,
+        throttle: Throttle,
+        cache: ResponseCache | None = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.throttle = throttle
+        if cache is not None:
+            self._transport = CachingTransport(cache, self._transport)
+            self._mounts = {
+                pattern: None if t is None else CachingTransport(cache, t)
+                for pattern, t in self._mounts.items()
+            }
+
+
+class AsyncOPDSClient(httpx.AsyncClient):
+    """Async counterpart of :class:`OPDSClient`."""
+
+    def __init__(
+        self,
+        *,
+        throttle: Throttle,
+        cache: ResponseCache | None = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.throttle = throttle
+        if cache is not None:
+            self._transport = AsyncCachingTransport(cache, self._transport)
+            self._mounts = {
+                pattern: None if t is None else AsyncCachingTransport(cache, t)
+                for pattern, t in self._mounts.items()
+            }
+
+
+_DEFAULT_THROTTLE = Throttle()
+
+
+def _throttle_of(client: httpx.Client | httpx.AsyncClient) -> Throttle:
+    if isinstance(client, OPDSClient | AsyncOPDSClient):
+        return client.throttle
+    return _DEFAULT_THROTTLE
+
+
+def create_client(
+    catalog: CatalogConfig,
+    timeout: float = 30.0,
+    cache: ResponseCache | None = None,
+) -> httpx.Client:
+    """Create an httpx client with auth for the given catalog.
+
+    When *cache* is given, feed responses are served from and stored
+    in it, with conditional revalidation once they go stale.
+    """
+    return OPDSClient(
+        throttle=Throttle.from_config(catalog.throttle),
+        cache=cache,
+        **_client_options(catalog, timeout),
     )
 
 
-def fetch_url(client: httpx.Client, url: str) -> str:
-    """Fetch a URL with retry-once-with-backoff."""
-    last_error: Exception | None = None
-    for attempt in range(2):
+def create_async_client(
+    catalog: CatalogConfig,
+    timeout: float = 30.0,
+    cache: ResponseCache | None = None,
+) -> httpx.AsyncClient:
+    """Create an async httpx client with auth for the given catalog."""
+    return AsyncOPDSClient(
+        throttle=Throttle.from_config(catalog.throttle),
+        cache=cache,
+        **_client_options(catalog, timeout),
+    )
+
+
+_NETWORK_ERRORS = (
+    httpx.ConnectError,
+    httpx.TimeoutException,
+    httpx.ReadError,
+)
+
+
+def _retry_delay(
+    throttle: Throttle,
+    url: str,
+    attempt: int,
+    response: httpx.Response | None,
+) -> float | None:
+    """Decide whether to retry after *response* (None: network error).
+
+    Returns the delay before the next attempt, or None to stop.  A
+    Retry-After also pauses the whole host, so concurrent workers
+    back off together instead of each discovering the limit.
+    """
+    policy = throttle.policy
+    if attempt >= policy.max_retries:
+        return None
+    if response is None:
+        return policy.delay(attempt)
+    if response.status_code not in policy.retry_statuses:
+        return None
+    retry_after = parse_retry_after(response.headers.get("retry-after"))
+    if retry_after is not None:
+        if retry_after > policy.max_retry_after:
+            return None
+        throttle.bucket(url).pause(retry_after)
+    return policy.delay(attempt, retry_after)
+
+
+def _check_response(response: httpx.Response) -> None:
+    """Raise OPDSClientError for auth failures and error statuses."""
+    if response.status_code in (401, 403):
+        raise OPDSClientError(
+            f"Authentication failed "
+            f"({response.status_code}). "
+            f"Check your credentials."
+        )
+    try:
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        raise OPDSClientError(
+            f"HTTP error {e.response.status_code}: "
+            f"{e.response.reason_phrase}"
+        ) from e
+
+
+def _fetch(client: httpx.Client, url: str) -> httpx.Response:
+    """GET a URL through the client's rate limiter and retry policy.
+
+    Network errors and 429/502/503/504 replies are retried with
+    jittered exponential backoff, honouring Retry-After.
+    """
+    throttle = _throttle_of(client)
+    attempt = 0
+    while True:
+        time.sleep(throttle.bucket(url).reserve())
         try:
             response = client.get(url)
-            if response.status_code in (401, 403):
+        except _NETWORK_ERRORS as e:
+            delay = _retry_delay(throttle, url, attempt, None)
+            if delay is None:
                 raise OPDSClientError(
-                    f"Authentication failed "
-                    f"({response.status_code}). "
-                    f"Check your credentials."
-                )
-            response.raise_for_status()
-            return response.text
-        except httpx.HTTPStatusError as e:
-            raise OPDSClientError(
-                f"HTTP error {e.response.status_code}: "
-                f"{e.response.reason_phrase}"
-            ) from e
-        except (
-            httpx.ConnectError,
-            httpx.TimeoutException,
-            httpx.ReadError,
-        ) as e:
-            last_error = e
-            if attempt == 0:
-                time.sleep(1.0)
-
-    raise OPDSClientError(
-        f"Network error after retry: {last_error}",
+                    f"Network error after retry: {e}",
+                ) from e
+        else:
+            delay = _retry_delay(throttle, url, attempt, response)
+            if delay is None:
+                _check_response(response)
+                return response
+        time.sleep(delay)
+        attempt += 1
+
+
+async def _fetch_async(
+    client: httpx.AsyncClient, url: str,
+) -> httpx.Response:
+    """Async variant of :func:`_fetch` sharing its per-host limits."""
+    throttle = _throttle_of(client)
+    attempt = 0
+    while True:
+        await asyncio.sleep(throttle.bucket(url).reserve())
+        try:
+            response = await client.get(url)
+        except _NETWORK_ERRORS as e:
+            delay = _retry_delay(throttle, url, attempt, None)
+            if delay is None:
+                raise OPDSClientError(
+                    f"Network error after retry: {e}",
+                ) from e
+        else:
+            delay = _retry_delay(throttle, url, attempt, response)
+            if delay is None:
+                _check_response(response)
+                return response
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+def fetch_bytes(client: httpx.Client, url: str) -> bytes:
+    """Fetch a URL and return the raw body.
+
+    Feeds should be fetched this way and handed to the parser as-is,
+    letting the XML declaration decide the encoding instead of paying
+    for charset detection and a decode/re-encode round trip.
+    """
+    return _fetch(client, url).content
+
+
+async def fetch_bytes_async(client: httpx.AsyncClient, url: str) -> bytes:
+    """Async variant of :func:`fetch_bytes`."""
+    return (await _fetch_async(client, url)).content
+
+
+def fetch_url(client: httpx.Client, url: str) -> str:
+    """Fetch a URL and return the body decoded as text."""
+    return _fetch(client, url).text
+
+
+async def fetch_url_async(client: httpx.AsyncClient, url: str) -> str:
+    """Async variant of :func:`fetch_url`."""
+    return (await _fetch_async(client, url)).text
+
+
+def part_path(dest: Path) -> Path:
+    """Path of the partial file an in-progress download writes to."""
+    return dest.with_name(dest.name + ".part")
+
+
+def _meta_path(dest: Path) -> Path:
+    return dest.with_name(dest.name + ".part.json")
+
+
+def _resume_validator(response: httpx.Response) -> str | None:
+    """Pick a validator usable in If-Range (strong ETag or Last-Modified)."""
+    etag: str | None = response.headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    last_modified: str | None = response.headers.get("last-modified")
+    return last_modified
+
+
+def _load_resume_state(dest: Path, url: str) -> dict[str, Any]:
+    """Return the saved state for resuming *url* into *dest*.
+
+    The state is empty when there is nothing to resume.  A partial
+    file left by a different URL is discarded, and so is one without
+    a validator: with no If-Range to guard it, a resumed request
+    could append bytes of a file that changed in the meantime.
+    """
+    part = part_path(dest)
+    if not part.exists():
+        return {}
+    try:
+        meta: dict[str, Any] = json.loads(_meta_path(dest).read_text())
+    except (OSError, ValueError):
+        meta = {}
+    if meta.get("url") != url or not meta.get("validator"):
+        _discard_partial(dest)
+        return {}
+    return meta
+
+
+def _save_resume_state(dest: Path, meta: dict[str, Any]) -> None:
+    _meta_path(dest).write_text(json.dumps(meta))
+
+
+def _discard_partial(dest: Path) -> None:
+    part_path(dest).unlink(missing_ok=True)
+    _meta_path(dest).unlink(missing_ok=True)
+
+
+def _total_from_content_range(value: str) -> int | None:
+    """Parse the complete length from ``bytes a-b/total``."""
+    _, _, total = value.rpartition("/")
+    return int(total) if total.isdigit() else None
+
+
+def _finish_download(dest: Path) -> None:
+    os.replace(part_path(dest), dest)
+    _meta_path(dest).unlink(missing_ok=True)
+
+
+def _range_headers(
+    start: int, end: int | None, validator: str | None,
+) -> dict[str, str]:
+    # Byte offsets only line up with the file on disk when the body
+    # is not content-encoded in transit.
+    headers = {"Accept-Encoding": "identity"}
+    if start or end is not None:
+        headers["Range"] = f"bytes={start}-{'' if end is None else end}"
+        if validator:
+            headers["If-Range"] = validator
+    return headers
+
+
+def _supports_segments(
+    response: httpx.Response, total: int | None, connections: int,
+) -> bool:
+    return (
+        connections > 1
+        and total is not None
+        and total >= SEGMENT_MIN_SIZE
+        and response.headers.get("accept-ranges", "").lower() == "bytes"
+    )
+
+
+def _plan_segments(total: int, connections: int) -> list[list[int]]:
+    """Split *total* bytes into [start, end, done] ranges."""
+    size = -(-total // connections)
+    return [
+        [start, min(start + size, total) - 1, 0]
+        for start in range(0, total, size)
+    ]
+
+
+class _RangeNotHonouredError(OPDSClientError):
+    pass
+
+
+def _write_segment(
+    chunks: Iterator[bytes],
+    dest: Path,
+    segment: list[int],
+    progress: Progress,
+    task_id: TaskID,
+    stop: threading.Event,
+) -> None:
+    """Write *chunks* into the segment's slot of the partial file."""
+    start, end, done = segment
+    with open(part_path(dest), "r+b") as f:
+        f.seek(start + done)
+        for chunk in chunks:
+            if stop.is_set():
+                return
+            chunk = chunk[: end + 1 - (start + segment[2])]
+            f.write(chunk)
+            segment[2] += len(chunk)
+            progress.advance(task_id, len(chunk))
+            if start + segment[2] > end:
+                return
+
+
+def _fetch_segment(
+    client: httpx.Client,
+    url: str,
+    dest: Path,
+    segment: list[int],
+    validator: str | None,
+    progress: Progress,
+    task_id: TaskID,
+    stop: threading.Event,
+) -> None:
+    start, end, done = segment
+    if start + done > end:
+        return
+    headers = _range_headers(start + done, end, validator)
+    time.sleep(_throttle_of(client).bucket(url).reserve())
+    with client.stream("GET", url, headers=headers) as response:
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise _RangeNotHonouredError(url)
+        _write_segment(
+            response.iter_bytes(chunk_size=SEGMENT_CHUNK_SIZE),
+            dest, segment, progress, task_id, stop,
+        )
+
+
+def _segmented_download(
+    client: httpx.Client,
+    url: str,
+    dest: Path,
+    meta: dict[str, Any],
+    progress: Progress,
+    task_id: TaskID,
+    first: httpx.Response | None = None,
+) -> None:
+    """Fetch the byte ranges in *meta* concurrently into ``.part``.
+
+    When *first* is given it is an open full-body response whose
+    leading bytes fill the first segment, so no request is wasted.
+    Progress of every segment is saved on failure so a later run can
+    pick up where each one stopped.
+    """
+    segments: list[list[int]] = meta["segments"]
+    validator: str | None = meta.get("validator")
+    stop = threading.Event()
+    progress.update(
+        task_id,
+        total=meta["total"],
+        completed=sum(done for _, _, done in segments),
     )
+    pending = segments[1:] if first is not None else segments
+    try:
+        with ThreadPoolExecutor(max_workers=len(segments)) as pool:
+            futures = [
+                pool.submit(
+                    _fetch_segment, client, url, dest, segment,
+                    validator, progress, task_id, stop,
+                )
+                for segment in pending
+            ]
+            try:
+                if first is not None:
+                    _write_segment(
+                        first.iter_bytes(chunk_size=SEGMENT_CHUNK_SIZE),
+                        dest, segments[0], progress, task_id, stop,
+                    )
+                for future in futures:
+                    future.result()
+            finally:
+                stop.set()
+    finally:
+        _save_resume_state(dest, meta)
+
+    if any(start + done <= end for start, end, done in segments):
+        raise OPDSClientError(
+            "Download incomplete. Run again to resume.",
+        )
+    _finish_download(dest)
 
 
 def stream_download(
@@ -77,15 +469,85 @@ def stream_download(
     dest: Path,
     progress: Progress,
     task_id: TaskID,
+    connections: int = 1,
 ) -> None:
-    """Download a file with streaming and progress updates."""
-    with client.stream("GET", url) as response:
+    """Download a file with streaming and progress updates.
+
+    Data is written to ``<dest>.part`` and only renamed to *dest*
+    once complete.  A ``.part`` file left by an interrupted transfer
+    of the same URL is resumed with a ``Range`` request guarded by
+    ``If-Range``; servers that ignore it send the whole file again.
+    Without a strong ETag or Last-Modified to send in ``If-Range``,
+    the transfer starts over instead.
+
+    With *connections* > 1, files of at least SEGMENT_MIN_SIZE from
+    servers that advertise ``Accept-Ranges: bytes`` are split into
+    that many ranges and fetched in parallel.
+    """
+    meta = _load_resume_state(dest, url)
+    if "segments" in meta:
+        try:
+            _segmented_download(client, url, dest, meta, progress, task_id)
+            return
+        except _RangeNotHonouredError:
+            _discard_partial(dest)
+            meta = {}
+
+    offset = part_path(dest).stat().st_size if meta else 0
+    headers = _range_headers(offset, None, meta.get("validator"))
+
+    time.sleep(_throttle_of(client).bucket(url).reserve())
+    with client.stream("GET", url, headers=headers) as response:
+        if response.status_code == 416:
+            # The partial file already holds every byte, or is stale.
+            complete = _total_from_content_range(
+                response.headers.get("content-range", ""),
+            )
+            if complete == offset:
+                progress.update(task_id, total=offset, completed=offset)
+                _finish_download(dest)
+                return
+            _discard_partial(dest)
+            stream_download(
+                client, url, dest, progress, task_id, connections,
+            )
+            return
         response.raise_for_status()
-        total = response.headers.get("content-length")
-        if total:
-            progress.update(task_id, total=int(total))
 
-        with open(dest, "wb") as f:
+        length = response.headers.get("content-length")
+        if response.status_code == 206:
+            total = _total_from_content_range(
+                response.headers.get("content-range", ""),
+            )
+            mode = "ab"
+        else:
+            offset = 0
+            total = int(length) if length else None
+            mode = "wb"
+            meta = {"url": url, "validator": _resume_validator(response)}
+            if total is not None and _supports_segments(
+                response, total, connections,
+            ):
+                meta["total"] = total
+                meta["segments"] = _plan_segments(total, connections)
+                with open(part_path(dest), "wb") as f:
+                    f.truncate(total)
+                _segmented_download(
+                    client, url, dest, meta, progress, task_id,
+                    first=response,
+                )
+                return
+            _save_resume_state(dest, meta)
+        progress.update(task_id, total=total, completed=offset)
+
+        with open(part_path(dest), mode) as f:
             for chunk in response.iter_bytes(chunk_size=8192):
                 f.write(chunk)
                 progress.advance(task_id, len(chunk))
+
+    if total is not None and part_path(dest).stat().st_size != total:
+        raise OPDSClientError(
+            f"Download incomplete: expected {total} bytes, got "
+            f"{part_path(dest).stat().st_size}. Run again to resume.",
+        )
+    _finish_download(dest)
@@ -0,0 +1,323 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+
+from opdscli.http import fetch_bytes
+from opdscli.opds import AcquisitionLink, OPDSEntry, parse_feed_bytes
+from opdscli.rank import FIELD_WEIGHTS
+
+INDEX_DIR = Path.home() / ".local" / "share" / "opdscli"
+
+DEFAULT_UPDATE_PAGES = 50
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    catalog TEXT NOT NULL,
+    key TEXT NOT NULL,
+    entry_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    author TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    updated TEXT NOT NULL,
+    formats TEXT NOT NULL,
+    links TEXT NOT NULL,
+    UNIQUE (catalog, key)
+);
+CREATE INDEX IF NOT EXISTS entries_title
+    ON entries (catalog, title COLLATE NOCASE);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5 (
+    title, author, summary,
+    content='entries', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, title, author, summary)
+    VALUES (new.id, new.title, new.author, new.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, title, author, summary)
+    VALUES ('delete', old.id, old.title, old.author, old.summary);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_au AFTER UPDATE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, title, author, summary)
+    VALUES ('delete', old.id, old.title, old.author, old.summary);
+    INSERT INTO entries_fts (rowid, title, author, summary)
+    VALUES (new.id, new.title, new.author, new.summary);
+END;
+CREATE TABLE IF NOT EXISTS catalogs (
+    name TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    built_at REAL NOT NULL
+);
+"""
+
+_FIELDS = (
+    "entry_id", "title", "author", "summary", "updated", "formats", "links",
+)
+_COLUMNS = ", ".join(_FIELDS)
+_QUALIFIED_COLUMNS = ", ".join(f"entries.{f}" for f in _FIELDS)
+
+_INTO_ENTRIES = (
+    "INTO entries (catalog, key, entry_id, title, author, summary,"
+    " updated, formats, links) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+_TOKEN = re.compile(r"\w+")
+
+
+@dataclass
+class IndexInfo:
+    catalog: str
+    url: str
+    built_at: float
+    entries: int
+
+
+def entry_key(entry: OPDSEntry) -> str:
+    """Identify an entry within its catalog.
+
+    Entries without an Atom id fall back to their first acquisition
+    link, then their title, so the same book reached through several
+    subsections is stored once.
+    """
+    if entry.entry_id:
+        return entry.entry_id
+    if entry.acquisition_links:
+        return entry.acquisition_links[0].href
+    return entry.title
+
+
+def fts_query(text: str) -> str | None:
+    """Turn free text into an FTS5 query matching every word as a prefix.
+
+    Returns None when *text* contains nothing searchable.
+    """
+    tokens = _TOKEN.findall(text)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def _to_row(
+    catalog: str, entry: OPDSEntry,
+) -> tuple[str, str, str, str, str, str, str, str, str]:
+    links = [[a.href, a.type, a.rel] for a in entry.acquisition_links]
+    return (
+        catalog, entry_key(entry), entry.entry_id, entry.title,
+        entry.author, entry.summary, entry.updated,
+        json.dumps(entry.formats), json.dumps(links),
+    )
+
+
+def _from_row(row: tuple[str, ...]) -> OPDSEntry:
+    entry_id, title, author, summary, updated, formats, links = row
+    return OPDSEntry(
+        title=title,
+        author=author,
+        summary=summary,
+        updated=updated,
+        entry_id=entry_id,
+        formats=json.loads(formats),
+        acquisition_links=[
+            AcquisitionLink(href=href, type=link_type, rel=rel)
+            for href, link_type, rel in json.loads(links)
+        ],
+    )
+
+
+class CatalogIndex:
+    """Full-text index of crawled catalog entries, stored in SQLite.
+
+    Titles, authors and summaries are searchable through FTS5 and
+    ranked with bm25, title matches weighing most.  Each entry keeps
+    its acquisition links, so a hit can be downloaded directly.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def replace(
+        self, catalog: str, url: str, entries: Iterable[OPDSEntry],
+    ) -> int:
+        """Replace everything indexed for *catalog*. Returns entries stored."""
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM entries WHERE catalog = ?", (catalog,),
+            )
+            self._db.executemany(
+                f"INSERT OR IGNORE {_INTO_ENTRIES}",
+                (_to_row(catalog, e) for e in entries),
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO catalogs VALUES (?, ?, ?)",
+                (catalog, url, time.time()),
+            )
+            (count,) = self._db.execute(
+                "SELECT COUNT(*) FROM entries WHERE catalog = ?",
+                (catalog,),
+            ).fetchone()
+        return int(count)
+
+    def upsert(self, catalog: str, entries: Iterable[OPDSEntry]) -> int:
+        """Insert new entries and overwrite changed ones. Returns rows written."""
+        with self._lock, self._db:
+            cursor = self._db.executemany(
+                f"INSERT {_INTO_ENTRIES}"
+                " ON CONFLICT (catalog, key) DO UPDATE SET"
+                " entry_id = excluded.entry_id, title = excluded.title,"
+                " author = excluded.author, summary = excluded.summary,"
+                " updated = excluded.updated, formats = excluded.formats,"
+                " links = excluded.links",
+                (_to_row(catalog, e) for e in entries),
+            )
+            self._db.execute(
+                "UPDATE catalogs SET built_at = ? WHERE name = ?",
+                (time.time(), catalog),
+            )
+        return cursor.rowcount
+
+    def stored_updates(
+        self, catalog: str, keys: Iterable[str],
+    ) -> dict[str, str]:
+        """Map each stored key among *keys* to its ``updated`` stamp."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        marks = ", ".join("?" * len(keys))
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, updated FROM entries WHERE catalog = ?"
+                f" AND key IN ({marks})",
+                (catalog, *keys),
+            ).fetchall()
+        return dict(rows)
+
+    def remove(self, catalog: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM entries WHERE catalog = ?", (catalog,),
+            )
+            self._db.execute(
+                "DELETE FROM catalogs WHERE name = ?", (catalog,),
+            )
+
+    def info(self, catalog: str) -> IndexInfo | None:
+        """Describe the index of *catalog*, or None if it was never built."""
+        return next(
+            (i for i in self.catalogs() if i.catalog == catalog), None,
+        )
+
+    def catalogs(self) -> list[IndexInfo]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT c.name, c.url, c.built_at, COUNT(e.id)"
+                " FROM catalogs c LEFT JOIN entries e ON e.catalog = c.name"
+                " GROUP BY c.name ORDER BY c.name",
+            ).fetchall()
+        return [IndexInfo(*row) for row in rows]
+
+    def search(
+        self, catalog: str, query: str, limit: int | None = None,
+    ) -> list[OPDSEntry]:
+        """Entries of *catalog* matching every word of *query*, best first."""
+        match = fts_query(query)
+        if match is None:
+            return []
+        # bm25() takes the weights in column order: title, author, summary.
+        weights = ", ".join(str(w) for w in FIELD_WEIGHTS.values())
+        sql = (
+            f"SELECT {_QUALIFIED_COLUMNS} FROM entries_fts"
+            " JOIN entries ON entries.id = entries_fts.rowid"
+            " WHERE entries_fts MATCH ? AND entries.catalog = ?"
+            f" ORDER BY bm25(entries_fts, {weights})"
+        )
+        params: tuple[str | int, ...] = (match, catalog)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (limit,)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [_from_row(row) for row in rows]
+
+    def find_title(self, catalog: str, title: str) -> OPDSEntry | None:
+        """The entry titled exactly *title*, ignoring case."""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM entries WHERE catalog = ?"
+                " AND title = ? COLLATE NOCASE",
+                (catalog, title),
+            ).fetchall()
+        # NOCASE only folds ASCII; confirm with Python's lower().
+        for row in rows:
+            if row[1].lower() == title.lower():
+                return _from_row(row)
+        return None
+
+    def entries(self, catalog: str) -> list[OPDSEntry]:
+        """Every entry indexed for *catalog*, in crawl order."""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM entries WHERE catalog = ?"
+                " ORDER BY id",
+                (catalog,),
+            ).fetchall()
+        return [_from_row(row) for row in rows]
+
+
+@dataclass
+class UpdateResult:
+    pages: int
+    changed: int
+
+
+def update_index(
+    client: httpx.Client,
+    index: CatalogIndex,
+    catalog: str,
+    feed_url: str,
+    max_pages: int = DEFAULT_UPDATE_PAGES,
+) -> UpdateResult:
+    """Fold the newest entries of a catalog into its existing index.
+
+    Walks *feed_url*, a newest-first feed such as the catalog's
+    sort/new feed, through its ``next`` pages, upserting entries that
+    are new or whose ``updated`` stamp changed.  Stops after the first
+    page holding an entry that is already stored unchanged, since
+    everything older is then known too.
+    """
+    pages = changed = 0
+    url: str | None = feed_url
+    while url and pages < max_pages:
+        data = fetch_bytes(client, url)
+        entries, _, url = parse_feed_bytes(data, base_url=url)
+        pages += 1
+        stored = index.stored_updates(
+            catalog, (entry_key(e) for e in entries),
+        )
+        fresh = [e for e in entries if stored.get(entry_key(e)) != e.updated]
+        if fresh:
+            changed += index.upsert(catalog, fresh)
+        if len(fresh) < len(entries):
+            break
+    return UpdateResult(pages=pages, changed=changed)
+
+
+def open_index(path: Path | None = None) -> CatalogIndex:
+    """Open the local catalog index."""
+    return CatalogIndex(path or INDEX_DIR / "index.sqlite")
@@ -1,10 +1,25 @@
+import contextlib
+import heapq
+import io
+import itertools
+import math
+import re
+import sys
+import time
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from typing import IO, Any
 from urllib.parse import quote, urljoin
 
 import httpx
 from lxml import etree
 
-from opdscli.http import OPDSClientError, fetch_url
+from opdscli.config import CatalogProfile
+from opdscli.http import OPDSClientError, fetch_bytes
+from opdscli.urls import VisitedUrls
 
 ATOM_NS = "http://www.w3.org/2005/Atom"
 OPDS_NS = "http://opds-spec.org/2010/catalog"
@@ -20,18 +35,45 @@ NS = {
 
 ACQUISITION_REL_PREFIX = "http://opds-spec.org/acquisition"
 
-_SORT_NEW = "http://opds-spec.org/sort/new"
-_SORT_POPULAR = "http://opds-spec.org/sort/popular"
+SORT_REL_PREFIX = "http://opds-spec.org/sort/"
+FACET_REL = "http://opds-spec.org/facet"
 
+# Results requested per OpenSearch page, where the template has a
+# {count} parameter, and collected per query by default.
+OPENSEARCH_PAGE_SIZE = 50
+DEFAULT_SEARCH_LIMIT = 200
 
-@dataclass
+# Feed pages fetched at once when paging or following subsections.
+DEFAULT_FETCH_WORKERS = 4
+
+# Most feed pages walked looking for the latest entries.
+DEFAULT_LATEST_PAGES = 20
+
+_TEMPLATE_PARAM = re.compile(r"\{([^{}?]+)(\?)?\}")
+_PAGE_PARAMS = re.compile(r"\{(?:startPage|startIndex)\??\}")
+_COUNT_PARAM = re.compile(r"\{count\??\}")
+
+_SORT_NEW = SORT_REL_PREFIX + "new"
+_SORT_POPULAR = SORT_REL_PREFIX + "popular"
+
+
+# Models are slotted and intern their small vocabulary strings (MIME
+# types, rel URIs, format names): a large crawl holds hundreds of
+# thousands of them, mostly repeating the same handful of values.
+
+
+@dataclass(slots=True)
 class AcquisitionLink:
     href: str
     type: str
     rel: str = ""
 
+    def __post_init__(self) -> None:
+        self.type = sys.intern(self.type)
+        self.rel = sys.intern(self.rel)
+
 
-@dataclass
+@dataclass(slots=True)
 class OPDSEntry:
     title: str = ""
     author: str = ""
@@ -43,13 +85,56 @@ class OPDSEntry:
         default_factory=list,
     )
 
+    def __post_init__(self) -> None:
+        self.formats = [sys.intern(fmt) for fmt in self.formats]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "title": self.title,
+            "author": self.author,
+            "summary": self.summary,
+            "updated": self.updated,
+            "entry_id": self.entry_id,
+            "formats": self.formats,
+            "acquisition_links": [
+                [a.href, a.type, a.rel] for a in self.acquisition_links
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "OPDSEntry":
+        return cls(
+            title=data.get("title", ""),
+            author=data.get("author", ""),
+            summary=data.get("summary", ""),
+            updated=data.get("updated", ""),
+            entry_id=data.get("entry_id", ""),
+            formats=list(data.get("formats", [])),
+            acquisition_links=[
+                AcquisitionLink(href=href, type=link_type, rel=rel)
+                for href, link_type, rel in data.get(
+                    "acquisition_links", [],
+                )
+            ],
+        )
 
-@dataclass
+
+@dataclass(slots=True)
 class NavigationLink:
     href: str
     title: str = ""
     rel: str = ""
 
+    def __post_init__(self) -> None:
+        self.rel = sys.intern(self.rel)
+
+
+@dataclass(slots=True)
+class NextPage:
+    """The feed-level ``next`` link, as reported by :func:`iter_feed`."""
+
+    href: str
+
 
 FORMAT_MAP: dict[str, str] = {
     "application/epub+zip": "epub",
@@ -88,47 +173,107 @@ ParseResult = tuple[
     list[OPDSEntry], list[NavigationLink], str | None,
 ]
 
+FeedItem = OPDSEntry | NavigationLink | NextPage
+
+_ENTRY_TAG = f"{{{ATOM_NS}}}entry"
+_LINK_TAG = f"{{{ATOM_NS}}}link"
+
 
 def parse_feed(
     xml_text: str, base_url: str = "",
 ) -> ParseResult:
-    """Parse an OPDS Atom feed.
+    """Parse an OPDS Atom feed given as text.
 
-    Returns (entries, navigation_links, next_page_url).
+    Returns (entries, navigation_links, next_page_url).  Prefer
+    :func:`parse_feed_bytes` for response bodies.
     """
-    try:
-        root = etree.fromstring(xml_text.encode("utf-8"))
-    except etree.XMLSyntaxError as e:
-        raise ValueError(f"Invalid XML: {e}") from e
+    return parse_feed_bytes(xml_text.encode("utf-8"), base_url)
+
+
+def parse_feed_bytes(
+    data: bytes, base_url: str = "",
+) -> ParseResult:
+    """Parse an OPDS Atom feed from raw bytes.
 
+    The bytes go to lxml untouched, so the document's own XML
+    declaration (or BOM) determines how it is decoded.
+    """
     entries: list[OPDSEntry] = []
     nav_links: list[NavigationLink] = []
     next_url: str | None = None
 
-    for entry_el in root.findall("atom:entry", NS):
-        entry = _parse_entry(entry_el, base_url)
-
-        if entry.acquisition_links:
-            entries.append(entry)
+    for item in iter_feed(data, base_url):
+        if isinstance(item, OPDSEntry):
+            entries.append(item)
+        elif isinstance(item, NextPage):
+            next_url = item.href
         else:
-            for link_el in entry_el.findall("atom:link", NS):
-                rel = link_el.get("rel", "")
-                link_type = link_el.get("type", "")
-                href = link_el.get("href", "")
-                if href and _is_feed_link(rel, link_type):
-                    nav_links.append(NavigationLink(
-                        href=_resolve_url(base_url, href),
-                        title=entry.title,
-                        rel=rel,
-                    ))
+            nav_links.append(item)
 
-    for link_el in root.findall("atom:link", NS):
+    return entries, nav_links, next_url
+
+
+def iter_feed(
+    source: bytes | IO[bytes], base_url: str = "",
+) -> Iterator[FeedItem]:
+    """Parse an OPDS Atom feed incrementally.
+
+    Yields each book as an OPDSEntry, or the navigation links of a
+    navigation entry, as soon as its ``<entry>`` element closes, and
+    frees the element before moving on, so memory stays flat however
+    many entries the feed holds.  If the feed has a ``next`` page it
+    is reported last, as a :class:`NextPage`; a ``next`` link inside
+    an entry ("next in series", say) is just a navigation link.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    next_url: str | None = None
+
+    try:
+        for _, el in etree.iterparse(
+            source, events=("end",), tag=(_ENTRY_TAG, _LINK_TAG),
+        ):
+            parent = el.getparent()
+            if el.tag == _LINK_TAG:
+                # Entry links are read together with their entry.
+                if parent is not None and parent.tag != _ENTRY_TAG:
+                    href = el.get("href", "")
+                    if el.get("rel") == "next" and href:
+                        next_url = _resolve_url(base_url, href)
+                continue
+
+            yield from _entry_items(el, base_url)
+            el.clear()
+            if parent is not None:
+                while el.getprevious() is not None:
+                    del parent[0]
+    except etree.XMLSyntaxError as e:
+        raise ValueError(f"Invalid XML: {e}") from e
+
+    if next_url:
+        yield NextPage(href=next_url)
+
+
+def _entry_items(
+    entry_el: etree._Element, base_url: str,
+) -> list[FeedItem]:
+    """Turn an entry into a book, or into the feed links it carries."""
+    entry = _parse_entry(entry_el, base_url)
+    if entry.acquisition_links:
+        return [entry]
+
+    items: list[FeedItem] = []
+    for link_el in entry_el.findall("atom:link", NS):
         rel = link_el.get("rel", "")
+        link_type = link_el.get("type", "")
         href = link_el.get("href", "")
-        if rel == "next" and href:
-            next_url = _resolve_url(base_url, href)
-
-    return entries, nav_links, next_url
+        if href and _is_feed_link(rel, link_type):
+            items.append(NavigationLink(
+                href=_resolve_url(base_url, href),
+                title=entry.title,
+                rel=rel,
+            ))
+    return items
 
 
 def _parse_entry(
@@ -185,23 +330,30 @@ def detect_opensearch(
 ) -> str | None:
     """Detect if the feed has an OpenSearch endpoint."""
     try:
-        xml_text = fetch_url(client, feed_url)
+        data = fetch_bytes(client, feed_url)
     except OPDSClientError:
         return None
     try:
-        root = etree.fromstring(xml_text.encode("utf-8"))
+        root = etree.fromstring(data)
     except etree.XMLSyntaxError:
         return None
+    return _find_opensearch(client, root, feed_url)
+
 
+def _find_opensearch(
+    client: httpx.Client, root: etree._Element, feed_url: str,
+) -> str | None:
+    """Resolve the search template advertised by a parsed feed."""
     for link_el in root.findall("atom:link", NS):
         rel = link_el.get("rel", "")
         link_type = link_el.get("type", "")
         href = link_el.get("href", "")
-        if (
-            rel == "search"
-            and "opensearchdescription" in link_type
-            and href
-        ):
+        if rel != "search" or not href:
+            continue
+        if "{searchTerms}" in href:
+            # The feed links the template itself; no description needed.
+            return _resolve_url(feed_url, href)
+        if "opensearchdescription" in link_type:
             desc_url = _resolve_url(feed_url, href)
             try:
                 return _parse_opensearch_description(
@@ -213,13 +365,76 @@ def detect_opensearch(
     return None
 
 
+def find_latest_link(
+    nav_links: list[NavigationLink],
+) -> NavigationLink | None:
+    """Pick the navigation link that leads to recent additions."""
+    for nav in nav_links:
+        title_lower = nav.title.lower()
+        if (
+            "latest" in title_lower
+            or "new" in title_lower
+            or "recent" in title_lower
+            or nav.rel == _SORT_NEW
+        ):
+            return nav
+    return None
+
+
+def discover_profile(
+    client: httpx.Client, feed_url: str,
+) -> CatalogProfile:
+    """Probe a catalog for the capabilities commands rely on.
+
+    Reads the root feed, the OpenSearch description it points to and
+    the latest-additions feed, if there is one.  Raises
+    OPDSClientError or ValueError when the root feed is unusable.
+    """
+    data = fetch_bytes(client, feed_url)
+    try:
+        root = etree.fromstring(data)
+    except etree.XMLSyntaxError as e:
+        raise ValueError(f"Invalid XML: {e}") from e
+
+    profile = CatalogProfile(discovered_at=time.time())
+    profile.opensearch_template = _find_opensearch(client, root, feed_url)
+
+    _, nav_links, _ = parse_feed_bytes(data, base_url=feed_url)
+    samples = [(root, feed_url)]
+    latest = find_latest_link(nav_links)
+    if latest is not None:
+        profile.latest_url = latest.href
+        with contextlib.suppress(OPDSClientError, etree.XMLSyntaxError):
+            samples.append((
+                etree.fromstring(fetch_bytes(client, latest.href)),
+                latest.href,
+            ))
+
+    for sample, base_url in samples:
+        for link_el in sample.findall("atom:link", NS):
+            rel = link_el.get("rel", "")
+            if rel == "next":
+                profile.pagination = "next"
+            elif rel == FACET_REL:
+                group = link_el.get(f"{{{OPDS_NS}}}facetGroup", "")
+                if group and group not in profile.facet_groups:
+                    profile.facet_groups.append(group)
+        for entry_el in sample.findall("atom:entry", NS):
+            for acq in _parse_entry(entry_el, base_url).acquisition_links:
+                if acq.type not in profile.mime_types:
+                    profile.mime_types.append(acq.type)
+
+    profile.mime_types.sort()
+    return profile
+
+
 def _parse_opensearch_description(
     client: httpx.Client, desc_url: str,
 ) -> str | None:
     """Parse an OpenSearch description document."""
-    xml_text = fetch_url(client, desc_url)
+    data = fetch_bytes(client, desc_url)
     try:
-        root = etree.fromstring(xml_text.encode("utf-8"))
+        root = etree.fromstring(data)
     except etree.XMLSyntaxError:
         return None
 
@@ -249,77 +464,273 @@ def _parse_opensearch_description(
     return None
 
 
+def fill_opensearch_template(
+    template: str,
+    query: str,
+    start_page: int = 1,
+    start_index: int = 1,
+    count: int = OPENSEARCH_PAGE_SIZE,
+) -> str:
+    """Expand an OpenSearch URL template for one page of results.
+
+    Fills ``{searchTerms}``, ``{startPage}``, ``{startIndex}`` and
+    ``{count}``.  Other optional parameters (``{name?}``) are left
+    empty; other required ones are left as they are.
+    """
+    values = {
+        "searchTerms": quote(query, safe=""),
+        "startPage": str(start_page),
+        "startIndex": str(start_index),
+        "count": str(count),
+    }
+
+    def _fill(match: re.Match[str]) -> str:
+        name, optional = match.group(1), match.group(2)
+        if name in values:
+            return values[name]
+        return "" if optional else match.group(0)
+
+    return _TEMPLATE_PARAM.sub(_fill, template)
+
+
+def _fetch_many(
+    client: httpx.Client,
+    urls: Sequence[str],
+    max_workers: int = DEFAULT_FETCH_WORKERS,
+) -> list[ParseResult | None]:
+    """Fetch and parse several feed pages at once.
+
+    Results come back in the order of *urls*; a page that fails to
+    download or parse is None.
+    """
+
+    def _one(url: str) -> ParseResult | None:
+        try:
+            return parse_feed_bytes(fetch_bytes(client, url), base_url=url)
+        except (OPDSClientError, ValueError):
+            return None
+
+    if len(urls) <= 1:
+        return [_one(url) for url in urls]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as pool:
+        return list(pool.map(_one, urls))
+
+
+def _follow_subsections(
+    client: httpx.Client,
+    nav_links: list[NavigationLink],
+    max_workers: int = DEFAULT_FETCH_WORKERS,
+) -> list[OPDSEntry]:
+    """Entries of the pages *nav_links* point to, in link order."""
+    pages = _fetch_many(
+        client, [nav.href for nav in nav_links], max_workers,
+    )
+    return [e for page in pages if page is not None for e in page[0]]
+
+
 def perform_opensearch(
     client: httpx.Client,
     url_template: str,
     query: str,
     max_follows: int = 25,
+    limit: int = DEFAULT_SEARCH_LIMIT,
+    max_workers: int = DEFAULT_FETCH_WORKERS,
 ) -> list[OPDSEntry]:
-    """Perform an OpenSearch query.
+    """Perform an OpenSearch query, collecting up to *limit* results.
+
+    When the template takes ``{startPage}`` or ``{startIndex}``, the
+    pages needed to reach *limit* are requested *max_workers* at a
+    time once a full page has shown the server's page size: right
+    after the first page if the template takes ``{count}``, after the
+    second otherwise.  Without page parameters the result feed's
+    ``next`` links are followed.  Paging stops at a short, empty or
+    failed page, or one that adds no new results (a server ignoring
+    the page parameters).
 
     Some catalogs return subsection navigation links instead of
-    direct acquisition entries.  When that happens, follow up to
-    *max_follows* subsection links to fetch the real book entries.
+    direct acquisition entries.  When that happens, up to
+    *max_follows* subsection links are fetched concurrently for the
+    real book entries.
     """
-    search_url = url_template.replace(
-        "{searchTerms}", quote(query, safe=""),
-    )
-    try:
-        xml_text = fetch_url(client, search_url)
-        entries, nav_links, _ = parse_feed(
-            xml_text, base_url=search_url,
-        )
-    except (OPDSClientError, ValueError):
+    first = _fetch_many(
+        client, [fill_opensearch_template(url_template, query)],
+    )[0]
+    if first is None:
         return []
-
-    if entries:
-        return entries
-
-    # Follow subsection links to get actual book entries
-    for nav in nav_links[:max_follows]:
-        try:
-            page_xml = fetch_url(client, nav.href)
-            page_entries, _, _ = parse_feed(
-                page_xml, base_url=nav.href,
-            )
-            entries.extend(page_entries)
-        except (OPDSClientError, ValueError):
-            continue
-
-    return entries
+    entries, nav_links, next_url = first
+    if not entries:
+        # Follow subsection links to get actual book entries
+        return _follow_subsections(
+            client, nav_links[:max_follows], max_workers,
+        )[:limit]
+
+    results: list[OPDSEntry] = []
+    seen: set[tuple[str, str]] = set()
+
+    def _add(page_entries: list[OPDSEntry]) -> bool:
+        """Keep the new entries of a page; False if there were none."""
+        added = False
+        for entry in page_entries:
+            key = (entry.entry_id, entry.title)
+            if key not in seen:
+                seen.add(key)
+                results.append(entry)
+                added = True
+        return added
+
+    _add(entries)
+    page_size = len(entries)
+    if _PAGE_PARAMS.search(url_template):
+        # With {count} a page short of it is the last.  Without, the
+        # first page's length is only a guess at the page size until
+        # the second page matches it, so that one is fetched alone.
+        full = bool(_COUNT_PARAM.search(url_template))
+        if full and page_size < OPENSEARCH_PAGE_SIZE:
+            return results[:limit]
+        page = 1
+        while len(results) < limit:
+            wanted = -(-(limit - len(results)) // page_size)
+            workers = max_workers if full else 1
+            batch = range(page + 1, page + 1 + min(wanted, workers))
+            page = batch[-1]
+            pages = _fetch_many(client, [
+                fill_opensearch_template(
+                    url_template, query, start_page=p,
+                    start_index=1 + (p - 1) * page_size,
+                )
+                for p in batch
+            ], max_workers)
+            for parsed in pages:
+                if parsed is None or not _add(parsed[0]):
+                    return results[:limit]
+                if len(parsed[0]) < page_size:
+                    return results[:limit]
+            full = True
+    else:
+        while next_url and len(results) < limit:
+            parsed = _fetch_many(client, [next_url])[0]
+            if parsed is None or not _add(parsed[0]):
+                break
+            next_url = parsed[2]
+    return results[:limit]
 
 
 def fetch_entries(
     client: httpx.Client,
     feed_url: str,
     max_follows: int = 25,
+    max_workers: int = DEFAULT_FETCH_WORKERS,
 ) -> list[OPDSEntry]:
     """Fetch entries from a feed page.
 
     When the page contains only navigation (subsection) links
     instead of direct acquisition entries, follow up to
-    *max_follows* links to retrieve the real book entries.
+    *max_follows* links, *max_workers* at a time, to retrieve the
+    real book entries.  They are returned in link order, and links
+    that fail are skipped.
     """
-    xml_text = fetch_url(client, feed_url)
-    entries, nav_links, _ = parse_feed(
-        xml_text, base_url=feed_url,
+    data = fetch_bytes(client, feed_url)
+    entries, nav_links, _ = parse_feed_bytes(
+        data, base_url=feed_url,
     )
 
     if entries:
         return entries
 
     # Follow subsection links to get actual book entries
-    for nav in nav_links[:max_follows]:
+    return _follow_subsections(
+        client, nav_links[:max_follows], max_workers,
+    )
+
+
+def parse_timestamp(value: str) -> float | None:
+    """Parse an Atom date (RFC 3339, or RFC 822 as some feeds use).
+
+    Returns seconds since the epoch, or None if *value* is not a date.
+    Dates without a time zone are taken as UTC.
+    """
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
         try:
-            page_xml = fetch_url(client, nav.href)
-            page_entries, _, _ = parse_feed(
-                page_xml, base_url=nav.href,
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=UTC)
+    return parsed.timestamp()
+
+
+def latest_entries(
+    client: httpx.Client,
+    feed_url: str,
+    limit: int | None,
+    max_pages: int = DEFAULT_LATEST_PAGES,
+    max_follows: int = 25,
+    since: float | None = None,
+) -> list[OPDSEntry]:
+    """The *limit* most recently updated entries of a feed, newest first.
+
+    Walks the feed through its ``next`` pages, keeping the newest
+    entries in a heap of at most *limit*.  While the feed is in
+    newest-first order, the walk stops as soon as the heap is full and
+    nothing older than its oldest entry has been seen, since later
+    pages can only be older still.  Otherwise it goes on for up to
+    *max_pages*.  Undated entries sort last; equally dated ones keep
+    their feed order.
+
+    With *since*, only entries dated at or after it are kept, and a
+    newest-first feed is walked no further than that date.  A *limit*
+    of None keeps every entry found, which only makes sense with
+    *since*.
+    """
+    heap: list[tuple[float, int, OPDSEntry]] = []
+    order = itertools.count()
+    newest_first = True
+    last = math.inf
+    url: str | None = feed_url
+    pages = 0
+    while url and pages < max_pages:
+        try:
+            entries, nav_links, url = parse_feed_bytes(
+                fetch_bytes(client, url), base_url=url,
             )
-            entries.extend(page_entries)
         except (OPDSClientError, ValueError):
-            continue
-
-    return entries
+            if not pages:
+                raise
+            break
+        pages += 1
+        if not entries and pages == 1:
+            # Follow subsection links to get actual book entries
+            entries = _follow_subsections(client, nav_links[:max_follows])
+            newest_first = False
+        for entry in entries:
+            stamp = parse_timestamp(entry.updated)
+            if stamp is not None:
+                newest_first = newest_first and stamp <= last
+                last = stamp
+            if since is not None and (stamp is None or stamp < since):
+                continue
+            # Later entries get smaller tie-breakers, so they are
+            # evicted first among equally dated ones.
+            item = (
+                -math.inf if stamp is None else stamp, -next(order), entry,
+            )
+            if limit is None or len(heap) < limit:
+                heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+        if newest_first and (
+            (limit is not None and len(heap) >= limit
+             and last <= heap[0][0])
+            or (since is not None and last < since)
+        ):
+            break
+    heap.sort(key=lambda item: item[:2], reverse=True)
+    return [entry for _, _, entry in heap]
 
 
 def crawl_entries(
@@ -327,30 +738,38 @@ def crawl_entries(
     feed_url: str,
     max_depth: int = 3,
 ) -> list[OPDSEntry]:
-    """Crawl an OPDS feed recursively."""
+    """Crawl an OPDS feed depth-first, one page at a time.
+
+    Uses an explicit stack, so long ``next`` chains and deep trees
+    don't hit the recursion limit, and tracks visited URLs by the
+    digest of their canonical form.  See :mod:`opdscli.crawl` for the
+    concurrent, budgeted crawler the commands use.
+    """
     all_entries: list[OPDSEntry] = []
-    visited: set[str] = set()
+    visited = VisitedUrls()
+    stack = [(feed_url, 0)]
 
-    def _crawl(url: str, depth: int) -> None:
-        if depth > max_depth or url in visited:
-            return
-        visited.add(url)
+    while stack:
+        url, depth = stack.pop()
+        if depth > max_depth or not visited.add(url):
+            continue
 
         try:
-            xml_text = fetch_url(client, url)
-            entries, nav_links, next_url = parse_feed(
-                xml_text, base_url=url,
+            data = fetch_bytes(client, url)
+            entries, nav_links, next_url = parse_feed_bytes(
+                data, base_url=url,
             )
         except (OPDSClientError, ValueError):
-            return
+            continue
 
         all_entries.extend(entries)
 
-        for nav in nav_links:
-            _crawl(nav.href, depth + 1)
-
+        # Pushed in reverse so nav links pop first, in document order,
+        # and the next page only after their subtrees.
         if next_url:
-            _crawl(next_url, depth)
+            stack.append((next_url, depth))
+        stack.extend(
+            (nav.href, depth + 1) for nav in reversed(nav_links)
+        )
 
-    _crawl(feed_url, 0)
     return all_entries
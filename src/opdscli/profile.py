@@ -0,0 +1,42 @@
+import threading
+
+import httpx
+
+from opdscli.config import AppConfig, CatalogProfile, save_config
+from opdscli.http import OPDSClientError
+from opdscli.opds import discover_profile
+
+DEFAULT_PROFILE_TTL = 7 * 24 * 3600.0
+
+# Federated searches refresh profiles from several threads.
+_save_lock = threading.Lock()
+
+
+def refresh_profile(
+    config: AppConfig, name: str, client: httpx.Client,
+) -> CatalogProfile:
+    """Rediscover a catalog's capabilities and save them to the config."""
+    catalog = config.catalogs[name]
+    profile = discover_profile(client, catalog.url)
+    with _save_lock:
+        catalog.profile = profile
+        save_config(config)
+    return profile
+
+
+def get_profile(
+    config: AppConfig, name: str, client: httpx.Client,
+) -> CatalogProfile:
+    """Return a catalog's cached profile, rediscovering it when stale.
+
+    If discovery fails, an empty profile is returned and nothing is
+    saved, so the next command tries again.
+    """
+    catalog = config.catalogs[name]
+    ttl = float(config.settings.get("profile_ttl", DEFAULT_PROFILE_TTL))
+    if catalog.profile is not None and catalog.profile.is_fresh(ttl):
+        return catalog.profile
+    try:
+        return refresh_profile(config, name, client)
+    except (OPDSClientError, ValueError):
+        return CatalogProfile(discovered_at=0.0)
@@ -0,0 +1,177 @@
+import heapq
+import math
+import re
+import unicodedata
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+
+from opdscli.opds import OPDSEntry
+from opdscli.titles import fold
+
+# Relative weight of a term found in each field; the local index
+# weighs its FTS5 columns the same way.
+FIELD_WEIGHTS = {"title": 10.0, "author": 5.0, "summary": 1.0}
+
+# Standard BM25 saturation and length-normalization parameters.
+K1 = 1.2
+B = 0.75
+
+_TOKEN = re.compile(r"\w+")
+
+# Characters that tokenizing drops but that mean something in a query
+# word, like those of "C++" or "C#"; hyphens, apostrophes and sentence
+# punctuation only separate words.
+_SYMBOL = re.compile(r"[^\w\s\-'’.,:;!?\"()]")
+_EDGE_PUNCTUATION = ".,:;!?\"()'’"
+
+
+def tokenize(text: str) -> list[str]:
+    """Split *text* into NFKC-normalized, case-folded words."""
+    return _TOKEN.findall(unicodedata.normalize("NFKC", text).casefold())
+
+
+def _folded(entry: OPDSEntry) -> str:
+    """*entry*'s ranked fields, folded into one searchable string."""
+    return fold("\n".join(getattr(entry, name) for name in FIELD_WEIGHTS))
+
+
+def _term_patterns(terms: Sequence[str]) -> list[tuple[str, re.Pattern[str]]]:
+    return [(term, re.compile(rf"(?<!\w){re.escape(term)}")) for term in terms]
+
+
+def _has_term(text: str, term: str, pattern: re.Pattern[str]) -> bool:
+    # The substring test rejects most entries far faster than the
+    # word-start regex.
+    return term in text and pattern.search(text) is not None
+
+
+def _length(text: str) -> int:
+    """Words in a field, for length normalization."""
+    return len(text.split())
+
+
+def matcher(query: str) -> Callable[[OPDSEntry], bool]:
+    """A test of whether every word of *query* prefixes a word of an entry.
+
+    The query is tokenized once.  Entries are not split into words:
+    their fields are case-folded (and NFKC-normalized if not ASCII)
+    and searched for each term as a substring, then at the start of
+    a word.  A query word with symbols that tokenizing drops, like
+    ``C++`` or ``C#``, must also appear as it is, so it doesn't match
+    every word starting with ``c``.  A query with nothing left to
+    match, such as ``!!``, matches no entry.
+    """
+    patterns = _term_patterns(tokenize(query))
+    literals = [
+        word.strip(_EDGE_PUNCTUATION) for word in fold(query).split()
+        if _SYMBOL.search(word)
+    ]
+    if not patterns and not literals:
+        return lambda entry: False
+
+    def _matches(entry: OPDSEntry) -> bool:
+        text = _folded(entry)
+        return all(
+            _has_term(text, term, pattern) for term, pattern in patterns
+        ) and all(word in text for word in literals)
+
+    return _matches
+
+
+@dataclass
+class CorpusStats:
+    """Collection statistics a query's matches are ranked against."""
+
+    size: int  # entries in the collection
+    average: dict[str, float]  # mean words per field
+    df: dict[str, int]  # entries where each query term prefixes a word
+
+
+def corpus_stats(entries: Sequence[OPDSEntry], query: str) -> CorpusStats:
+    """Gather :class:`CorpusStats` for *query* over all of *entries*.
+
+    One cheap pass: fields are counted in whitespace-separated words
+    and searched for the query's terms like :func:`matcher` does,
+    without being tokenized.
+    """
+    patterns = _term_patterns(list(dict.fromkeys(tokenize(query))))
+    totals = dict.fromkeys(FIELD_WEIGHTS, 0)
+    df = dict.fromkeys((term for term, _ in patterns), 0)
+    for entry in entries:
+        for name in totals:
+            totals[name] += _length(getattr(entry, name))
+        text = _folded(entry)
+        for term, pattern in patterns:
+            if _has_term(text, term, pattern):
+                df[term] += 1
+    n = len(entries)
+    return CorpusStats(
+        size=n,
+        average={
+            name: total / n if n else 0.0 for name, total in totals.items()
+        },
+        df=df,
+    )
+
+
+def rank_entries(
+    entries: Sequence[OPDSEntry],
+    query: str,
+    k: int | None = None,
+    stats: CorpusStats | None = None,
+    weights: dict[str, float] = FIELD_WEIGHTS,
+    k1: float = K1,
+    b: float = B,
+) -> list[OPDSEntry]:
+    """Entries matching every word of *query*, best first, by BM25F.
+
+    Meant for the entries a query has already matched (see
+    :func:`matcher`), with term statistics precomputed by
+    :func:`corpus_stats` over the whole collection they were matched
+    in, so rare terms outweigh common ones.  Without *stats* they are
+    taken from *entries* alone.  Only the query's own terms are
+    counted; term frequencies are weighted per field by *weights* and,
+    like the local index, a term counts where it prefixes a word.
+    Equal scores keep the entries' order.  With *k*, only the best
+    *k* are selected, without sorting the rest.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms or not entries:
+        return []
+    stats = stats or corpus_stats(entries, query)
+    frequencies: list[dict[str, float]] = []
+    for entry in entries:
+        tf = dict.fromkeys(terms, 0.0)
+        for name, weight in weights.items():
+            text = getattr(entry, name)
+            average = stats.average.get(name, 0.0)
+            norm = (
+                1 - b + b * _length(text) / average if average else 1.0
+            )
+            for word in tokenize(text):
+                for term in terms:
+                    if word.startswith(term):
+                        tf[term] += weight / norm
+        frequencies.append(tf)
+    n = stats.size
+    idf = {}
+    for term in terms:
+        df = stats.df.get(term, 0)
+        idf[term] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+    scores = {
+        doc: sum(
+            idf[term] * freq * (k1 + 1) / (freq + k1)
+            for term, freq in tf.items()
+        )
+        for doc, tf in enumerate(frequencies)
+        if all(tf.values())
+    }
+
+    def key(item: tuple[int, float]) -> tuple[float, int]:
+        return item[1], -item[0]
+
+    ranked = (
+        heapq.nlargest(k, scores.items(), key=key) if k is not None
+        else sorted(scores.items(), key=key, reverse=True)
+    )
+    return [entries[doc] for doc, _ in ranked]
@@ -0,0 +1,144 @@
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from opdscli.config import ThrottleConfig
+
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How often and how patiently to retry a failed request."""
+
+    max_retries: int = 2
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+    max_retry_after: float = 120.0
+    jitter: bool = True
+    retry_statuses: frozenset[int] = field(default=RETRY_STATUSES)
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """Seconds to wait before retry number *attempt* + 1.
+
+        A server-provided Retry-After wins over the computed backoff.
+        Otherwise the delay doubles per attempt, capped at max_backoff,
+        and is jittered so concurrent workers don't retry in lockstep.
+        """
+        if retry_after is not None:
+            return retry_after
+        delay = min(self.max_backoff, self.backoff * 2.0 ** attempt)
+        if self.jitter:
+            delay = random.uniform(delay / 2, delay)
+        return delay
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every request to one host.
+
+    ``reserve()`` never blocks; it books the next token and returns
+    how long the caller must wait for it, so both ``time.sleep`` and
+    ``asyncio.sleep`` callers can share one bucket.
+    """
+
+    def __init__(self, rate: float | None = None, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, rate: float | None, burst: int) -> None:
+        with self._lock:
+            self.rate = rate
+            self.burst = max(1, burst)
+            self._tokens = min(self._tokens, float(self.burst))
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every request to this host for *seconds*."""
+        with self._lock:
+            self._paused_until = max(
+                self._paused_until, time.monotonic() + seconds,
+            )
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._paused_until - now)
+            if self.rate is None:
+                return wait
+            self._tokens = min(
+                float(self.burst),
+                self._tokens + (now - self._updated) * self.rate,
+            )
+            self._updated = now
+            self._tokens -= 1.0
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+
+_buckets: dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def host_bucket(
+    url: str, rate: float | None = None, burst: int = 1,
+) -> TokenBucket:
+    """Return the process-wide bucket for *url*'s host.
+
+    A configured *rate* replaces the host's current limits, so the
+    catalog that set them governs every client talking to that host.
+    """
+    host = urlsplit(url).netloc.lower()
+    with _buckets_lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            bucket = _buckets[host] = TokenBucket(rate, burst)
+        elif rate is not None:
+            bucket.configure(rate, burst)
+        return bucket
+
+
+@dataclass(frozen=True)
+class Throttle:
+    """Rate limit and retry policy applied to one catalog's requests."""
+
+    policy: RetryPolicy = field(default_factory=RetryPolicy)
+    rate: float | None = None
+    burst: int = 1
+
+    @classmethod
+    def from_config(cls, config: ThrottleConfig | None) -> "Throttle":
+        if config is None:
+            return cls()
+        return cls(
+            policy=RetryPolicy(
+                max_retries=config.max_retries,
+                backoff=config.backoff,
+                max_backoff=config.max_backoff,
+            ),
+            rate=config.rate,
+            burst=config.burst,
+        )
+
+    def bucket(self, url: str) -> TokenBucket:
+        return host_bucket(url, self.rate, self.burst)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
@@ -0,0 +1,52 @@
+import re
+import unicodedata
+from collections.abc import Iterable
+
+from opdscli.opds import OPDSEntry
+
+_APOSTROPHES = re.compile(r"['’ʼ]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_title(title: str) -> str:
+    """Fold a title so trivially different spellings compare equal.
+
+    Applies NFKC and Unicode case folding, drops apostrophes, turns
+    other punctuation into spaces and collapses runs of whitespace, so
+    ``"Don Quixote: Part I"`` and ``"don quixote — part i"`` match.
+    """
+    text = _APOSTROPHES.sub("", unicodedata.normalize("NFKC", title))
+    text = "".join(
+        " " if unicodedata.category(c).startswith("P") else c
+        for c in text.casefold()
+    )
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def fold(text: str) -> str:
+    """Case-fold *text*, applying NFKC first unless it is ASCII.
+
+    A cheaper :func:`normalize_title` for text compared or searched
+    in bulk: punctuation and whitespace are left alone.
+    """
+    if not text.isascii():
+        text = unicodedata.normalize("NFKC", text)
+    return text.casefold()
+
+
+class TitleMap:
+    """Entries keyed by normalized title; the first entry added wins."""
+
+    def __init__(self, entries: Iterable[OPDSEntry] = ()) -> None:
+        self._titles: dict[str, OPDSEntry] = {}
+        self.add(entries)
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def add(self, entries: Iterable[OPDSEntry]) -> None:
+        for entry in entries:
+            self._titles.setdefault(normalize_title(entry.title), entry)
+
+    def get(self, title: str) -> OPDSEntry | None:
+        return self._titles.get(normalize_title(title))
@@ -0,0 +1,76 @@
+import json
+import os
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from opdscli.index import entry_key
+from opdscli.opds import OPDSEntry, parse_timestamp
+
+WATERMARK_PATH = Path.home() / ".local" / "share" / "opdscli" / "watermarks.json"
+
+
+@dataclass
+class Watermark:
+    """The newest entries ``latest`` has reported for a catalog."""
+
+    updated: float  # newest timestamp reported, seconds since the epoch
+    keys: list[str] = field(default_factory=list)  # entries dated *updated*
+
+    def is_new(self, entry: OPDSEntry) -> bool:
+        """Whether *entry* is newer than anything reported so far.
+
+        Undated entries can't be placed and never count as new.
+        """
+        stamp = parse_timestamp(entry.updated)
+        if stamp is None:
+            return False
+        return stamp > self.updated or (
+            stamp == self.updated and entry_key(entry) not in self.keys
+        )
+
+    def advance(self, entries: Iterable[OPDSEntry]) -> "Watermark":
+        """The watermark after also reporting *entries*."""
+        updated, keys = self.updated, set(self.keys)
+        for entry in entries:
+            stamp = parse_timestamp(entry.updated)
+            if stamp is None or stamp < updated:
+                continue
+            if stamp > updated:
+                updated, keys = stamp, set()
+            keys.add(entry_key(entry))
+        return Watermark(updated=updated, keys=sorted(keys))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"updated": self.updated, "keys": self.keys}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "Watermark":
+        return cls(
+            updated=float(data.get("updated", 0.0)),
+            keys=list(data.get("keys", [])),
+        )
+
+
+def load_watermarks(path: Path | None = None) -> dict[str, Watermark]:
+    """Load every catalog's watermark; missing or corrupt state is empty."""
+    watermark_path = path or WATERMARK_PATH
+    try:
+        data = json.loads(watermark_path.read_text())
+    except (OSError, ValueError):
+        return {}
+    return {name: Watermark.from_dict(mark) for name, mark in data.items()}
+
+
+def save_watermarks(
+    marks: dict[str, Watermark], path: Path | None = None,
+) -> None:
+    """Save watermarks, replacing the file atomically."""
+    watermark_path = path or WATERMARK_PATH
+    watermark_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = watermark_path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(
+        {name: mark.to_dict() for name, mark in marks.items()}, indent=2,
+    ))
+    os.replace(tmp, watermark_path)
@@ -1,10 +1,102 @@
+from collections.abc import Iterable
 from pathlib import Path
 
 import pytest
 
+import opdscli.cache
+import opdscli.config
+import opdscli.crawl
+import opdscli.index
+import opdscli.throttle
+import opdscli.watermark
+
 FIXTURES_DIR = Path(__file__).parent / "fixtures"
 
 
+def atom_feed(
+    books: Iterable[str | tuple[str, str]] = (),
+    next_href: str | None = None,
+    *,
+    nav: Iterable[str | tuple[str, str]] = (),
+) -> str:
+    """A minimal Atom feed for mocked catalog pages.
+
+    *books* are titles or (title, updated) pairs; each becomes an entry
+    whose id is its title and whose EPUB lives at ``/{title}.epub``.
+    *nav* are hrefs or (href, rel) pairs linking to acquisition feeds,
+    ``subsection`` by default, listed before the books.
+    """
+    parts = ['<feed xmlns="http://www.w3.org/2005/Atom">']
+    if next_href:
+        parts.append(f'<link rel="next" href="{next_href}"/>')
+    for link in nav:
+        href, rel = (link, "subsection") if isinstance(link, str) else link
+        parts.append(
+            f"<entry><title>{href}</title>"
+            f'<link rel="{rel}" href="{href}" '
+            'type="application/atom+xml;kind=acquisition"/></entry>'
+        )
+    for book in books:
+        title, updated = (book, "") if isinstance(book, str) else book
+        parts.append(
+            f"<entry><title>{title}</title><id>{title}</id>"
+            + (f"<updated>{updated}</updated>" if updated else "")
+            + '<link rel="http://opds-spec.org/acquisition"'
+            f' href="/{title}.epub" type="application/epub+zip"/></entry>'
+        )
+    parts.append("</feed>")
+    return "".join(parts)
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+) -> Path:
+    """Keep the HTTP cache and crawl checkpoints out of the home directory."""
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(opdscli.cache, "CACHE_DIR", cache_dir)
+    monkeypatch.setattr(
+        opdscli.crawl, "CHECKPOINT_DIR", cache_dir / "crawls",
+    )
+    return cache_dir
+
+
+@pytest.fixture(autouse=True)
+def isolated_index_dir(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+) -> Path:
+    """Keep the catalog index out of the user's home directory."""
+    index_dir = tmp_path / "index"
+    monkeypatch.setattr(opdscli.index, "INDEX_DIR", index_dir)
+    return index_dir
+
+
+@pytest.fixture(autouse=True)
+def isolated_watermarks(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+) -> Path:
+    """Keep `latest --since-last` state out of the user's home directory."""
+    path = tmp_path / "index" / "watermarks.json"
+    monkeypatch.setattr(opdscli.watermark, "WATERMARK_PATH", path)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def isolated_config_path(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+) -> Path:
+    """Keep commands that save discovered profiles off the real config."""
+    config_path = tmp_path / "opdscli.yaml"
+    monkeypatch.setattr(opdscli.config, "CONFIG_PATH", config_path)
+    return config_path
+
+
+@pytest.fixture(autouse=True)
+def fresh_host_buckets(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Stop rate limits and Retry-After pauses leaking between tests."""
+    monkeypatch.setattr(opdscli.throttle, "_buckets", {})
+
+
 @pytest.fixture
 def fixtures_dir() -> Path:
     return FIXTURES_DIR
@@ -0,0 +1,216 @@
+import asyncio
+import os
+import time
+
+import httpx
+import respx
+
+from opdscli.cache import (
+    AsyncCachingTransport,
+    CachingTransport,
+    ResponseCache,
+    open_cache,
+)
+from opdscli.config import AuthConfig, CatalogConfig
+from opdscli.http import create_client, fetch_url
+
+FEED_URL = "https://example.com/opds"
+ATOM = "application/atom+xml;profile=opds-catalog"
+FEED = "<feed xmlns='http://www.w3.org/2005/Atom'>" + "<x/>" * 200 + "</feed>"
+
+
+def _client(cache: ResponseCache) -> httpx.Client:
+    return httpx.Client(transport=CachingTransport(cache))
+
+
+class TestCachingTransport:
+    @respx.mock
+    def test_fresh_entry_skips_network(self, tmp_path):
+        route = respx.get(FEED_URL).mock(
+            return_value=httpx.Response(
+                200, text=FEED, headers={"Content-Type": ATOM},
+            ),
+        )
+        cache = ResponseCache(tmp_path / "http.sqlite", ttl=60)
+        client = _client(cache)
+
+        assert fetch_url(client, FEED_URL) == FEED
+        assert fetch_url(client, FEED_URL) == FEED
+        assert route.call_count == 1
+
+    @respx.mock
+    def test_stale_entry_revalidates_with_304(self, tmp_path):
+        route = respx.get(FEED_URL)
+        route.side_effect = [
+            httpx.Response(
+                200, text=FEED,
+                headers={"Content-Type": ATOM, "ETag": '"v1"'},
+            ),
+            httpx.Response(304),
+        ]
+        cache = ResponseCache(tmp_path / "http.sqlite", ttl=0)
+        client = _client(cache)
+
+        fetch_url(client, FEED_URL)
+        assert fetch_url(client, FEED_URL) == FEED
+        assert route.calls.last.request.headers["If-None-Match"] == '"v1"'
+        assert cache.stats().revalidated == 1
+
+    @respx.mock
+    def test_last_modified_revalidation(self, tmp_path):
+        stamp = "Mon, 15 Jan 2024 10:00:00 GMT"
+        route = respx.get(FEED_URL)
+        route.side_effect = [
+            httpx.Response(
+                200, text=FEED,
+                headers={"Content-Type": ATOM, "Last-Modified": stamp},
+            ),
+            httpx.Response(200, text="<feed/>", headers={"Content-Type": ATOM}),
+        ]
+        cache = ResponseCache(tmp_path / "http.sqlite", ttl=0)
+        client = _client(cache)
+
+        fetch_url(client, FEED_URL)
+        assert fetch_url(client, FEED_URL) == "<feed/>"
+        assert route.calls.last.request.headers["If-Modified-Since"] == stamp
+
+    @respx.mock
+    def test_keyed_by_credentials(self, tmp_path):
+        route = respx.get(FEED_URL).mock(
+            return_value=httpx.Response(
+                200, text=FEED, headers={"Content-Type": ATOM},
+            ),
+        )
+        cache = ResponseCache(tmp_path / "http.sqlite", ttl=60)
+        alice = create_client(
+            CatalogConfig(
+                url=FEED_URL,
+                auth=AuthConfig(type="bearer", token="alice"),
+            ),
+            cache=cache,
+        )
+        bob = create_client(
+            CatalogConfig(
+                url=FEED_URL,
+                auth=AuthConfig(type="bearer", token="bob"),
+            ),
+            cache=cache,
+        )
+
+        fetch_url(alice, FEED_URL)
+        fetch_url(bob, FEED_URL)
+        assert route.call_count == 2
+
+    @respx.mock
+    def test_non_feed_responses_not_stored(self, tmp_path):
+        route = respx.get("https://example.com/book.epub").mock(
+            return_value=httpx.Response(
+                200, content=b"epub",
+                headers={"Content-Type": "application/epub+zip"},
+            ),
+        )
+        cache = ResponseCache(tmp_path / "http.sqlite", ttl=60)
+        client = _client(cache)
+
+        client.get("https://example.com/book.epub")
+        client.get("https://example.com/book.epub")
+        assert route.call_count == 2
+        assert cache.stats().entries == 0
+
+    @respx.mock
+    def test_no_cache_always_revalidates(self, tmp_path):
+        route = respx.get(FEED_URL)
+        route.side_effect = [
+            httpx.Response(200, text="<v1/>", headers={
+                "Content-Type": ATOM, "ETag": '"v1"',
+                "Cache-Control": "no-cache, max-age=0",
+            }),
+            httpx.Response(200, text="<v2/>", headers={"Content-Type": ATOM}),
+        ]
+        cache = ResponseCache(tmp_path / "http.sqlite", ttl=300)
+        client = _client(cache)
+
+        fetch_url(client, FEED_URL)
+        assert fetch_url(client, FEED_URL) == "<v2/>"
+        assert route.calls.last.request.headers["If-None-Match"] == '"v1"'
+
+    @respx.mock
+    def test_ttl_capped_at_max_age(self, tmp_path, monkeypatch):
+        route = respx.get(FEED_URL).mock(
+            return_value=httpx.Response(200, text=FEED, headers={
+                "Content-Type": ATOM, "Cache-Control": "public, max-age=10",
+            }),
+        )
+        cache = ResponseCache(tmp_path / "http.sqlite", ttl=300)
+        client = _client(cache)
+        now = time.time()
+
+        fetch_url(client, FEED_URL)
+        monkeypatch.setattr(time, "time", lambda: now + 5)
+        fetch_url(client, FEED_URL)
+        assert route.call_count == 1
+        monkeypatch.setattr(time, "time", lambda: now + 20)
+        fetch_url(client, FEED_URL)
+        assert route.call_count == 2
+
+    def test_keeps_environment_proxies(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("HTTPS_PROXY", "http://proxy.example:3128")
+        cache = ResponseCache(tmp_path / "http.sqlite")
+        client = create_client(CatalogConfig(url=FEED_URL), cache=cache)
+
+        transport = client._transport_for_url(httpx.URL(FEED_URL))
+        assert isinstance(transport, CachingTransport)
+        assert transport is not client._transport
+
+    @respx.mock
+    def test_async_transport(self, tmp_path):
+        route = respx.get(FEED_URL).mock(
+            return_value=httpx.Response(
+                200, text=FEED, headers={"Content-Type": ATOM},
+            ),
+        )
+        cache = ResponseCache(tmp_path / "http.sqlite", ttl=60)
+
+        async def run() -> list[str]:
+            transport = AsyncCachingTransport(cache)
+            async with httpx.AsyncClient(transport=transport) as client:
+                first = await client.get(FEED_URL)
+                second = await client.get(FEED_URL)
+            return [first.text, second.text]
+
+        assert asyncio.run(run()) == [FEED, FEED]
+        assert route.call_count == 1
+
+
+class TestResponseCache:
+    def test_compressed_storage(self, tmp_path):
+        cache = ResponseCache(tmp_path / "http.sqlite")
+        cache.put("k", FEED_URL, ATOM, FEED.encode())
+        stats = cache.stats()
+        assert stats.raw_size == len(FEED)
+        assert stats.size < stats.raw_size
+        assert cache.get("k").body == FEED.encode()
+
+    def test_lru_eviction(self, tmp_path):
+        body = os.urandom(2000)  # incompressible
+        cache = ResponseCache(tmp_path / "http.sqlite", max_bytes=5000)
+        cache.put("a", "https://a", ATOM, body)
+        cache.put("b", "https://b", ATOM, body)
+        cache.get("a")
+        cache.put("c", "https://c", ATOM, body)
+
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+
+    def test_clear(self, tmp_path):
+        cache = ResponseCache(tmp_path / "http.sqlite")
+        cache.put("k", FEED_URL, ATOM, b"<feed/>")
+        assert cache.clear() == 1
+        assert cache.stats().entries == 0
+
+    def test_open_cache_disabled(self, tmp_path):
+        assert open_cache({"http_cache": False}) is None
+        cache = open_cache({"cache_ttl": 5}, path=tmp_path / "c.sqlite")
+        assert cache is not None
+        assert cache.ttl == 5
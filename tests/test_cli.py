@@ -1,3 +1,4 @@
+import time
 from pathlib import Path
 from unittest.mock import patch
 
@@ -6,7 +7,9 @@ import respx
 from typer.testing import CliRunner
 
 from opdscli.cli import app, register_commands
-from opdscli.config import AppConfig, CatalogConfig
+from opdscli.config import AppConfig, CatalogConfig, CatalogProfile
+from opdscli.crawl import crawl_catalog
+from tests.conftest import atom_feed
 
 runner = CliRunner()
 
@@ -47,7 +50,11 @@ class TestVersionFlag:
 
 
 class TestCatalogCommands:
+    @respx.mock
     def test_catalog_add_and_list(self):
+        respx.get("https://example.com/opds").mock(
+            return_value=httpx.Response(200, text=_empty_xml()),
+        )
         with (
             patch(
                 "opdscli.commands.catalog.load_config",
@@ -63,6 +70,77 @@ class TestCatalogCommands:
             assert result.exit_code == 0
             assert "Added catalog" in result.output
 
+    @respx.mock
+    def test_catalog_add_discovers_profile(self):
+        config = AppConfig()
+        respx.get("https://example.com/opds").mock(
+            return_value=httpx.Response(
+                200,
+                text=(FIXTURES_DIR / "navigation_feed.xml").read_text(),
+            ),
+        )
+        respx.get("https://example.com/opensearch.xml").mock(
+            return_value=httpx.Response(
+                200, text=(FIXTURES_DIR / "opensearch.xml").read_text(),
+            ),
+        )
+        with (
+            patch(
+                "opdscli.commands.catalog.load_config", lambda: config,
+            ),
+            patch("opdscli.commands.catalog.save_config"),
+        ):
+            result = runner.invoke(
+                app,
+                ["catalog", "add", "mylib", "https://example.com/opds"],
+            )
+            assert result.exit_code == 0
+
+        profile = config.catalogs["mylib"].profile
+        assert profile is not None
+        assert profile.opensearch_template == (
+            "https://example.com/search?q={searchTerms}"
+        )
+
+    def test_catalog_add_no_discover(self):
+        config = AppConfig()
+        with (
+            patch(
+                "opdscli.commands.catalog.load_config", lambda: config,
+            ),
+            patch("opdscli.commands.catalog.save_config"),
+        ):
+            result = runner.invoke(
+                app,
+                ["catalog", "add", "mylib", "https://example.com/opds",
+                 "--no-discover"],
+            )
+            assert result.exit_code == 0
+        assert config.catalogs["mylib"].profile is None
+
+    @respx.mock
+    def test_catalog_refresh(self):
+        respx.get("https://example.com/opds").mock(
+            return_value=httpx.Response(200, text=_empty_xml()),
+        )
+        with patch(
+            "opdscli.commands.catalog.load_config", _test_config,
+        ):
+            result = runner.invoke(app, ["catalog", "refresh", "test"])
+            assert result.exit_code == 0
+            assert "Capabilities of 'test'" in result.output
+
+    @respx.mock
+    def test_catalog_refresh_unreachable(self):
+        respx.get("https://example.com/opds").mock(
+            return_value=httpx.Response(404),
+        )
+        with patch(
+            "opdscli.commands.catalog.load_config", _test_config,
+        ):
+            result = runner.invoke(app, ["catalog", "refresh"])
+            assert result.exit_code == 1
+
     def test_catalog_add_duplicate(self):
         with patch(
             "opdscli.commands.catalog.load_config",
@@ -178,12 +256,30 @@ class TestSearchCommand:
         with patch(
             "opdscli.commands.search.load_config",
             _test_config,
-        ):
+        ), patch(
+            "opdscli.commands.search.crawl_catalog",
+            wraps=crawl_catalog,
+        ) as crawl:
             result = runner.invoke(
                 app, ["search", "adventure"],
             )
             assert result.exit_code == 0
             assert "The Great Adventure" in result.output
+        # Without --limit or --stream, pages aren't matched mid-crawl.
+        assert crawl.call_args.kwargs["on_entries"] is None
+
+    @respx.mock
+    def test_search_query_without_words(self):
+        root = respx.get("https://example.com/opds")
+
+        with patch(
+            "opdscli.commands.search.load_config",
+            _test_config,
+        ):
+            result = runner.invoke(app, ["search", "!!", "--stream"])
+        assert result.exit_code == 1
+        assert "no words" in result.output
+        assert root.call_count == 0
 
     @respx.mock
     def test_search_no_results(self):
@@ -203,6 +299,156 @@ class TestSearchCommand:
             assert result.exit_code == 0
             assert "No results found" in result.output
 
+    @respx.mock
+    def test_search_uses_cached_profile(self):
+        acq_xml = (
+            FIXTURES_DIR / "acquisition_feed.xml"
+        ).read_text()
+        root = respx.get("https://example.com/opds")
+        respx.get("https://example.com/search").mock(
+            return_value=httpx.Response(200, text=acq_xml),
+        )
+        respx.get("https://example.com/opds/fiction?page=2").mock(
+            return_value=httpx.Response(200, text=_empty_xml()),
+        )
+
+        def cfg() -> AppConfig:
+            config = _test_config()
+            config.catalogs["test"].profile = CatalogProfile(
+                discovered_at=time.time(),
+                opensearch_template=(
+                    "https://example.com/search?q={searchTerms}"
+                ),
+            )
+            return config
+
+        with patch("opdscli.commands.search.load_config", cfg):
+            result = runner.invoke(app, ["search", "adventure"])
+            assert result.exit_code == 0
+            assert "The Great Adventure" in result.output
+        assert root.call_count == 0
+
+    @respx.mock
+    def test_search_stream_with_limit(self):
+        acq_xml = (
+            FIXTURES_DIR / "acquisition_feed.xml"
+        ).read_text()
+        nav_xml = (
+            FIXTURES_DIR / "navigation_feed.xml"
+        ).read_text()
+        respx.get("https://example.com/opds").mock(
+            return_value=httpx.Response(200, text=nav_xml),
+        )
+        respx.get("https://example.com/opensearch.xml").mock(
+            return_value=httpx.Response(404),
+        )
+        page2 = respx.get("https://example.com/opds/fiction?page=2").mock(
+            return_value=httpx.Response(200, text=_empty_xml()),
+        )
+        respx.get("https://example.com/opds/fiction").mock(
+            return_value=httpx.Response(200, text=acq_xml),
+        )
+        respx.get("https://example.com/opds/science").mock(
+            return_value=httpx.Response(200, text=acq_xml),
+        )
+
+        with patch(
+            "opdscli.commands.search.load_config",
+            _test_config,
+        ):
+            result = runner.invoke(
+                app, ["search", "j", "--stream", "--limit", "2"],
+            )
+        assert result.exit_code == 0
+        lines = result.output.strip().splitlines()
+        assert lines == [
+            "The Great Adventure — Jane Author (epub, pdf)",
+            "Mystery at Dawn — John Writer, Alice Coauthor (epub)",
+        ]
+        assert "partial" not in result.output
+        assert page2.call_count == 0
+
+    @respx.mock
+    def test_search_fuzzy(self):
+        acq_xml = (
+            FIXTURES_DIR / "acquisition_feed.xml"
+        ).read_text()
+        opensearch = respx.get("https://example.com/opensearch.xml")
+        respx.get("https://example.com/opds/fiction?page=2").mock(
+            return_value=httpx.Response(200, text=_empty_xml()),
+        )
+        respx.get("https://example.com/opds").mock(
+            return_value=httpx.Response(200, text=acq_xml),
+        )
+
+        with patch(
+            "opdscli.commands.search.load_config",
+            _test_config,
+        ):
+            result = runner.invoke(
+                app, ["search", "grate adventur", "--fuzzy"],
+            )
+        assert result.exit_code == 0
+        assert "The Great Adventure" in result.output
+        assert "Mystery at Dawn" not in result.output
+        assert opensearch.call_count == 0
+
+    @respx.mock
+    def test_search_all_catalogs(self):
+        acq_xml = (
+            FIXTURES_DIR / "acquisition_feed.xml"
+        ).read_text()
+        respx.get("https://example.com/search").mock(
+            return_value=httpx.Response(200, text=acq_xml),
+        )
+        respx.get("https://example.com/opds/fiction?page=2").mock(
+            return_value=httpx.Response(200, text=_empty_xml()),
+        )
+        respx.get("https://example.org/opds").mock(
+            return_value=httpx.Response(200, text=acq_xml),
+        )
+        respx.get("https://example.org/opds/fiction?page=2").mock(
+            return_value=httpx.Response(200, text=_empty_xml()),
+        )
+        respx.get("https://example.net/opds").mock(
+            return_value=httpx.Response(500),
+        )
+
+        def cfg() -> AppConfig:
+            config = _test_config()
+            config.catalogs["test"].profile = CatalogProfile(
+                discovered_at=time.time(),
+                opensearch_template=(
+                    "https://example.com/search?q={searchTerms}"
+                ),
+            )
+            for name, host in (("other", "org"), ("broken", "net")):
+                config.catalogs[name] = CatalogConfig(
+                    url=f"https://example.{host}/opds",
+                    profile=CatalogProfile(discovered_at=time.time()),
+                )
+            return config
+
+        with patch("opdscli.commands.search.load_config", cfg):
+            result = runner.invoke(
+                app, ["search", "adventure", "--all"],
+            )
+        assert result.exit_code == 0
+        assert result.output.count("The Great Adventure") == 1
+        assert "test, other" in result.output
+        assert "Catalog" in result.output
+
+    def test_search_unknown_catalogs(self):
+        with patch(
+            "opdscli.commands.search.load_config",
+            _test_config,
+        ):
+            result = runner.invoke(
+                app, ["search", "x", "--catalogs", "test,nope"],
+            )
+        assert result.exit_code == 1
+        assert "nope" in result.output
+
     def test_search_no_catalog(self):
         with patch(
             "opdscli.commands.search.load_config",
@@ -221,6 +467,9 @@ class TestLatestCommand:
         respx.get("https://example.com/opds").mock(
             return_value=httpx.Response(200, text=acq_xml),
         )
+        respx.get("https://example.com/opds/fiction?page=2").mock(
+            return_value=httpx.Response(200, text=_empty_xml()),
+        )
 
         with patch(
             "opdscli.commands.latest.load_config",
@@ -239,6 +488,9 @@ class TestLatestCommand:
         respx.get("https://example.com/opds").mock(
             return_value=httpx.Response(200, text=acq_xml),
         )
+        respx.get("https://example.com/opds/fiction?page=2").mock(
+            return_value=httpx.Response(200, text=_empty_xml()),
+        )
 
         with patch(
             "opdscli.commands.latest.load_config",
@@ -266,6 +518,110 @@ class TestLatestCommand:
             assert result.exit_code == 0
             assert "No entries found" in result.output
 
+    @respx.mock
+    def test_latest_since_last(self):
+        route = respx.get("https://example.com/opds")
+        route.mock(return_value=httpx.Response(200, text=atom_feed([
+            ("Second", "2024-01-02T00:00:00Z"),
+            ("First", "2024-01-01T00:00:00Z"),
+        ])))
+
+        with patch(
+            "opdscli.commands.latest.load_config",
+            _test_config,
+        ):
+            result = runner.invoke(app, ["latest", "--since-last"])
+            assert result.exit_code == 0
+            assert "First" in result.output and "Second" in result.output
+
+            result = runner.invoke(app, ["latest", "--since-last"])
+            assert "No new entries" in result.output
+
+            route.mock(return_value=httpx.Response(
+                200, text=atom_feed([
+                    ("Third", "2024-01-02T00:00:00Z"),
+                    ("Second", "2024-01-02T00:00:00Z"),
+                    ("First", "2024-01-01T00:00:00Z"),
+                ]),
+            ))
+            result = runner.invoke(app, ["latest", "--since-last"])
+            assert "Third" in result.output
+            assert "Second" not in result.output
+
+            # Plain runs don't move the watermark.
+            result = runner.invoke(app, ["latest"])
+            assert "First" in result.output
+            result = runner.invoke(app, ["latest", "--since-last"])
+            assert "No new entries" in result.output
+
+    @respx.mock
+    def test_latest_since_last_reports_past_limit(self):
+        route = respx.get("https://example.com/opds")
+        route.mock(return_value=httpx.Response(200, text=atom_feed([
+            ("Old", "2024-01-01T00:00:00Z"),
+        ])))
+
+        with patch(
+            "opdscli.commands.latest.load_config",
+            _test_config,
+        ):
+            runner.invoke(app, ["latest", "--since-last", "--limit", "2"])
+            route.mock(return_value=httpx.Response(
+                200, text=atom_feed([
+                    ("Book c", "2024-01-04T00:00:00Z"),
+                    ("Book b", "2024-01-03T00:00:00Z"),
+                    ("Book a", "2024-01-02T00:00:00Z"),
+                    ("Old", "2024-01-01T00:00:00Z"),
+                ]),
+            ))
+            result = runner.invoke(
+                app, ["latest", "--since-last", "--limit", "2"],
+            )
+            assert result.exit_code == 0
+            for title in ("Book a", "Book b", "Book c"):
+                assert title in result.output
+            assert "Old" not in result.output
+
+    @respx.mock
+    def test_latest_watch_uses_conditional_requests(self):
+        feed = atom_feed([("Only", "2024-01-01T00:00:00Z")])
+        conditional: list[str | None] = []
+
+        def respond(request: httpx.Request) -> httpx.Response:
+            conditional.append(request.headers.get("If-None-Match"))
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(
+                200, text=feed, headers={
+                    "ETag": '"v1"', "Content-Type": "application/atom+xml",
+                },
+            )
+
+        respx.get("https://example.com/opds").mock(side_effect=respond)
+        sleeps = iter([None, KeyboardInterrupt()])
+
+        def fake_sleep(seconds: float) -> None:
+            if seconds != 60:
+                return  # rate limiting, not the poll interval
+            outcome = next(sleeps)
+            if outcome is not None:
+                raise outcome
+
+        def cfg() -> AppConfig:
+            config = _test_config()
+            config.catalogs["test"].profile = CatalogProfile(
+                discovered_at=time.time(),
+            )
+            return config
+
+        with (
+            patch("opdscli.commands.latest.load_config", cfg),
+            patch("opdscli.commands.latest.time.sleep", fake_sleep),
+        ):
+            result = runner.invoke(app, ["latest", "--watch", "60"])
+        assert result.exit_code == 0
+        assert result.output.count("Only") == 1
+        assert conditional == [None, '"v1"']
 
 class TestDownloadCommand:
     @respx.mock
@@ -304,6 +660,41 @@ class TestDownloadCommand:
             saved = tmp_path / "The Great Adventure.epub"
             assert saved.exists()
 
+    @respx.mock
+    def test_download_stops_crawl_at_match(self, tmp_path):
+        acq_xml = (
+            FIXTURES_DIR / "acquisition_feed.xml"
+        ).read_text()
+        respx.get("https://example.com/opds").mock(
+            return_value=httpx.Response(200, text=acq_xml),
+        )
+        page2 = respx.get(
+            "https://example.com/opds/fiction?page=2",
+        ).mock(
+            return_value=httpx.Response(
+                200, text=_empty_xml(),
+            ),
+        )
+        respx.get(
+            "https://example.com/download/book-001.epub",
+        ).mock(
+            return_value=httpx.Response(
+                200, content=b"fake epub content",
+            ),
+        )
+
+        with patch(
+            "opdscli.commands.download.load_config",
+            _test_config,
+        ):
+            result = runner.invoke(app, [
+                "download", "the great  ADVENTURE!",
+                "--output", str(tmp_path),
+            ])
+            assert result.exit_code == 0
+            assert (tmp_path / "The Great Adventure.epub").exists()
+        assert page2.call_count == 0
+
     @respx.mock
     def test_download_not_found_with_suggestions(self):
         acq_xml = (
@@ -339,3 +730,211 @@ class TestDownloadCommand:
                 app, ["download", "test"],
             )
             assert result.exit_code == 1
+
+
+class TestCacheCommands:
+    def test_cache_stats(self):
+        with patch(
+            "opdscli.commands.cache.load_config",
+            lambda: AppConfig(),
+        ):
+            result = runner.invoke(app, ["cache", "stats"])
+            assert result.exit_code == 0
+            assert "Entries" in result.output
+
+    def test_cache_clear(self):
+        with patch(
+            "opdscli.commands.cache.load_config",
+            lambda: AppConfig(),
+        ):
+            result = runner.invoke(app, ["cache", "clear"])
+            assert result.exit_code == 0
+            assert "Removed 0 cached responses" in result.output
+
+    def test_cache_disabled(self):
+        with patch(
+            "opdscli.commands.cache.load_config",
+            lambda: AppConfig(settings={"http_cache": False}),
+        ):
+            result = runner.invoke(app, ["cache", "stats"])
+            assert result.exit_code == 1
+
+
+class TestIndexCommands:
+    @respx.mock
+    def test_build_then_search_offline(self):
+        acq_xml = (
+            FIXTURES_DIR / "acquisition_feed.xml"
+        ).read_text()
+        root = respx.get("https://example.com/opds").mock(
+            return_value=httpx.Response(200, text=acq_xml),
+        )
+        respx.get("https://example.com/opds/fiction?page=2").mock(
+            return_value=httpx.Response(200, text=_empty_xml()),
+        )
+
+        with patch(
+            "opdscli.commands.index.load_config", _test_config,
+        ):
+            result = runner.invoke(app, ["index", "build"])
+            assert result.exit_code == 0
+            assert "Indexed" in result.output
+
+        calls = root.call_count
+        with patch(
+            "opdscli.commands.search.load_config", _test_config,
+        ):
+            result = runner.invoke(app, ["search", "adventure"])
+            assert result.exit_code == 0
+            assert "The Great Adventure" in result.output
+        assert root.call_count == calls
+
+        result = runner.invoke(app, ["index", "list"])
+        assert "test" in result.output
+
+    @respx.mock
+    def test_download_from_index(self, tmp_path):
+        acq_xml = (
+            FIXTURES_DIR / "acquisition_feed.xml"
+        ).read_text()
+        respx.get("https://example.com/opds").mock(
+            return_value=httpx.Response(200, text=acq_xml),
+        )
+        respx.get("https://example.com/opds/fiction?page=2").mock(
+            return_value=httpx.Response(200, text=_empty_xml()),
+        )
+        respx.get(
+            "https://example.com/download/book-001.epub",
+        ).mock(
+            return_value=httpx.Response(200, content=b"epub"),
+        )
+
+        with patch(
+            "opdscli.commands.index.load_config", _test_config,
+        ):
+            runner.invoke(app, ["index", "build"])
+        with patch(
+            "opdscli.commands.download.load_config", _test_config,
+        ):
+            result = runner.invoke(
+                app,
+                ["download", "the great adventure", "-o", str(tmp_path)],
+            )
+            assert result.exit_code == 0
+        assert (tmp_path / "The Great Adventure.epub").read_bytes() == b"epub"
+
+    @respx.mock
+    def test_incremental_build(self):
+        acq_xml = (
+            FIXTURES_DIR / "acquisition_feed.xml"
+        ).read_text()
+        respx.get("https://example.com/opds").mock(
+            return_value=httpx.Response(200, text=acq_xml),
+        )
+        respx.get("https://example.com/opds/fiction?page=2").mock(
+            return_value=httpx.Response(200, text=_empty_xml()),
+        )
+        respx.get("https://example.com/new").mock(
+            return_value=httpx.Response(200, text=acq_xml),
+        )
+
+        def cfg() -> AppConfig:
+            config = _test_config()
+            config.catalogs["test"].profile = CatalogProfile(
+                discovered_at=time.time(),
+                latest_url="https://example.com/new",
+            )
+            return config
+
+        with patch("opdscli.commands.index.load_config", cfg):
+            result = runner.invoke(app, ["index", "build", "-i"])
+            assert "building it in full" in result.output
+            assert "Indexed 3 entries" in result.output
+
+            result = runner.invoke(app, ["index", "build", "-i"])
+            assert result.exit_code == 0
+            assert "Updated 0 entries from 1 pages" in result.output
+
+    @staticmethod
+    def _uncached_config(**settings) -> AppConfig:
+        config = _test_config()
+        config.settings = {"http_cache": False, **settings}
+        return config
+
+    @respx.mock
+    def test_failed_crawl_keeps_index(self):
+        acq_xml = (
+            FIXTURES_DIR / "acquisition_feed.xml"
+        ).read_text()
+        root = respx.get("https://example.com/opds").mock(
+            return_value=httpx.Response(200, text=acq_xml),
+        )
+        respx.get("https://example.com/opds/fiction?page=2").mock(
+            return_value=httpx.Response(200, text=_empty_xml()),
+        )
+
+        with patch(
+            "opdscli.commands.index.load_config", self._uncached_config,
+        ):
+            runner.invoke(app, ["index", "build"])
+            root.mock(return_value=httpx.Response(404))
+            result = runner.invoke(app, ["index", "build"])
+        assert result.exit_code == 1
+        assert "found no entries" in result.output
+        result = runner.invoke(app, ["index", "list"])
+        assert "3" in result.output
+
+    @respx.mock
+    def test_partial_crawl_merges_into_index(self):
+        acq_xml = (
+            FIXTURES_DIR / "acquisition_feed.xml"
+        ).read_text()
+        root = respx.get("https://example.com/opds").mock(
+            return_value=httpx.Response(200, text=acq_xml),
+        )
+        respx.get("https://example.com/opds/fiction?page=2").mock(
+            return_value=httpx.Response(200, text=_empty_xml()),
+        )
+
+        with patch(
+            "opdscli.commands.index.load_config", self._uncached_config,
+        ):
+            runner.invoke(app, ["index", "build"])
+        root.mock(return_value=httpx.Response(200, text=acq_xml.replace(
+            "The Great Adventure", "A New Adventure",
+        ).replace("urn:uuid:book-001", "urn:uuid:book-004")))
+        with patch(
+            "opdscli.commands.index.load_config",
+            lambda: self._uncached_config(crawl_budget={"pages": 1}),
+        ):
+            result = runner.invoke(app, ["index", "build"])
+        assert result.exit_code == 0
+        assert "merged into" in result.output
+        assert "Indexed 4 entries" in result.output
+
+    @respx.mock
+    def test_dry_run_reports_pruned_links(self):
+        respx.get("https://example.com/opds").mock(
+            return_value=httpx.Response(200, text=(
+                '<feed xmlns="http://www.w3.org/2005/Atom"><entry>'
+                '<title>By language</title>'
+                '<link rel="http://opds-spec.org/facet" href="/opds/en"'
+                ' type="application/atom+xml"/></entry></feed>'
+            )),
+        )
+
+        with patch(
+            "opdscli.commands.index.load_config", _test_config,
+        ):
+            result = runner.invoke(app, ["index", "build", "--dry-run"])
+            assert result.exit_code == 0
+            assert "would index 0 entries from 1 pages" in result.output
+            assert "facet" in result.output
+
+        result = runner.invoke(app, ["index", "list"])
+        assert "No catalogs indexed" in result.output
+
+    def test_list_empty(self):
+        result = runner.invoke(app, ["index", "list"])
+        assert result.exit_code == 0
+        assert "No catalogs indexed" in result.output
@@ -1,9 +1,15 @@
 import stat
 
+import pytest
+
+import opdscli.config
 from opdscli.config import (
     AppConfig,
     AuthConfig,
     CatalogConfig,
+    CatalogProfile,
+    CrawlPolicyConfig,
+    ThrottleConfig,
     load_config,
     save_config,
 )
@@ -54,6 +60,64 @@ class TestConfigRoundTrip:
         assert loaded.catalogs["tokenlib"].auth.type == "bearer"
         assert loaded.catalogs["tokenlib"].auth.token == "secret123"
 
+    def test_throttle_roundtrip(self, tmp_path):
+        config_path = tmp_path / "test_config.yaml"
+        config = AppConfig(
+            catalogs={
+                "slow": CatalogConfig(
+                    url="https://slow.example.com/opds",
+                    throttle=ThrottleConfig(rate=0.5, burst=2, max_retries=4),
+                ),
+            },
+        )
+        save_config(config, path=config_path)
+        loaded = load_config(path=config_path)
+
+        throttle = loaded.catalogs["slow"].throttle
+        assert throttle is not None
+        assert throttle.rate == 0.5
+        assert throttle.burst == 2
+        assert throttle.max_retries == 4
+
+    def test_crawl_policy_roundtrip(self, tmp_path):
+        config_path = tmp_path / "test_config.yaml"
+        policy = CrawlPolicyConfig(
+            sort="popular", follow_facets=True, skip_patterns=["/series/"],
+        )
+        config = AppConfig(
+            catalogs={
+                "lib": CatalogConfig(
+                    url="https://example.com/opds", crawl_policy=policy,
+                ),
+            },
+        )
+        save_config(config, path=config_path)
+        loaded = load_config(path=config_path)
+
+        assert loaded.catalogs["lib"].crawl_policy == policy
+
+    def test_profile_roundtrip(self, tmp_path):
+        config_path = tmp_path / "test_config.yaml"
+        profile = CatalogProfile(
+            discovered_at=1700000000.0,
+            opensearch_template="https://example.com/search?q={searchTerms}",
+            latest_url="https://example.com/opds/new",
+            pagination="next",
+            facet_groups=["Language"],
+            mime_types=["application/epub+zip"],
+        )
+        config = AppConfig(
+            catalogs={
+                "lib": CatalogConfig(
+                    url="https://example.com/opds", profile=profile,
+                ),
+            },
+        )
+        save_config(config, path=config_path)
+        loaded = load_config(path=config_path)
+
+        assert loaded.catalogs["lib"].profile == profile
+
 
 class TestMissingConfig:
     def test_returns_empty_config(self, tmp_path):
@@ -74,6 +138,25 @@ class TestConfigPermissions:
         assert not (mode & stat.S_IRGRP)
 
 
+class TestAtomicSave:
+    def test_failed_save_keeps_previous_file(self, tmp_path, monkeypatch):
+        config_path = tmp_path / "test_config.yaml"
+        save_config(
+            AppConfig(catalogs={"mylib": CatalogConfig(url="https://a")}),
+            path=config_path,
+        )
+        before = config_path.read_text()
+
+        def interrupted_dump(data, stream, **kwargs):
+            stream.write("catalogs:\n")
+            raise KeyboardInterrupt
+
+        monkeypatch.setattr(opdscli.config.yaml, "dump", interrupted_dump)
+        with pytest.raises(KeyboardInterrupt):
+            save_config(AppConfig(), path=config_path)
+        assert config_path.read_text() == before
+
+
 class TestConfigOperations:
     def test_add_catalog(self, tmp_path):
         config_path = tmp_path / "test_config.yaml"
@@ -0,0 +1,476 @@
+import asyncio
+
+import httpx
+import pytest
+import respx
+
+from opdscli.config import CrawlPolicyConfig
+from opdscli.crawl import (
+    CrawlBudget,
+    CrawlCheckpoint,
+    CrawlPolicy,
+    crawl_entries_async,
+    crawl_feed_async,
+)
+from opdscli.opds import NavigationLink, crawl_entries
+from tests.conftest import atom_feed
+
+BASE = "https://example.com"
+
+
+def _mock_catalog(feeds: dict[str, str]) -> dict[str, respx.Route]:
+    return {
+        path: respx.get(f"{BASE}{path}").mock(
+            return_value=httpx.Response(200, text=xml),
+        )
+        for path, xml in feeds.items()
+    }
+
+
+_VIEWS = {
+    "/opds": atom_feed(nav=("/by-author", "/by-series")),
+    "/by-author": atom_feed(nav=["/author-more"], books=["x1", "x2"]),
+    "/by-series": atom_feed(nav=["/series-more"], books=["x2", "x1"]),
+    "/author-more": atom_feed(books=["x3", "x1"]),
+    "/series-more": atom_feed(books=["x4"]),
+}
+
+_CATALOG = {
+    "/opds": atom_feed(nav=("/a", "/b"), books=("root-book",)),
+    "/a": atom_feed(nav=["/shared"], books=["a1", "a2"], next_href="/a-page2"),
+    "/a-page2": atom_feed(books=["a3"]),
+    "/b": atom_feed(nav=["/shared", "/a"], books=["b1"]),
+    "/shared": atom_feed(nav=["/deep"], books=["s1"]),
+    "/deep": atom_feed(books=["d1"]),
+}
+
+
+def _titles(entries) -> list[str]:
+    return [e.title for e in entries]
+
+
+class TestCrawlEntriesAsync:
+    @respx.mock
+    def test_same_entries_as_sequential_crawl(self):
+        _mock_catalog(_CATALOG)
+        expected = crawl_entries(httpx.Client(), f"{BASE}/opds")
+
+        async def run():
+            async with httpx.AsyncClient() as client:
+                return await crawl_entries_async(client, f"{BASE}/opds")
+
+        assert _titles(asyncio.run(run())) == _titles(expected)
+
+    @respx.mock
+    def test_each_url_fetched_once(self):
+        routes = _mock_catalog(_CATALOG)
+
+        async def run():
+            async with httpx.AsyncClient() as client:
+                return await crawl_entries_async(
+                    client, f"{BASE}/opds", concurrency=4,
+                )
+
+        asyncio.run(run())
+        assert all(route.call_count == 1 for route in routes.values())
+
+    @respx.mock
+    def test_respects_max_depth(self):
+        _mock_catalog(_CATALOG)
+
+        async def run():
+            async with httpx.AsyncClient() as client:
+                return await crawl_entries_async(
+                    client, f"{BASE}/opds", max_depth=1,
+                )
+
+        titles = _titles(asyncio.run(run()))
+        assert "a3" in titles
+        assert "s1" not in titles
+        assert "d1" not in titles
+
+    @respx.mock
+    def test_concurrency_limit(self):
+        in_flight = 0
+        peak = 0
+        children = [f"/c{i}" for i in range(10)]
+
+        async def slow_page(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return httpx.Response(200, text=atom_feed(books=[request.url.path]))
+
+        respx.get(f"{BASE}/opds").mock(
+            return_value=httpx.Response(200, text=atom_feed(nav=children)),
+        )
+        for path in children:
+            respx.get(f"{BASE}{path}").mock(side_effect=slow_page)
+
+        async def run():
+            async with httpx.AsyncClient() as client:
+                return await crawl_entries_async(
+                    client, f"{BASE}/opds", concurrency=3,
+                )
+
+        entries = asyncio.run(run())
+        assert len(entries) == 10
+        assert 1 < peak <= 3
+
+    @respx.mock
+    def test_failed_pages_are_skipped(self):
+        respx.get(f"{BASE}/opds").mock(
+            return_value=httpx.Response(
+                200, text=atom_feed(nav=["/broken", "/ok"]),
+            ),
+        )
+        respx.get(f"{BASE}/broken").mock(
+            return_value=httpx.Response(500),
+        )
+        respx.get(f"{BASE}/ok").mock(
+            return_value=httpx.Response(200, text=atom_feed(books=["ok"])),
+        )
+
+        async def run():
+            async with httpx.AsyncClient() as client:
+                return await crawl_entries_async(client, f"{BASE}/opds")
+
+        assert _titles(asyncio.run(run())) == ["ok"]
+
+    @respx.mock
+    def test_equivalent_urls_fetched_once(self):
+        respx.get(f"{BASE}/opds").mock(
+            return_value=httpx.Response(200, text=atom_feed(nav=[
+                "/list?sort=title&amp;page=1",
+                "/list?page=1&amp;sort=title#books",
+                "https://EXAMPLE.com:443/list?page=1&amp;sort=title",
+            ])),
+        )
+        listing = respx.get(f"{BASE}/list").mock(
+            return_value=httpx.Response(200, text=atom_feed(books=["x"])),
+        )
+
+        async def run():
+            async with httpx.AsyncClient() as client:
+                return await crawl_entries_async(client, f"{BASE}/opds")
+
+        assert _titles(asyncio.run(run())) == ["x"]
+        assert listing.call_count == 1
+        assert _titles(crawl_entries(httpx.Client(), f"{BASE}/opds")) == ["x"]
+        assert listing.call_count == 2
+
+    @respx.mock
+    def test_linked_url_fetched_as_given(self):
+        respx.get(f"{BASE}/opds").mock(
+            return_value=httpx.Response(200, text=atom_feed(
+                nav=["/list?sort=title&amp;page=1"],
+            )),
+        )
+        listing = respx.get(f"{BASE}/list").mock(
+            return_value=httpx.Response(200, text=atom_feed(books=["x"])),
+        )
+
+        async def run():
+            async with httpx.AsyncClient() as client:
+                return await crawl_entries_async(client, f"{BASE}/opds")
+
+        assert _titles(asyncio.run(run())) == ["x"]
+        crawl_entries(httpx.Client(), f"{BASE}/opds")
+        assert [call.request.url.query for call in listing.calls] == [
+            b"sort=title&page=1", b"sort=title&page=1",
+        ]
+
+
+class TestDuplicateListings:
+    @respx.mock
+    def test_repeated_listing_not_expanded(self):
+        routes = _mock_catalog(_VIEWS)
+
+        async def run():
+            async with httpx.AsyncClient() as client:
+                return await crawl_feed_async(
+                    client, f"{BASE}/opds", concurrency=1,
+                )
+
+        result = asyncio.run(run())
+        assert result.duplicate_pages == 1
+        assert routes["/series-more"].call_count == 0
+        assert _titles(result.entries) == ["x1", "x2", "x3"]
+
+    @respx.mock
+    def test_entries_deduplicated_by_id(self):
+        _mock_catalog({
+            "/opds": atom_feed(nav=("/a", "/b")),
+            "/a": atom_feed(books=["x1", "x2"]),
+            "/b": atom_feed(books=["x2", "x3"]),
+        })
+
+        async def run():
+            async with httpx.AsyncClient() as client:
+                return await crawl_feed_async(client, f"{BASE}/opds")
+
+        result = asyncio.run(run())
+        assert result.duplicate_pages == 0
+        assert _titles(result.entries) == ["x1", "x2", "x3"]
+
+
+class TestEntryCallback:
+    @respx.mock
+    def test_entries_streamed_once(self):
+        _mock_catalog(_CATALOG)
+        streamed: list[str] = []
+
+        def collect(entries):
+            streamed.extend(_titles(entries))
+            return False
+
+        async def run():
+            async with httpx.AsyncClient() as client:
+                return await crawl_feed_async(
+                    client, f"{BASE}/opds", on_entries=collect,
+                )
+
+        result = asyncio.run(run())
+        assert result.complete
+        assert sorted(streamed) == sorted(_titles(result.entries))
+
+    @respx.mock
+    def test_callback_stops_crawl(self):
+        routes = _mock_catalog(_CATALOG)
+
+        async def run():
+            async with httpx.AsyncClient() as client:
+                return await crawl_feed_async(
+                    client, f"{BASE}/opds", concurrency=1,
+                    on_entries=lambda entries: True,
+                )
+
+        result = asyncio.run(run())
+        assert result.stopped_by == "caller"
+        assert result.pages == 1
+        assert routes["/a"].call_count == 0
+
+
+class _InterruptedError(Exception):
+    pass
+
+
+def _crawl(checkpoint=None, concurrency=1):
+    async def run():
+        async with httpx.AsyncClient() as client:
+            return await crawl_entries_async(
+                client, f"{BASE}/opds",
+                concurrency=concurrency, checkpoint=checkpoint,
+            )
+
+    return asyncio.run(run())
+
+
+class TestCheckpoint:
+    @respx.mock
+    def test_resume_after_interruption(self, tmp_path):
+        routes = _mock_catalog(_CATALOG)
+        expected = _titles(_crawl())
+        for route in routes.values():
+            route.reset()
+
+        path = tmp_path / "crawl.sqlite"
+        routes["/shared"].side_effect = _InterruptedError
+        with pytest.raises(_InterruptedError):
+            _crawl(CrawlCheckpoint(path, every=1))
+        fetched = {p for p, r in routes.items() if r.call_count}
+        assert "/deep" not in fetched
+
+        routes["/shared"].side_effect = None
+        for route in routes.values():
+            route.reset()
+        assert _titles(_crawl(CrawlCheckpoint(path))) == expected
+        # Only the frontier is fetched again.
+        refetched = {p for p, r in routes.items() if r.call_count}
+        assert refetched == {"/shared", "/deep"} | (
+            set(_CATALOG) - fetched
+        )
+
+    @respx.mock
+    def test_failed_pages_retried_on_resume(self, tmp_path):
+        respx.get(f"{BASE}/opds").mock(
+            return_value=httpx.Response(200, text=atom_feed(nav=["/flaky"])),
+        )
+        flaky = respx.get(f"{BASE}/flaky")
+        flaky.side_effect = [
+            httpx.Response(404),
+            httpx.Response(200, text=atom_feed(books=["late"])),
+        ]
+        path = tmp_path / "crawl.sqlite"
+
+        assert _crawl(CrawlCheckpoint(path)) == []
+        assert _titles(_crawl(CrawlCheckpoint(path))) == ["late"]
+
+    def test_other_crawl_discarded(self, tmp_path):
+        checkpoint = CrawlCheckpoint(tmp_path / "crawl.sqlite")
+        checkpoint.load(f"{BASE}/opds", 3)
+        checkpoint.discovered(f"{BASE}/opds", 0)
+        checkpoint.flush()
+
+        assert checkpoint.load(f"{BASE}/opds", 3)[1] == {f"{BASE}/opds": 0}
+        assert checkpoint.load(f"{BASE}/other", 3) == ({}, {})
+
+
+def _crawl_budgeted(budget, concurrency=1):
+    async def run():
+        async with httpx.AsyncClient() as client:
+            return await crawl_feed_async(
+                client, f"{BASE}/opds",
+                concurrency=concurrency, budget=budget,
+            )
+
+    return asyncio.run(run())
+
+
+class TestBudget:
+    @respx.mock
+    def test_unlimited_crawl_is_complete(self):
+        _mock_catalog(_CATALOG)
+        result = _crawl_budgeted(CrawlBudget())
+        assert result.complete
+        assert result.pages == len(_CATALOG)
+        assert result.size > 0
+
+    @respx.mock
+    def test_page_budget(self):
+        routes = _mock_catalog(_CATALOG)
+        result = _crawl_budgeted(CrawlBudget(pages=3), concurrency=4)
+
+        assert result.stopped_by == "pages"
+        assert result.pages == 3
+        assert sum(r.call_count for r in routes.values()) == 3
+        # Shallowest pages are fetched first.
+        assert _titles(result.entries) == ["root-book", "a1", "a2", "b1"]
+
+    @respx.mock
+    def test_entry_budget(self):
+        _mock_catalog(_CATALOG)
+        result = _crawl_budgeted(CrawlBudget(entries=3))
+        assert result.stopped_by == "entries"
+        assert len(result.entries) == 3
+
+    @respx.mock
+    def test_size_budget(self):
+        _mock_catalog(_CATALOG)
+        result = _crawl_budgeted(CrawlBudget(size=1))
+        assert result.stopped_by == "size"
+        assert result.pages == 1
+
+    @respx.mock
+    def test_time_budget(self):
+        async def slow_page(request):
+            await asyncio.sleep(5)
+            return httpx.Response(200, text=atom_feed(books=["late"]))
+
+        respx.get(f"{BASE}/opds").mock(
+            return_value=httpx.Response(
+                200, text=atom_feed(nav=["/slow"], books=["early"]),
+            ),
+        )
+        respx.get(f"{BASE}/slow").mock(side_effect=slow_page)
+
+        result = _crawl_budgeted(CrawlBudget(seconds=0.2))
+        assert result.stopped_by == "seconds"
+        assert _titles(result.entries) == ["early"]
+
+    def test_from_settings(self):
+        budget = CrawlBudget.from_settings(
+            {"crawl_budget": {"pages": 10, "size_mb": 0.5, "seconds": 60}},
+        )
+        assert budget == CrawlBudget(
+            pages=10, size=512 * 1024, seconds=60,
+        )
+        assert CrawlBudget.from_settings({}) == CrawlBudget()
+
+
+class TestSequentialCrawl:
+    @respx.mock
+    def test_long_next_chain_does_not_recurse(self):
+        length = 1500
+
+        def page(request):
+            n = int(request.url.params.get("p", "0"))
+            next_href = f"/opds?p={n + 1}" if n + 1 < length else None
+            return httpx.Response(
+                200, text=atom_feed(books=[f"b{n}"], next_href=next_href),
+            )
+
+        respx.get(f"{BASE}/opds").mock(side_effect=page)
+        entries = crawl_entries(httpx.Client(), f"{BASE}/opds")
+        assert len(entries) == length
+        assert entries[-1].title == f"b{length - 1}"
+
+
+_SORT = "http://opds-spec.org/sort/"
+_FACET = "http://opds-spec.org/facet"
+
+
+def _views_feed() -> str:
+    return atom_feed(nav=[
+        ("/popular", _SORT + "popular"),
+        ("/new", _SORT + "new"),
+        ("/lang-en", _FACET),
+        ("/authors", "subsection"),
+        ("/tmp/x", "subsection"),
+    ])
+
+
+class TestCrawlPolicy:
+    @respx.mock
+    def test_prunes_facets_and_alternate_sorts(self):
+        respx.get(f"{BASE}/opds").mock(
+            return_value=httpx.Response(200, text=_views_feed()),
+        )
+        routes = _mock_catalog({
+            path: atom_feed(books=[path.strip("/")])
+            for path in ("/popular", "/new", "/lang-en", "/authors", "/tmp/x")
+        })
+        policy = CrawlPolicy.from_config(
+            CrawlPolicyConfig(skip_patterns=["/tmp/"]),
+        )
+
+        async def run():
+            async with httpx.AsyncClient() as client:
+                return await crawl_feed_async(
+                    client, f"{BASE}/opds", policy=policy,
+                )
+
+        result = asyncio.run(run())
+        assert _titles(result.entries) == ["new", "authors"]
+        assert routes["/popular"].call_count == 0
+        assert routes["/lang-en"].call_count == 0
+        assert result.pruned == {
+            "alternate sort": 1, "facet": 1, "skip pattern": 1,
+        }
+        assert result.pruned_samples["facet"] == [f"{BASE}/lang-en"]
+
+    def test_preferred_sort_falls_back_to_first(self):
+        links = [
+            NavigationLink(href="/title", rel=_SORT + "title"),
+            NavigationLink(href="/popular", rel=_SORT + "popular"),
+        ]
+        kept, pruned = CrawlPolicy().select(links)
+        assert [link.href for link in kept] == ["/title"]
+        assert pruned == [("/popular", "alternate sort")]
+
+        kept, _ = CrawlPolicy(sort="popular").select(links)
+        assert [link.href for link in kept] == ["/popular"]
+
+    def test_follow_everything(self):
+        links = [
+            NavigationLink(href="/new", rel=_SORT + "new"),
+            NavigationLink(href="/popular", rel=_SORT + "popular"),
+            NavigationLink(href="/lang", rel=_FACET),
+        ]
+        kept, pruned = CrawlPolicy(sort="all", follow_facets=True).select(
+            links,
+        )
+        assert kept == links
+        assert pruned == []
@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+
+from opdscli.federated import merge_results, search_catalogs
+from opdscli.http import OPDSClientError
+from opdscli.opds import OPDSEntry
+
+
+def _book(title, author="A", entry_id=""):
+    return OPDSEntry(title=title, author=author, entry_id=entry_id)
+
+
+class TestMergeResults:
+    def test_interleaves_by_rank(self):
+        hits = merge_results({
+            "one": [_book("A1"), _book("A2")],
+            "two": [_book("B1"), _book("B2"), _book("B3")],
+        })
+        assert [h.entry.title for h in hits] == ["A1", "B1", "A2", "B2", "B3"]
+        assert hits[0].catalogs == ["one"]
+
+    def test_dedupes_by_id(self):
+        hits = merge_results({
+            "one": [_book("Emma", entry_id="urn:1")],
+            "two": [_book("Emma (Penguin)", entry_id="urn:1")],
+        })
+        assert len(hits) == 1
+        assert hits[0].entry.title == "Emma"
+        assert hits[0].catalogs == ["one", "two"]
+
+    def test_dedupes_by_title_and_author(self):
+        hits = merge_results({
+            "one": [_book("Emma", "Jane Austen", "urn:1")],
+            "two": [_book("EMMA.", "jane austen", "urn:2")],
+            "three": [_book("Emma", "Someone Else")],
+        })
+        assert [h.catalogs for h in hits] == [["one", "two"], ["three"]]
+
+
+class TestSearchCatalogs:
+    def test_collects_results_and_errors(self):
+        def search(name):
+            if name == "bad":
+                raise OPDSClientError("HTTP 500")
+            return [_book(name)]
+
+        results, errors = search_catalogs(["a", "bad", "b"], search)
+        assert list(results) == ["a", "b"]
+        assert errors == {"bad": "HTTP 500"}
+
+    def test_runs_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def search(name):
+            barrier.wait()
+            return []
+
+        results, errors = search_catalogs(["a", "b", "c"], search)
+        assert errors == {}
+        assert len(results) == 3
+
+    def test_timeout(self):
+        release = threading.Event()
+
+        def search(name):
+            if name == "slow":
+                release.wait(5)
+            return [_book(name)]
+
+        try:
+            results, errors = search_catalogs(
+                ["fast", "slow"], search, timeout=0.2,
+            )
+        finally:
+            release.set()
+        assert list(results) == ["fast"]
+        assert errors == {"slow": "timed out"}
+
+    def test_abandoned_search_does_not_block_exit(self):
+        release = threading.Event()
+        daemon = []
+
+        def search(name):
+            daemon.append(threading.current_thread().daemon)
+            release.wait(5)
+            return []
+
+        try:
+            _, errors = search_catalogs(["slow"], search, timeout=0.1)
+        finally:
+            release.set()
+        assert errors == {"slow": "timed out"}
+        assert daemon == [True]
+
+    def test_unexpected_errors_propagate(self):
+        def search(name):
+            raise RuntimeError("bug")
+
+        with pytest.raises(RuntimeError):
+            search_catalogs(["a"], search)
@@ -0,0 +1,46 @@
+from opdscli.fuzzy import fold, partial_ratio, top_matches
+from opdscli.opds import OPDSEntry
+
+
+def _entries() -> list[OPDSEntry]:
+    books = [
+        ("The Great Adventure", "Jane Author"),
+        ("Mystery at Dawn", "John Writer"),
+        ("Science of Everything", "Dr. Smith"),
+        ("Great Expectations", "Charles Dickens"),
+    ]
+    return [OPDSEntry(title=t, author=a) for t, a in books]
+
+
+class TestFold:
+    def test_casefold_and_nfkc(self):
+        assert fold("Ｓｔｒａßｅ") == "strasse"
+        assert fold("Dr. Smith") == "dr. smith"
+
+
+class TestTopMatches:
+    def test_typo_finds_title(self):
+        (best, score), *_ = top_matches("The Graet Adventrue", _entries(), 3)
+        assert best.title == "The Great Adventure"
+        assert score > 80
+
+    def test_author_field(self):
+        top = top_matches(
+            "dikens", _entries(), 1, scorer=partial_ratio, min_score=60,
+        )
+        assert [e.title for e, _ in top] == ["Great Expectations"]
+
+    def test_title_only_ignores_author(self):
+        emma = [OPDSEntry(title="Emma", author="Jane Austen")]
+        assert top_matches("austen", emma, 5, min_score=60) == []
+        assert top_matches(
+            "austen", emma, 5, scorer=partial_ratio, min_score=60,
+        )[0][0] is emma[0]
+
+    def test_min_score_and_k(self):
+        assert top_matches("zzzz", _entries(), 5, min_score=30) == []
+        assert len(top_matches("great", _entries(), 1)) == 1
+
+    def test_ties_keep_order(self):
+        entries = [OPDSEntry(title="Same"), OPDSEntry(title="Same")]
+        assert top_matches("same", entries, 1)[0][0] is entries[0]
@@ -1,9 +1,21 @@
+import json
+import re
+
 import httpx
 import pytest
 import respx
+from rich.progress import Progress
 
-from opdscli.config import AuthConfig, CatalogConfig
-from opdscli.http import OPDSClientError, create_client, fetch_url
+import opdscli.http
+from opdscli.config import AuthConfig, CatalogConfig, ThrottleConfig
+from opdscli.http import (
+    OPDSClientError,
+    create_client,
+    fetch_bytes,
+    fetch_url,
+    part_path,
+    stream_download,
+)
 
 
 class TestCreateClient:
@@ -40,6 +52,17 @@ class TestFetchUrl:
         result = fetch_url(client, "https://example.com/feed")
         assert result == "<feed/>"
 
+    @respx.mock
+    def test_fetch_bytes_returns_raw_body(self):
+        body = '<?xml version="1.0" encoding="ISO-8859-1"?><feed/>'.encode(
+            "iso-8859-1",
+        )
+        respx.get("https://example.com/feed").mock(
+            return_value=httpx.Response(200, content=body)
+        )
+        client = httpx.Client()
+        assert fetch_bytes(client, "https://example.com/feed") == body
+
     @respx.mock
     def test_auth_failure_401(self):
         respx.get("https://example.com/feed").mock(
@@ -87,3 +110,272 @@ class TestFetchUrl:
         client = httpx.Client()
         with pytest.raises(OPDSClientError, match="Network error after retry"):
             fetch_url(client, "https://example.com/feed")
+
+
+class TestRetryPolicy:
+    @pytest.fixture(autouse=True)
+    def no_sleep(self, monkeypatch):
+        self.sleeps = []
+        monkeypatch.setattr(
+            opdscli.http.time, "sleep", self.sleeps.append,
+        )
+
+    def _client(self, **throttle):
+        return create_client(CatalogConfig(
+            url="https://example.com/opds",
+            throttle=ThrottleConfig(**throttle),
+        ))
+
+    @respx.mock
+    def test_retries_service_unavailable(self):
+        route = respx.get("https://example.com/feed")
+        route.side_effect = [
+            httpx.Response(503),
+            httpx.Response(200, text="<feed/>"),
+        ]
+        result = fetch_url(self._client(), "https://example.com/feed")
+        assert result == "<feed/>"
+        assert route.call_count == 2
+
+    @respx.mock
+    def test_honours_retry_after(self):
+        route = respx.get("https://example.com/feed")
+        route.side_effect = [
+            httpx.Response(429, headers={"Retry-After": "3"}),
+            httpx.Response(200, text="<feed/>"),
+        ]
+        fetch_url(self._client(), "https://example.com/feed")
+        assert 3.0 in self.sleeps
+
+    @respx.mock
+    def test_gives_up_after_max_retries(self):
+        route = respx.get("https://example.com/feed").mock(
+            return_value=httpx.Response(429),
+        )
+        with pytest.raises(OPDSClientError, match="HTTP error 429"):
+            fetch_url(
+                self._client(max_retries=3), "https://example.com/feed",
+            )
+        assert route.call_count == 4
+
+    @respx.mock
+    def test_excessive_retry_after_not_waited(self):
+        route = respx.get("https://example.com/feed").mock(
+            return_value=httpx.Response(
+                503, headers={"Retry-After": "86400"},
+            ),
+        )
+        with pytest.raises(OPDSClientError, match="HTTP error 503"):
+            fetch_url(self._client(), "https://example.com/feed")
+        assert route.call_count == 1
+
+    @respx.mock
+    def test_backoff_grows(self):
+        respx.get("https://example.com/feed").mock(
+            side_effect=httpx.ConnectError("down"),
+        )
+        with pytest.raises(OPDSClientError, match="Network error"):
+            fetch_url(
+                self._client(max_retries=3, backoff=1.0),
+                "https://example.com/feed",
+            )
+        backoffs = [d for d in self.sleeps if d]
+        assert len(backoffs) == 3
+        assert 0.5 <= backoffs[0] <= 1.0
+        assert 2.0 <= backoffs[2] <= 4.0
+
+
+BOOK_URL = "https://example.com/book.cbz"
+
+
+def _download(dest, connections=1):
+    with Progress(disable=True) as progress:
+        task = progress.add_task("test", total=None)
+        stream_download(
+            httpx.Client(), BOOK_URL, dest, progress, task,
+            connections=connections,
+        )
+
+
+def _leave_partial(dest, data, validator='"v1"', url=BOOK_URL):
+    part_path(dest).write_bytes(data)
+    dest.with_name(dest.name + ".part.json").write_text(
+        json.dumps({"url": url, "validator": validator}),
+    )
+
+
+class TestStreamDownload:
+    @respx.mock
+    def test_fresh_download_renamed_when_complete(self, tmp_path):
+        respx.get(BOOK_URL).mock(
+            return_value=httpx.Response(
+                200, content=b"0123456789", headers={"ETag": '"v1"'},
+            ),
+        )
+        dest = tmp_path / "book.cbz"
+        _download(dest)
+        assert dest.read_bytes() == b"0123456789"
+        assert not part_path(dest).exists()
+
+    @respx.mock
+    def test_resumes_partial_file_with_range(self, tmp_path):
+        route = respx.get(BOOK_URL).mock(
+            return_value=httpx.Response(
+                206, content=b"56789",
+                headers={"Content-Range": "bytes 5-9/10"},
+            ),
+        )
+        dest = tmp_path / "book.cbz"
+        _leave_partial(dest, b"01234")
+        _download(dest)
+
+        request = route.calls.last.request
+        assert request.headers["Range"] == "bytes=5-"
+        assert request.headers["If-Range"] == '"v1"'
+        assert dest.read_bytes() == b"0123456789"
+
+    @respx.mock
+    def test_restarts_when_server_sends_full_body(self, tmp_path):
+        respx.get(BOOK_URL).mock(
+            return_value=httpx.Response(200, content=b"new content"),
+        )
+        dest = tmp_path / "book.cbz"
+        _leave_partial(dest, b"old")
+        _download(dest)
+        assert dest.read_bytes() == b"new content"
+
+    @respx.mock
+    def test_partial_without_validator_discarded(self, tmp_path):
+        route = respx.get(BOOK_URL).mock(
+            return_value=httpx.Response(200, content=b"NEWNEW"),
+        )
+        dest = tmp_path / "book.cbz"
+        _leave_partial(dest, b"OLDOLD", validator=None)
+        _download(dest)
+        assert "Range" not in route.calls.last.request.headers
+        assert dest.read_bytes() == b"NEWNEW"
+
+    @respx.mock
+    def test_partial_from_other_url_discarded(self, tmp_path):
+        route = respx.get(BOOK_URL).mock(
+            return_value=httpx.Response(200, content=b"fresh"),
+        )
+        dest = tmp_path / "book.cbz"
+        _leave_partial(dest, b"stale", url="https://example.com/other")
+        _download(dest)
+        assert "Range" not in route.calls.last.request.headers
+        assert dest.read_bytes() == b"fresh"
+
+    @respx.mock
+    def test_already_complete_partial(self, tmp_path):
+        respx.get(BOOK_URL).mock(
+            return_value=httpx.Response(
+                416, headers={"Content-Range": "bytes */5"},
+            ),
+        )
+        dest = tmp_path / "book.cbz"
+        _leave_partial(dest, b"01234")
+        _download(dest)
+        assert dest.read_bytes() == b"01234"
+
+    @respx.mock
+    def test_truncated_transfer_keeps_partial(self, tmp_path):
+        respx.get(BOOK_URL).mock(
+            return_value=httpx.Response(
+                200, content=b"01234",
+                headers={"Content-Length": "10"},
+            ),
+        )
+        dest = tmp_path / "book.cbz"
+        with pytest.raises(OPDSClientError, match="incomplete"):
+            _download(dest)
+        assert not dest.exists()
+        assert part_path(dest).read_bytes() == b"01234"
+
+
+BOOK = bytes(range(256)) * 40
+
+
+def _ranged_server(request):
+    match = re.fullmatch(r"bytes=(\d+)-(\d*)", request.headers.get("Range", ""))
+    if not match:
+        return httpx.Response(
+            200, content=BOOK, headers={"Accept-Ranges": "bytes"},
+        )
+    start = int(match[1])
+    end = int(match[2]) if match[2] else len(BOOK) - 1
+    return httpx.Response(
+        206, content=BOOK[start:end + 1],
+        headers={"Content-Range": f"bytes {start}-{end}/{len(BOOK)}"},
+    )
+
+
+class TestSegmentedDownload:
+    @pytest.fixture(autouse=True)
+    def small_segments(self, monkeypatch):
+        monkeypatch.setattr(opdscli.http, "SEGMENT_MIN_SIZE", 1024)
+        monkeypatch.setattr(opdscli.http, "SEGMENT_CHUNK_SIZE", 256)
+
+    @respx.mock
+    def test_splits_into_parallel_ranges(self, tmp_path):
+        route = respx.get(BOOK_URL).mock(side_effect=_ranged_server)
+        dest = tmp_path / "book.cbz"
+        _download(dest, connections=4)
+
+        assert dest.read_bytes() == BOOK
+        assert route.call_count == 4
+        ranges = sorted(
+            call.request.headers.get("Range", "")
+            for call in route.calls
+        )
+        assert ranges == [
+            "", "bytes=2560-5119", "bytes=5120-7679", "bytes=7680-10239",
+        ]
+
+    @respx.mock
+    def test_single_stream_without_accept_ranges(self, tmp_path):
+        route = respx.get(BOOK_URL).mock(
+            return_value=httpx.Response(200, content=BOOK),
+        )
+        dest = tmp_path / "book.cbz"
+        _download(dest, connections=4)
+        assert dest.read_bytes() == BOOK
+        assert route.call_count == 1
+
+    @respx.mock
+    def test_resumes_unfinished_segments(self, tmp_path):
+        route = respx.get(BOOK_URL).mock(side_effect=_ranged_server)
+        dest = tmp_path / "book.cbz"
+        part = bytearray(len(BOOK))
+        part[0:5120] = BOOK[0:5120]
+        part[5120:5200] = BOOK[5120:5200]
+        part_path(dest).write_bytes(bytes(part))
+        dest.with_name(dest.name + ".part.json").write_text(json.dumps({
+            "url": BOOK_URL,
+            "validator": '"v1"',
+            "total": len(BOOK),
+            "segments": [[0, 5119, 5120], [5120, 10239, 80]],
+        }))
+        _download(dest, connections=2)
+
+        assert dest.read_bytes() == BOOK
+        assert [c.request.headers["Range"] for c in route.calls] == [
+            "bytes=5200-10239",
+        ]
+        assert route.calls.last.request.headers["If-Range"] == '"v1"'
+
+    @respx.mock
+    def test_segments_without_validator_restart(self, tmp_path):
+        route = respx.get(BOOK_URL).mock(side_effect=_ranged_server)
+        dest = tmp_path / "book.cbz"
+        part_path(dest).write_bytes(b"\xff" * len(BOOK))
+        dest.with_name(dest.name + ".part.json").write_text(json.dumps({
+            "url": BOOK_URL,
+            "validator": None,
+            "total": len(BOOK),
+            "segments": [[0, 5119, 5120], [5120, 10239, 80]],
+        }))
+        _download(dest, connections=2)
+
+        assert dest.read_bytes() == BOOK
+        assert "Range" not in route.calls[0].request.headers
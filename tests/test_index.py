@@ -0,0 +1,158 @@
+import httpx
+import respx
+
+from opdscli.index import CatalogIndex, fts_query, open_index, update_index
+from opdscli.opds import AcquisitionLink, OPDSEntry
+from tests.conftest import atom_feed
+
+
+def _entry(
+    title: str, author: str = "", summary: str = "", entry_id: str = "",
+) -> OPDSEntry:
+    return OPDSEntry(
+        title=title,
+        author=author,
+        summary=summary,
+        entry_id=entry_id or f"urn:{title}",
+        formats=["epub"],
+        acquisition_links=[
+            AcquisitionLink(
+                href=f"https://example.com/{title}.epub",
+                type="application/epub+zip",
+                rel="http://opds-spec.org/acquisition",
+            ),
+        ],
+    )
+
+
+_ENTRIES = [
+    _entry("The Great Adventure", "John Doe", "An epic journey."),
+    _entry("Mystery at Dawn", "Jane Smith", "A great detective story."),
+    _entry("Cooking Basics", "Great Chef"),
+]
+
+
+class TestCatalogIndex:
+    def test_search_ranks_title_first(self, tmp_path):
+        index = CatalogIndex(tmp_path / "index.sqlite")
+        index.replace("lib", "https://example.com/opds", _ENTRIES)
+
+        titles = [e.title for e in index.search("lib", "great")]
+        assert titles[0] == "The Great Adventure"
+        assert set(titles) == {
+            "The Great Adventure", "Mystery at Dawn", "Cooking Basics",
+        }
+
+    def test_search_matches_all_words_as_prefixes(self, tmp_path):
+        index = CatalogIndex(tmp_path / "index.sqlite")
+        index.replace("lib", "https://example.com/opds", _ENTRIES)
+
+        assert [e.title for e in index.search("lib", "myst daw")] == [
+            "Mystery at Dawn",
+        ]
+        assert index.search("lib", "mystery cooking") == []
+        assert index.search("lib", "!!!") == []
+
+    def test_roundtrips_acquisition_links(self, tmp_path):
+        index = CatalogIndex(tmp_path / "index.sqlite")
+        index.replace("lib", "https://example.com/opds", _ENTRIES)
+
+        entry = index.find_title("lib", "mystery AT dawn")
+        assert entry == _ENTRIES[1]
+
+    def test_catalogs_are_separate(self, tmp_path):
+        index = CatalogIndex(tmp_path / "index.sqlite")
+        index.replace("a", "https://a.example.com", _ENTRIES[:1])
+        index.replace("b", "https://b.example.com", _ENTRIES[1:])
+
+        assert [e.title for e in index.search("a", "great")] == [
+            "The Great Adventure",
+        ]
+        assert [i.entries for i in index.catalogs()] == [1, 2]
+
+    def test_replace_drops_old_entries_and_duplicates(self, tmp_path):
+        index = CatalogIndex(tmp_path / "index.sqlite")
+        index.replace("lib", "https://example.com/opds", _ENTRIES)
+        stored = index.replace(
+            "lib", "https://example.com/opds",
+            [_ENTRIES[0], _ENTRIES[0]],
+        )
+
+        assert stored == 1
+        assert index.search("lib", "mystery") == []
+
+    def test_remove(self, tmp_path):
+        index = CatalogIndex(tmp_path / "index.sqlite")
+        index.replace("lib", "https://example.com/opds", _ENTRIES)
+        index.remove("lib")
+
+        assert index.info("lib") is None
+        assert index.entries("lib") == []
+
+    def test_open_index_default_location(self, isolated_index_dir):
+        index = open_index()
+        assert index.path.parent == isolated_index_dir
+
+
+def _stored(entry_id: str, updated: str) -> OPDSEntry:
+    return OPDSEntry(title=entry_id, entry_id=entry_id, updated=updated)
+
+
+class TestUpdateIndex:
+    @respx.mock
+    def test_stops_at_known_entries(self, tmp_path):
+        respx.get("https://example.com/new").mock(
+            return_value=httpx.Response(200, text=atom_feed(
+                [("e5", "2024-05"), ("e4", "2024-04")], "/new-2",
+            )),
+        )
+        respx.get("https://example.com/new-2").mock(
+            return_value=httpx.Response(200, text=atom_feed(
+                [("e3", "2024-03-02"), ("e2", "2024-02")], "/new-3",
+            )),
+        )
+        page3 = respx.get("https://example.com/new-3")
+        index = CatalogIndex(tmp_path / "index.sqlite")
+        index.replace("lib", "https://example.com/opds", [
+            _stored("e1", "2024-01"),
+            _stored("e2", "2024-02"),
+            _stored("e3", "2024-03"),
+        ])
+
+        with httpx.Client() as client:
+            result = update_index(
+                client, index, "lib", "https://example.com/new",
+            )
+
+        assert (result.pages, result.changed) == (2, 3)
+        assert page3.call_count == 0
+        assert index.find_title("lib", "e3").updated == "2024-03-02"
+        assert index.find_title("lib", "e5").acquisition_links[0].href == (
+            "https://example.com/e5.epub"
+        )
+        assert [e.title for e in index.search("lib", "e4")] == ["e4"]
+        assert len(index.entries("lib")) == 5
+
+    @respx.mock
+    def test_max_pages(self, tmp_path):
+        respx.get("https://example.com/new").mock(
+            return_value=httpx.Response(200, text=atom_feed(
+                [("e2", "2024-02")], "/new",
+            )),
+        )
+        index = CatalogIndex(tmp_path / "index.sqlite")
+        index.replace("lib", "https://example.com/opds", [])
+
+        with httpx.Client() as client:
+            result = update_index(
+                client, index, "lib", "https://example.com/new",
+                max_pages=3,
+            )
+
+        # The looping feed keeps yielding the same, now known, entry.
+        assert (result.pages, result.changed) == (2, 1)
+
+
+def test_fts_query_quotes_tokens():
+    assert fts_query('title:"x" OR y') == '"title"* "x"* "OR"* "y"*'
+    assert fts_query("  ") is None
@@ -1,6 +1,26 @@
+import threading
+from itertools import islice
+
+import httpx
 import pytest
+import respx
 
-from opdscli.opds import parse_feed
+from opdscli.opds import (
+    AcquisitionLink,
+    NavigationLink,
+    NextPage,
+    OPDSEntry,
+    discover_profile,
+    fetch_entries,
+    fill_opensearch_template,
+    iter_feed,
+    latest_entries,
+    parse_feed,
+    parse_feed_bytes,
+    parse_timestamp,
+    perform_opensearch,
+)
+from tests.conftest import atom_feed
 
 
 class TestParseNavigationFeed:
@@ -93,3 +113,453 @@ class TestInvalidXml:
     def test_url_resolution(self, acquisition_feed_xml: str) -> None:
         entries, _, _ = parse_feed(acquisition_feed_xml, base_url="https://example.com/opds/")
         assert entries[0].acquisition_links[0].href == "https://example.com/download/book-001.epub"
+
+
+class TestParseFeedBytes:
+    def test_same_result_as_text(self, acquisition_feed_xml: str) -> None:
+        from_text = parse_feed(acquisition_feed_xml, base_url="https://example.com")
+        from_bytes = parse_feed_bytes(
+            acquisition_feed_xml.encode("utf-8"), base_url="https://example.com",
+        )
+        assert from_bytes == from_text
+
+    def test_encoding_taken_from_xml_declaration(self) -> None:
+        data = (
+            '<?xml version="1.0" encoding="ISO-8859-1"?>'
+            '<feed xmlns="http://www.w3.org/2005/Atom"><entry>'
+            "<title>Caf\u00e9 Stories</title>"
+            '<link href="/b.epub" type="application/epub+zip"/>'
+            "</entry></feed>"
+        ).encode("iso-8859-1")
+        entries, _, _ = parse_feed_bytes(data)
+        assert entries[0].title == "Caf\u00e9 Stories"
+
+    def test_raises_on_invalid_xml(self) -> None:
+        with pytest.raises(ValueError, match="Invalid XML"):
+            parse_feed_bytes(b"<not valid xml")
+
+
+class TestIterFeed:
+    def test_yields_entries_then_next_link(self, acquisition_feed_xml: str) -> None:
+        items = list(iter_feed(
+            acquisition_feed_xml.encode(), base_url="https://example.com",
+        ))
+        assert [type(i) for i in items] == [
+            OPDSEntry, OPDSEntry, OPDSEntry, NextPage,
+        ]
+        assert items[-1].href == "https://example.com/opds/fiction?page=2"
+
+    def test_next_link_inside_entry_is_navigation(self) -> None:
+        data = (
+            b'<feed xmlns="http://www.w3.org/2005/Atom">'
+            b"<entry><title>Book 2</title>"
+            b'<link rel="next" href="/series/3"'
+            b' type="application/atom+xml"/></entry></feed>'
+        )
+        _, nav_links, next_url = parse_feed_bytes(data)
+        assert next_url is None
+        assert [(n.href, n.rel) for n in nav_links] == [("/series/3", "next")]
+
+    def test_yields_navigation_links(self, navigation_feed_xml: str) -> None:
+        items = list(iter_feed(
+            navigation_feed_xml.encode(), base_url="https://example.com",
+        ))
+        assert [i.title for i in items] == ["Fiction", "Science"]
+        assert all(isinstance(i, NavigationLink) for i in items)
+
+    def test_entries_available_before_document_ends(self) -> None:
+        data = (
+            b'<feed xmlns="http://www.w3.org/2005/Atom">'
+            b"<entry><title>First</title>"
+            b'<link href="/1.epub" type="application/epub+zip"/></entry>'
+            + b"<entry>" * 50 + b"<broken"
+        )
+        first = next(iter_feed(data))
+        assert first.title == "First"
+        with pytest.raises(ValueError, match="Invalid XML"):
+            list(islice(iter_feed(data), 2))
+
+    def test_reads_file_objects(self, fixtures_dir) -> None:
+        with open(fixtures_dir / "acquisition_feed.xml", "rb") as f:
+            titles = [
+                i.title for i in iter_feed(f) if isinstance(i, OPDSEntry)
+            ]
+        assert titles == [
+            "The Great Adventure", "Mystery at Dawn", "Science of Everything",
+        ]
+
+
+class TestCompactModels:
+    def test_models_are_slotted(self) -> None:
+        entry = OPDSEntry(title="t")
+        assert not hasattr(entry, "__dict__")
+        with pytest.raises(AttributeError):
+            entry.extra = "x"  # type: ignore[attr-defined]
+
+    def test_repeated_strings_shared(self, acquisition_feed_xml: str) -> None:
+        entries, _, _ = parse_feed(acquisition_feed_xml, base_url="https://example.com")
+        first, second = entries[0], entries[1]
+        assert first.acquisition_links[0].type is second.acquisition_links[0].type
+        assert first.acquisition_links[0].rel is second.acquisition_links[0].rel
+        assert first.formats[0] is second.formats[0]
+
+    def test_constructor_signature_unchanged(self) -> None:
+        link = AcquisitionLink("https://x/b.epub", "application/epub+zip")
+        nav = NavigationLink("https://x/feed", "Title", "subsection")
+        assert link.rel == ""
+        assert nav.rel == "subsection"
+
+
+_ROOT_FEED = b"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom"
+      xmlns:opds="http://opds-spec.org/2010/catalog">
+  <link rel="search" href="/opensearch.xml"
+        type="application/opensearchdescription+xml"/>
+  <link rel="http://opds-spec.org/facet" href="/opds?lang=en"
+        title="English" opds:facetGroup="Language"/>
+  <entry>
+    <title>Recently added</title>
+    <link rel="http://opds-spec.org/sort/new" href="/opds/new"
+          type="application/atom+xml;profile=opds-catalog;kind=acquisition"/>
+  </entry>
+</feed>"""
+
+_NEW_FEED = b"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <link rel="next" href="/opds/new?page=2"
+        type="application/atom+xml;profile=opds-catalog"/>
+  <entry>
+    <title>Book</title>
+    <link rel="http://opds-spec.org/acquisition" href="/b.pdf"
+          type="application/pdf"/>
+    <link rel="http://opds-spec.org/acquisition" href="/b.epub"
+          type="application/epub+zip"/>
+  </entry>
+</feed>"""
+
+
+class TestDiscoverProfile:
+    @respx.mock
+    def test_discovers_capabilities(self, opensearch_xml: str) -> None:
+        respx.get("https://example.com/opds").mock(
+            return_value=httpx.Response(200, content=_ROOT_FEED),
+        )
+        respx.get("https://example.com/opensearch.xml").mock(
+            return_value=httpx.Response(200, text=opensearch_xml),
+        )
+        respx.get("https://example.com/opds/new").mock(
+            return_value=httpx.Response(200, content=_NEW_FEED),
+        )
+
+        with httpx.Client() as client:
+            profile = discover_profile(client, "https://example.com/opds")
+
+        assert profile.opensearch_template == (
+            "https://example.com/search?q={searchTerms}"
+        )
+        assert profile.latest_url == "https://example.com/opds/new"
+        assert profile.pagination == "next"
+        assert profile.facet_groups == ["Language"]
+        assert profile.mime_types == [
+            "application/epub+zip", "application/pdf",
+        ]
+        assert profile.discovered_at > 0
+
+    @respx.mock
+    def test_plain_catalog(self, navigation_feed_xml: str) -> None:
+        respx.get("https://example.com/opds").mock(
+            return_value=httpx.Response(200, text=navigation_feed_xml),
+        )
+        respx.get("https://example.com/opensearch.xml").mock(
+            return_value=httpx.Response(404),
+        )
+
+        with httpx.Client() as client:
+            profile = discover_profile(client, "https://example.com/opds")
+
+        assert profile.opensearch_template is None
+        assert profile.latest_url is None
+        assert profile.pagination == "none"
+
+
+class TestOpenSearchTemplate:
+    def test_fills_known_parameters(self) -> None:
+        url = fill_opensearch_template(
+            "https://example.com/s?q={searchTerms}&p={startPage?}"
+            "&i={startIndex}&n={count?}&lang={language?}&x={custom}",
+            "don quixote", start_page=3, start_index=51, count=25,
+        )
+        assert url == (
+            "https://example.com/s?q=don%20quixote&p=3&i=51&n=25"
+            "&lang=&x={custom}"
+        )
+
+
+class TestPerformOpenSearch:
+    TEMPLATE = "https://example.com/s?q={searchTerms}&page={startPage}"
+
+    @respx.mock
+    def test_pages_through_start_page(self) -> None:
+        routes = [
+            respx.get(
+                "https://example.com/s", params={"q": "x", "page": str(p)},
+            ).mock(return_value=httpx.Response(
+                200, text=atom_feed([f"p{p}-{i}" for i in range(3)]),
+            ))
+            for p in range(1, 6)
+        ]
+        entries = perform_opensearch(
+            httpx.Client(), self.TEMPLATE, "x", limit=7,
+        )
+        assert [e.title for e in entries] == [
+            "p1-0", "p1-1", "p1-2", "p2-0", "p2-1", "p2-2", "p3-0",
+        ]
+        assert [r.call_count for r in routes] == [1, 1, 1, 0, 0]
+
+    @respx.mock
+    def test_stops_at_short_page(self) -> None:
+        respx.get("https://example.com/s", params={"page": "1"}).mock(
+            return_value=httpx.Response(200, text=atom_feed(["a", "b"])),
+        )
+        respx.get("https://example.com/s", params={"page": "2"}).mock(
+            return_value=httpx.Response(200, text=atom_feed(["c"])),
+        )
+        page3 = respx.get("https://example.com/s", params={"page": "3"}).mock(
+            return_value=httpx.Response(200, text=atom_feed(["d", "e"])),
+        )
+        entries = perform_opensearch(
+            httpx.Client(), self.TEMPLATE, "x", limit=100, max_workers=1,
+        )
+        assert [e.title for e in entries] == ["a", "b", "c"]
+        assert page3.call_count == 0
+
+    @respx.mock
+    def test_short_first_page_with_count(self) -> None:
+        route = respx.get("https://example.com/s").mock(
+            return_value=httpx.Response(200, text=atom_feed(["a", "b"])),
+        )
+        entries = perform_opensearch(
+            httpx.Client(), self.TEMPLATE + "&n={count}", "x",
+        )
+        assert [e.title for e in entries] == ["a", "b"]
+        assert route.call_count == 1
+
+    @respx.mock
+    def test_prefetches_only_after_full_page(self) -> None:
+        respx.get("https://example.com/s", params={"page": "1"}).mock(
+            return_value=httpx.Response(200, text=atom_feed(["a", "b"])),
+        )
+        page2 = respx.get("https://example.com/s", params={"page": "2"}).mock(
+            return_value=httpx.Response(200, text=atom_feed(["c"])),
+        )
+        later = respx.get("https://example.com/s").mock(
+            return_value=httpx.Response(200, text=atom_feed(["d", "e"])),
+        )
+        entries = perform_opensearch(httpx.Client(), self.TEMPLATE, "x")
+        assert [e.title for e in entries] == ["a", "b", "c"]
+        assert page2.call_count == 1
+        assert later.call_count == 0
+
+    @respx.mock
+    def test_stops_when_page_parameter_ignored(self) -> None:
+        route = respx.get("https://example.com/s").mock(
+            return_value=httpx.Response(200, text=atom_feed(["a", "b"])),
+        )
+        entries = perform_opensearch(
+            httpx.Client(), self.TEMPLATE, "x", max_workers=1,
+        )
+        assert [e.title for e in entries] == ["a", "b"]
+        assert route.call_count == 2
+
+    @respx.mock
+    def test_follows_next_links(self) -> None:
+        respx.get("https://example.com/s", params={"q": "x"}).mock(
+            return_value=httpx.Response(
+                200, text=atom_feed(["a"], next_href="/s2"),
+            ),
+        )
+        respx.get("https://example.com/s2").mock(
+            return_value=httpx.Response(
+                200, text=atom_feed(["b"], next_href="/s3"),
+            ),
+        )
+        respx.get("https://example.com/s3").mock(
+            return_value=httpx.Response(200, text=atom_feed(["c"])),
+        )
+        entries = perform_opensearch(
+            httpx.Client(), "https://example.com/s?q={searchTerms}", "x",
+        )
+        assert [e.title for e in entries] == ["a", "b", "c"]
+
+    @respx.mock
+    def test_follows_subsections_in_order(self) -> None:
+        nav = (
+            '<feed xmlns="http://www.w3.org/2005/Atom">'
+            + "".join(
+                f'<entry><title>{n}</title><link rel="subsection" '
+                f'href="/{n}" type="application/atom+xml"/></entry>'
+                for n in ("one", "two", "bad")
+            )
+            + "</feed>"
+        )
+        respx.get("https://example.com/s").mock(
+            return_value=httpx.Response(200, text=nav),
+        )
+        respx.get("https://example.com/one").mock(
+            return_value=httpx.Response(200, text=atom_feed(["a", "b"])),
+        )
+        respx.get("https://example.com/two").mock(
+            return_value=httpx.Response(200, text=atom_feed(["c"])),
+        )
+        respx.get("https://example.com/bad").mock(
+            return_value=httpx.Response(404),
+        )
+        entries = perform_opensearch(
+            httpx.Client(), "https://example.com/s?q={searchTerms}", "x",
+        )
+        assert [e.title for e in entries] == ["a", "b", "c"]
+
+
+class TestFetchEntries:
+    @staticmethod
+    def _nav(names: list[str]) -> str:
+        return (
+            '<feed xmlns="http://www.w3.org/2005/Atom">'
+            + "".join(
+                f'<entry><title>{n}</title><link rel="subsection" '
+                f'href="/{n}" type="application/atom+xml"/></entry>'
+                for n in names
+            )
+            + "</feed>"
+        )
+
+    @respx.mock
+    def test_subsections_fetched_concurrently_in_order(self) -> None:
+        names = ["one", "two", "three", "four"]
+        respx.get("https://example.com/feed").mock(
+            return_value=httpx.Response(200, text=self._nav(names)),
+        )
+        # Every follow-up waits for the others: this only completes if
+        # all four are in flight at once.
+        barrier = threading.Barrier(len(names), timeout=5)
+
+        def respond(name: str) -> httpx.Response:
+            barrier.wait()
+            return httpx.Response(200, text=atom_feed([name]))
+
+        for name in names:
+            respx.get(f"https://example.com/{name}").mock(
+                side_effect=lambda request, n=name: respond(n),
+            )
+        entries = fetch_entries(
+            httpx.Client(), "https://example.com/feed", max_workers=4,
+        )
+        assert [e.title for e in entries] == names
+
+    @respx.mock
+    def test_failed_subsection_skipped(self) -> None:
+        respx.get("https://example.com/feed").mock(
+            return_value=httpx.Response(
+                200, text=self._nav(["one", "bad", "two"]),
+            ),
+        )
+        respx.get("https://example.com/one").mock(
+            return_value=httpx.Response(200, text=atom_feed(["a"])),
+        )
+        respx.get("https://example.com/bad").mock(
+            return_value=httpx.Response(200, text="<not xml"),
+        )
+        respx.get("https://example.com/two").mock(
+            return_value=httpx.Response(200, text=atom_feed(["b"])),
+        )
+        entries = fetch_entries(httpx.Client(), "https://example.com/feed")
+        assert [e.title for e in entries] == ["a", "b"]
+
+    @respx.mock
+    def test_max_follows(self) -> None:
+        respx.get("https://example.com/feed").mock(
+            return_value=httpx.Response(
+                200, text=self._nav(["one", "two"]),
+            ),
+        )
+        one = respx.get("https://example.com/one").mock(
+            return_value=httpx.Response(200, text=atom_feed(["a"])),
+        )
+        two = respx.get("https://example.com/two")
+        entries = fetch_entries(
+            httpx.Client(), "https://example.com/feed", max_follows=1,
+        )
+        assert [e.title for e in entries] == ["a"]
+        assert (one.call_count, two.call_count) == (1, 0)
+
+
+class TestParseTimestamp:
+    def test_rfc3339(self) -> None:
+        assert parse_timestamp("2024-01-01T00:00:00Z") == 1704067200.0
+        assert parse_timestamp("2024-01-01T01:00:00+01:00") == 1704067200.0
+
+    def test_date_only_and_naive_are_utc(self) -> None:
+        assert parse_timestamp("2024-01-01") == 1704067200.0
+        assert parse_timestamp("2024-01-01T00:00:00") == 1704067200.0
+
+    def test_rfc822(self) -> None:
+        assert parse_timestamp("Mon, 01 Jan 2024 00:00:00 GMT") == 1704067200.0
+
+    def test_invalid(self) -> None:
+        assert parse_timestamp("") is None
+        assert parse_timestamp("last tuesday") is None
+
+
+class TestLatestEntries:
+    URL = "https://example.com/new"
+
+    @respx.mock
+    def test_stops_once_newest_first_feed_is_covered(self) -> None:
+        respx.get(self.URL).mock(return_value=httpx.Response(200, text=atom_feed(
+            [("a", "2024-03-03"), ("b", "2024-03-02")], next_href="/new2",
+        )))
+        respx.get("https://example.com/new2").mock(
+            return_value=httpx.Response(200, text=atom_feed(
+                [("c", "2024-03-01"), ("d", "2024-02-01")], next_href="/new3",
+            )),
+        )
+        page3 = respx.get("https://example.com/new3")
+        entries = latest_entries(httpx.Client(), self.URL, limit=3)
+        assert [e.title for e in entries] == ["a", "b", "c"]
+        assert page3.call_count == 0
+
+    @respx.mock
+    def test_unordered_feed_finds_newer_entries_on_later_pages(self) -> None:
+        respx.get(self.URL).mock(return_value=httpx.Response(200, text=atom_feed(
+            [("old", "2020-01-01"), ("mid", "2022-01-01")], next_href="/new2",
+        )))
+        respx.get("https://example.com/new2").mock(
+            return_value=httpx.Response(200, text=atom_feed(
+                [("new", "2024-01-01T10:00:00+02:00"), ("undated", "")],
+            )),
+        )
+        entries = latest_entries(httpx.Client(), self.URL, limit=2)
+        assert [e.title for e in entries] == ["new", "mid"]
+
+    @respx.mock
+    def test_ties_keep_feed_order_and_undated_last(self) -> None:
+        respx.get(self.URL).mock(return_value=httpx.Response(200, text=atom_feed(
+            [("undated", ""), ("x", "2024-01-01"), ("y", "2024-01-01")],
+        )))
+        entries = latest_entries(httpx.Client(), self.URL, limit=10)
+        assert [e.title for e in entries] == ["x", "y", "undated"]
+
+    @respx.mock
+    def test_max_pages_and_failed_page(self) -> None:
+        respx.get(self.URL).mock(return_value=httpx.Response(200, text=atom_feed(
+            [("b", "2024-01-01"), ("a", "2024-02-01")], next_href="/new2",
+        )))
+        page2 = respx.get("https://example.com/new2").mock(
+            return_value=httpx.Response(500),
+        )
+        client = httpx.Client()
+        assert len(latest_entries(client, self.URL, 5, max_pages=1)) == 2
+        assert page2.call_count == 0
+        assert [e.title for e in latest_entries(client, self.URL, 5)] == [
+            "a", "b",
+        ]
@@ -0,0 +1,113 @@
+from opdscli.opds import OPDSEntry
+from opdscli.rank import corpus_stats, matcher, rank_entries, tokenize
+
+
+def _titles(entries) -> list[str]:
+    return [e.title for e in entries]
+
+
+def _entries() -> list[OPDSEntry]:
+    return [
+        OPDSEntry(
+            title="Cooking for Snakes", author="A. Cook",
+            summary="Recipes. Python owners will love it.",
+        ),
+        OPDSEntry(title="Learning Python", author="Mark Lutz"),
+        OPDSEntry(
+            title="Monty Python's Flying Circus", author="Graham Chapman",
+        ),
+        OPDSEntry(title="Fluent Python", author="Luciano Ramalho"),
+        OPDSEntry(title="Gardening", author="Pat Python"),
+    ]
+
+
+class TestTokenize:
+    def test_casefold_and_nfkc(self):
+        assert tokenize("Ｐｙｔｈｏｎ STRASSE, straße!") == [
+            "python", "strasse", "strasse",
+        ]
+
+
+class TestMatcher:
+    def test_every_term_as_prefix(self):
+        entry = OPDSEntry(title="Learning Python", author="Mark Lutz")
+        assert matcher("Pyth lut")(entry)
+        assert not matcher("pyth java")(entry)
+        assert not matcher("ython")(entry)
+
+    def test_symbols_must_match_literally(self):
+        cooking = OPDSEntry(title="Cooking")
+        cpp = OPDSEntry(title="The C++ Programming Language")
+        assert matcher("C++")(cpp)
+        assert not matcher("C++")(cooking)
+        assert not matcher("C#")(cpp)
+
+    def test_query_without_tokens(self):
+        assert not matcher("!!")(OPDSEntry(title="Learning Python"))
+        assert not matcher("!!")(OPDSEntry(title="Wow!!"))
+
+    def test_punctuation_only_separates(self):
+        entry = OPDSEntry(title="Don't Panic", author="Douglas Adams")
+        assert matcher("don't, adams.")(entry)
+
+    def test_summary_and_normalization(self):
+        entry = OPDSEntry(title="Ｐｙｔｈｏｎ", summary="An die STRASSE")
+        assert matcher("python straße")(entry)
+        assert matcher("an-die")(entry)
+
+
+class TestRankEntries:
+    def test_field_weights(self):
+        ranked = _titles(rank_entries(_entries(), "python"))
+        # Title matches first, then the author match, then the summary.
+        assert ranked[-2:] == ["Gardening", "Cooking for Snakes"]
+        assert set(ranked[:3]) == {
+            "Learning Python", "Monty Python's Flying Circus", "Fluent Python",
+        }
+
+    def test_shorter_title_ranks_higher(self):
+        ranked = _titles(rank_entries(_entries(), "python"))
+        assert ranked.index("Fluent Python") < ranked.index(
+            "Monty Python's Flying Circus",
+        )
+
+    def test_all_terms_required(self):
+        ranked = rank_entries(_entries(), "python lutz")
+        assert _titles(ranked) == ["Learning Python"]
+        assert rank_entries(_entries(), "python java") == []
+
+    def test_prefix_terms(self):
+        ranked = rank_entries(_entries(), "garden")
+        assert _titles(ranked) == ["Gardening"]
+
+    def test_top_k(self):
+        entries = _entries()
+        assert rank_entries(entries, "python", k=2) == rank_entries(
+            entries, "python",
+        )[:2]
+
+    def test_ties_keep_order(self):
+        entries = [OPDSEntry(title="Same"), OPDSEntry(title="Same")]
+        assert rank_entries(entries, "same") == entries
+        assert rank_entries(entries, "same", k=1)[0] is entries[0]
+
+    def test_collection_stats_weigh_rare_terms(self):
+        pythons = OPDSEntry(title="Python Python Guide")
+        guides = OPDSEntry(title="Python Guide Guide")
+        matched = [pythons, guides]
+        many = [OPDSEntry(title=f"Python {i}") for i in range(20)]
+
+        stats = corpus_stats([*matched, *many], "python guide")
+        assert stats.size == 22
+        assert stats.df == {"python": 22, "guide": 2}
+        ranked = rank_entries(matched, "python guide", stats=stats)
+        assert ranked == [guides, pythons]
+
+        many = [OPDSEntry(title=f"Guide {i}") for i in range(20)]
+        stats = corpus_stats([*matched, *many], "python guide")
+        ranked = rank_entries(matched, "python guide", stats=stats)
+        assert ranked == [pythons, guides]
+
+    def test_empty(self):
+        assert rank_entries([], "python") == []
+        assert rank_entries(_entries(), "!!") == []
@@ -0,0 +1,70 @@
+import pytest
+
+from opdscli.config import ThrottleConfig
+from opdscli.throttle import (
+    RetryPolicy,
+    Throttle,
+    TokenBucket,
+    host_bucket,
+    parse_retry_after,
+)
+
+
+class TestRetryPolicy:
+    def test_exponential_backoff_capped(self):
+        policy = RetryPolicy(backoff=1.0, max_backoff=5.0, jitter=False)
+        assert [policy.delay(n) for n in range(5)] == [1, 2, 4, 5, 5]
+
+    def test_jitter_stays_within_bounds(self):
+        policy = RetryPolicy(backoff=2.0)
+        for _ in range(50):
+            assert 1.0 <= policy.delay(0) <= 2.0
+
+    def test_retry_after_wins(self):
+        assert RetryPolicy().delay(0, retry_after=7.0) == 7.0
+
+
+class TestTokenBucket:
+    def test_unlimited_never_waits(self):
+        bucket = TokenBucket()
+        assert all(bucket.reserve() == 0 for _ in range(100))
+
+    def test_spaces_requests_after_burst(self):
+        bucket = TokenBucket(rate=10.0, burst=2)
+        waits = [bucket.reserve() for _ in range(4)]
+        assert waits[:2] == [0, 0]
+        assert waits[2] == pytest.approx(0.1, abs=0.01)
+        assert waits[3] == pytest.approx(0.2, abs=0.01)
+
+    def test_pause_delays_everyone(self):
+        bucket = TokenBucket()
+        bucket.pause(5.0)
+        assert bucket.reserve() == pytest.approx(5.0, abs=0.1)
+
+
+class TestHostBucket:
+    def test_shared_per_host(self):
+        a = host_bucket("https://shared.example.com/opds")
+        b = host_bucket("https://SHARED.example.com/other")
+        assert a is b
+
+    def test_throttle_from_config(self):
+        throttle = Throttle.from_config(
+            ThrottleConfig(rate=2.0, burst=3, max_retries=5),
+        )
+        assert throttle.policy.max_retries == 5
+        bucket = throttle.bucket("https://limited.example.com/")
+        assert bucket.rate == 2.0
+        assert bucket.burst == 3
+
+
+class TestParseRetryAfter:
+    def test_seconds(self):
+        assert parse_retry_after("30") == 30.0
+
+    def test_http_date_in_past(self):
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+    def test_invalid(self):
+        assert parse_retry_after("soon") is None
+        assert parse_retry_after(None) is None
@@ -0,0 +1,33 @@
+from opdscli.opds import OPDSEntry
+from opdscli.titles import TitleMap, normalize_title
+
+
+class TestNormalizeTitle:
+    def test_case_and_whitespace(self):
+        assert normalize_title("  The   Great\tAdventure ") == (
+            "the great adventure"
+        )
+
+    def test_punctuation(self):
+        assert normalize_title("Don Quixote: Part I") == (
+            normalize_title("don quixote — part i")
+        )
+
+    def test_apostrophes_dropped(self):
+        assert normalize_title("Gulliver’s Travels") == "gullivers travels"
+        assert normalize_title("Gulliver's Travels") == "gullivers travels"
+
+    def test_unicode_folding(self):
+        assert normalize_title("STRASSE") == normalize_title("Straße")
+        assert normalize_title("Ｆｕｌｌ Ｗｉｄｔｈ") == "full width"
+
+
+class TestTitleMap:
+    def test_first_entry_wins(self):
+        first = OPDSEntry(title="Emma", entry_id="1")
+        titles = TitleMap([first, OPDSEntry(title="EMMA", entry_id="2")])
+        assert len(titles) == 1
+        assert titles.get("emma.") is first
+
+    def test_missing(self):
+        assert TitleMap().get("Emma") is None
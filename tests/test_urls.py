@@ -0,0 +1,57 @@
+import pytest
+
+from opdscli.urls import VisitedUrls, canonical_url
+
+
+class TestCanonicalUrl:
+    @pytest.mark.parametrize(
+        ("url", "expected"),
+        [
+            ("HTTPS://Example.COM/opds", "https://example.com/opds"),
+            ("https://example.com:443/opds", "https://example.com/opds"),
+            ("http://example.com:80/opds", "http://example.com/opds"),
+            ("http://example.com:8080/opds", "http://example.com:8080/opds"),
+            ("https://example.com", "https://example.com/"),
+            ("https://example.com/opds#top", "https://example.com/opds"),
+            (
+                "https://example.com/s?q=a%20b&page=2&",
+                "https://example.com/s?page=2&q=a%20b",
+            ),
+            (
+                "https://user:pw@Example.com/opds",
+                "https://user:pw@example.com/opds",
+            ),
+        ],
+    )
+    def test_normalizes(self, url, expected):
+        assert canonical_url(url) == expected
+
+    def test_path_case_is_kept(self):
+        assert canonical_url("https://example.com/OPDS/") == (
+            "https://example.com/OPDS/"
+        )
+
+
+class TestVisitedUrls:
+    def test_add_dedupes_equivalent_urls(self):
+        visited = VisitedUrls()
+        assert visited.add("https://example.com/a?x=1&y=2")
+        assert not visited.add("https://EXAMPLE.com:443/a?y=2&x=1#frag")
+        assert "https://example.com/a?x=1&y=2" in visited
+        assert "https://example.com/b" not in visited
+        assert len(visited) == 1
+
+    def test_depths(self):
+        visited = VisitedUrls()
+        visited.set("https://example.com/a", 3)
+        visited.set("https://example.com/a", 1)
+        assert visited.get("https://example.com/a") == 1
+        assert visited.get("https://example.com/b") is None
+
+    def test_grows(self):
+        visited = VisitedUrls(capacity=4)
+        urls = [f"https://example.com/p{i}" for i in range(5000)]
+        for i, url in enumerate(urls):
+            visited.set(url, i % 7)
+        assert len(visited) == 5000
+        assert all(visited.get(u) == i % 7 for i, u in enumerate(urls))
@@ -0,0 +1,45 @@
+from opdscli.opds import OPDSEntry
+from opdscli.watermark import Watermark, load_watermarks, save_watermarks
+
+
+def _entry(entry_id: str, updated: str) -> OPDSEntry:
+    return OPDSEntry(title=entry_id, entry_id=entry_id, updated=updated)
+
+
+class TestWatermark:
+    def test_is_new(self):
+        mark = Watermark(updated=1704067200.0, keys=["a"])  # 2024-01-01
+        assert mark.is_new(_entry("b", "2024-01-02T00:00:00Z"))
+        assert mark.is_new(_entry("b", "2024-01-01T00:00:00Z"))
+        assert not mark.is_new(_entry("a", "2024-01-01T00:00:00Z"))
+        assert not mark.is_new(_entry("c", "2023-12-31T00:00:00Z"))
+        assert not mark.is_new(_entry("d", ""))
+
+    def test_advance_keeps_keys_at_newest_date(self):
+        mark = Watermark(updated=0.0).advance([
+            _entry("old", "2024-01-01"),
+            _entry("x", "2024-01-02"),
+            _entry("y", "2024-01-02"),
+            _entry("undated", ""),
+        ])
+        assert mark.keys == ["x", "y"]
+        assert mark.advance([_entry("z", "2024-01-02")]).keys == [
+            "x", "y", "z",
+        ]
+        newer = mark.advance([_entry("n", "2024-01-03")])
+        assert newer.keys == ["n"]
+        assert newer.updated > mark.updated
+
+
+class TestPersistence:
+    def test_roundtrip(self, tmp_path):
+        path = tmp_path / "marks.json"
+        marks = {"lib": Watermark(updated=12.5, keys=["a"])}
+        save_watermarks(marks, path)
+        assert load_watermarks(path) == marks
+
+    def test_missing_or_corrupt(self, tmp_path):
+        path = tmp_path / "marks.json"
+        assert load_watermarks(path) == {}
+        path.write_text("{not json")
+        assert load_watermarks(path) == {}